@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -30,6 +31,44 @@ ALLOWED_HOSTS = ['localhost', '127.0.0.1', '188.225.86.79', "web"]
 
 CELERY_BROKER_URL = "redis://redis:6379/0"
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
+
+# Аналитика заявок (demo.analytics): частый инкрементальный пересчет и полный ночью
+ANALYTICS_REFRESH_INTERVAL = int(os.getenv('ANALYTICS_REFRESH_INTERVAL', '300'))   # сек
+# Превью изображений (demo.thumbnails): фото из ботов подбираются периодически
+THUMBNAIL_SWEEP_INTERVAL = int(os.getenv('THUMBNAIL_SWEEP_INTERVAL', '60'))   # сек
+# Хранилище файлов по содержимому (demo.media_store): блоб без ссылок удаляется не раньше, чем через
+MEDIA_STORE_GC_GRACE_HOURS = int(os.getenv('MEDIA_STORE_GC_GRACE_HOURS', '24'))
+CELERY_BEAT_SCHEDULE = {
+    'refresh-analytics': {
+        'task': 'demo.tasks.refresh_analytics',
+        'schedule': ANALYTICS_REFRESH_INTERVAL,
+    },
+    'rebuild-analytics': {
+        'task': 'demo.tasks.refresh_analytics',
+        'schedule': crontab(hour=3, minute=0),
+        'kwargs': {'full': True},
+    },
+    'sweep-thumbnails': {
+        'task': 'demo.tasks.sweep_thumbnails_task',
+        'schedule': THUMBNAIL_SWEEP_INTERVAL,
+    },
+    'media-store-gc': {
+        'task': 'demo.tasks.media_store_gc_task',
+        'schedule': crontab(hour=4, minute=0),
+    },
+}
+
+# Сколько последних уведомлений хранить в Redis (demo.notifications)
+NOTIFICATIONS_MAX = int(os.getenv('NOTIFICATIONS_MAX', '5000'))
+
+# Загрузка данных об авто с encar (demo.encar)
+ENCAR_API_URL = os.getenv('ENCAR_API_URL', 'https://api.encar.com/legacy/usedcar/sale/car')
+ENCAR_MIN_INTERVAL = float(os.getenv('ENCAR_MIN_INTERVAL', '1.0'))   # Между запросами всех воркеров, сек
+ENCAR_CACHE_TTL = int(os.getenv('ENCAR_CACHE_TTL', str(6 * 3600)))   # Кэш разобранных данных по carid, сек
+
+# Кэш ответов детальных эндпоинтов (demo.response_cache)
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '600'))
+RESPONSE_CACHE_BID_TTL = int(os.getenv('RESPONSE_CACHE_BID_TTL', '30'))   # bid меняют и боты в обход сигналов
 # Application definition
 
 INSTALLED_APPS = [
@@ -39,10 +78,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'demo',
     'frontend',
     'rest_framework',
     'rest_framework.authtoken',
+    'adrf',
 ]
 
 MIDDLEWARE = [
@@ -64,6 +105,8 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
+# Размер страницы для курсорной пагинации списков (demo.pagination.KeysetPagination)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '50'))
 
 ROOT_URLCONF = 'CRMdemo.urls'
 
@@ -90,6 +133,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'CRMdemo.wsgi.application'
+ASGI_APPLICATION = 'CRMdemo.asgi.application'
 
 
 # Database
@@ -18,9 +18,13 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include("frontend.urls")),
     path('api/', include("demo.urls")),
 ]
+
+# runserver раздавал статику сам; под uvicorn в DEBUG ее отдает Django
+urlpatterns += staticfiles_urlpatterns()
@@ -0,0 +1,89 @@
+"""
+Замер приема заявки: создание в CRM -> данные авто готовы для названия темы.
+
+Сравнивает ожидание по событию Redis (crm_integration.wait_for_bid_details)
+с прежним опросом GET /api/bid/<id>/ раз в секунду. Заявки создаются в CRM
+по-настоящему; ссылки распределяются по режимам поочередно, чтобы кэш encar
+не давал преимущества одному из них.
+
+Запуск из каталога бота (нужны CRM, Celery и Redis из docker-compose):
+    python -m benchmarks.intake_latency URL [URL ...]
+    python -m benchmarks.intake_latency --file links.txt
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import aiohttp
+from config import CRM_TOKEN
+from crm_integration import CRM_URL, create_bid_in_crm, wait_for_bid_details
+
+POLL_INTERVAL = 1
+TIMEOUT = 10
+
+
+async def wait_by_polling(bid_id, timeout=TIMEOUT):
+    # Прежняя реализация wait_for_bid_details: новая сессия на каждый запрос
+    headers = {"Authorization": f"Token {CRM_TOKEN}", "Content-Type": "application/json"}
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        async with aiohttp.ClientSession(headers=headers) as session:
+            async with session.get(f"{CRM_URL}{bid_id}/") as resp:
+                data = await resp.json()
+                if data.get("brand") and data.get("model"):
+                    return data
+        await asyncio.sleep(POLL_INTERVAL)
+    return None
+
+
+MODES = {
+    "poll": wait_by_polling,
+    "push": wait_for_bid_details,
+}
+
+
+async def measure(url, wait):
+    started = time.monotonic()
+    created = await asyncio.to_thread(create_bid_in_crm, url_users=url)
+    if not created:
+        return None
+    created_ms = (time.monotonic() - started) * 1000
+    data = await wait(created["id"])
+    total_ms = (time.monotonic() - started) * 1000
+    return created_ms, total_ms, bool(data and data.get("brand"))
+
+
+def _summary(values):
+    p95 = sorted(values)[max(int(len(values) * 0.95) - 1, 0)]
+    return f"p50 {statistics.median(values):.0f} мс, p95 {p95:.0f} мс, среднее {statistics.mean(values):.0f} мс"
+
+
+async def main(urls):
+    results = {mode: [] for mode in MODES}
+    for index, url in enumerate(urls):
+        mode = list(MODES)[index % len(MODES)]
+        result = await measure(url, MODES[mode])
+        if result is None:
+            print(f"{mode}: заявка не создана ({url})")
+            continue
+        created_ms, total_ms, enriched = result
+        print(f"{mode}: создание {created_ms:.0f} мс, до данных авто {total_ms:.0f} мс{'' if enriched else ' (без данных)'}")
+        results[mode].append(total_ms)
+
+    for mode, totals in results.items():
+        if totals:
+            print(f"{mode}, {len(totals)} заявок: {_summary(totals)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("urls", nargs="*", help="Ссылки encar для заявок")
+    parser.add_argument("--file", help="Файл со ссылками, по одной в строке")
+    args = parser.parse_args()
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file) as f:
+            urls += [line.strip() for line in f if line.strip()]
+    if not urls:
+        parser.error("нужна хотя бы одна ссылка")
+    asyncio.run(main(urls))
@@ -0,0 +1,107 @@
+"""
+Замер работы reminder_job с базой: соединение на каждый запрос (как до пула)
+против общего пула asyncpg (utils.data.get_db_connection).
+
+Для каждого режима печатает число открытых соединений с Postgres и задержку
+запросов (от получения соединения до его возврата/закрытия). Отправка в Telegram
+заменена заглушкой, которая ничего не доставляет: заказы не помечаются показанными,
+база не меняется.
+
+Запуск из каталога бота (переменные DB_* как у бота):
+    python -m benchmarks.reminder_db --runs 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from contextlib import asynccontextmanager
+from unittest import mock
+import asyncpg
+import asyncpg.connection
+import config
+from config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from utils import data
+from handlers.admin import notifications
+
+_original_connect = asyncpg.connection.connect
+
+
+class Stats:
+    def __init__(self):
+        self.connections = 0
+        self.queries = []   # мс на каждое использование соединения
+
+    def count_connect(self):
+        async def connect(*args, **kwargs):
+            self.connections += 1
+            return await _original_connect(*args, **kwargs)
+        return connect
+
+
+def per_connect(stats):
+    # Прежняя get_db_connection: полный asyncpg.connect() и закрытие на каждый запрос
+    @asynccontextmanager
+    async def get_db_connection():
+        started = time.perf_counter()
+        conn = await asyncpg.connect(
+            user=DB_USER, password=DB_PASSWORD, database=DB_NAME, host=DB_HOST, port=DB_PORT
+        )
+        try:
+            yield conn
+        finally:
+            await conn.close()
+            stats.queries.append((time.perf_counter() - started) * 1000)
+    return get_db_connection
+
+
+def pooled(stats):
+    original = data.get_db_connection
+
+    @asynccontextmanager
+    async def get_db_connection():
+        started = time.perf_counter()
+        async with original() as conn:
+            yield conn
+        stats.queries.append((time.perf_counter() - started) * 1000)
+    return get_db_connection
+
+
+async def _no_delivery(*args, **kwargs):
+    return False
+
+
+async def run_mode(name, make_connection, runs):
+    stats = Stats()
+    connect = stats.count_connect()
+    orders = 0
+    with mock.patch.object(asyncpg.connection, "connect", connect), \
+            mock.patch.object(asyncpg, "connect", connect), \
+            mock.patch.object(data, "get_db_connection", make_connection(stats)), \
+            mock.patch.object(notifications, "_deliver_reminder", _no_delivery):
+        started = time.perf_counter()
+        for _ in range(runs):
+            # Роли читаются заново на каждом проходе, как без кэша ролей
+            config.invalidate_roles()
+            await notifications.reminder_job(bot=None)
+        elapsed = (time.perf_counter() - started) * 1000
+        orders = len(await data.get_unshown_open_orders_older_than(config.REMINDER_MIN_AGE))
+        await data.close_db_pool()
+
+    queries = stats.queries[:-1]   # без служебного запроса числа заказов
+    p95 = sorted(queries)[max(int(len(queries) * 0.95) - 1, 0)] if queries else 0
+    print(
+        f"{name}: проходов {runs}, заказов к напоминанию {orders}, соединений открыто {stats.connections}, "
+        f"запросов {len(queries)}, на запрос p50 {statistics.median(queries) if queries else 0:.1f} мс, "
+        f"p95 {p95:.1f} мс, на проход {elapsed / runs:.1f} мс"
+    )
+
+
+async def main(runs):
+    await run_mode("соединение на запрос", per_connect, runs)
+    await run_mode("пул asyncpg", pooled, runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Сколько раз запустить reminder_job в каждом режиме")
+    asyncio.run(main(parser.parse_args().runs))
@@ -1,4 +1,7 @@
 import os
+import time
+import asyncio
+import logging
 from dotenv import load_dotenv
 import asyncpg
 import redis.asyncio as aioredis
@@ -11,12 +14,42 @@ DB_USER = os.getenv("DB_USER", "crm_user")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "securepassword")
 DB_HOST = os.getenv("DB_HOST", "db")
 DB_PORT = os.getenv("DB_PORT", "5432")
+
+# Настройки пула соединений с базой данных
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))                # Минимум открытых соединений
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))               # Максимум соединений в пуле
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))  # Ожидание свободного соединения, сек
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))  # Закрывать простаивающие соединения, сек
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # Кэш подготовленных запросов на соединение
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))         # Таймаут выполнения запроса, сек
 # Токен бота из переменных окружения
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 CRM_TOKEN = os.getenv("CRM_TOKEN")
 
 redis_client = aioredis.from_url("redis://redis:6379", decode_responses=True)
+NOTIFICATIONS_MAX = int(os.getenv("NOTIFICATIONS_MAX", "5000"))  # Сколько последних уведомлений хранить в CRM
+
+# Время жизни кэша ролей (сек); изменения в users/groups сбрасывают кэш сразу
+ROLES_CACHE_TTL = float(os.getenv("ROLES_CACHE_TTL", "300"))
+ROLES_CHANNEL = "roles_changed"
+ROLES_LISTENER_RETRY_MIN = 1.0   # Первая пауза перед переподключением LISTEN, сек
+ROLES_LISTENER_RETRY_MAX = 60.0  # Потолок паузы (удваивается после каждой неудачи), сек
+
+# Лента изменений заявок (LISTEN/NOTIFY на таблице bid)
+BID_CHANNEL = "bid_changes"
+BID_FALLBACK_POLL_INTERVAL = float(os.getenv("BID_FALLBACK_POLL_INTERVAL", "300"))  # Резервная проверка, сек
+BID_DISCONNECTED_POLL_INTERVAL = float(os.getenv("BID_DISCONNECTED_POLL_INTERVAL", "10"))  # Опрос, пока нет подписки, сек
+REMINDER_MIN_AGE = int(os.getenv("REMINDER_MIN_AGE", "60"))                        # Возраст открытой заявки для напоминания, сек
+OPEN_BIDS_DIGEST_INTERVAL = float(os.getenv("OPEN_BIDS_DIGEST_INTERVAL", "60"))    # Сводка по открытым заявкам, сек
+
+# Лимиты отправки сообщений в Telegram
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "25"))              # Сообщений в секунду на бота
+TG_PER_CHAT_INTERVAL = float(os.getenv("TG_PER_CHAT_INTERVAL", "1.0"))  # Пауза между сообщениями в один чат, сек
+TG_RETRY_ATTEMPTS = int(os.getenv("TG_RETRY_ATTEMPTS", "3"))            # Повторы при RetryAfter
+
+# Кэш file_id Telegram: файл загружается один раз, дальше отправляется по file_id
+FILE_ID_CACHE_TTL = int(os.getenv("FILE_ID_CACHE_TTL", str(30 * 24 * 3600)))  # Время жизни записи, сек
 
 # Настройки для работы с файлами
 MAX_FILE_SIZE = 40 * 1024 * 1024  # Максимальный размер файла: 40 МБ
@@ -27,17 +60,102 @@ ALLOWED_FILE_TYPES = ["photo", "document", "video"]  # Разрешенные т
 # Создаем папку для хранения файлов, если её нет
 os.makedirs(STORAGE_PATH, exist_ok=True)
 
-# Глобальные переменные для хранения ролей пользователей
-_ADMIN_ID = None        # ID администратора
-_ALLOWED_USERS = []     # Список разрешенных пользователей
-_ALLOWED_GROUPS = []     # Список разрешенных пользователей
+logger = logging.getLogger(__name__)
+
+# Реестр ролей пользователей (кэш в памяти)
+_ADMIN_ID = None            # ID администратора
+_ALLOWED_USERS = set()      # Множество разрешенных пользователей
+_ALLOWED_GROUPS = set()     # Множество разрешенных групп
+_roles_loaded_at = 0.0      # Момент последней загрузки (time.monotonic)
+_roles_generation = 0       # Растет при каждом сбросе кэша
+_roles_lock = asyncio.Lock()
+_roles_listener = None      # Отдельное соединение для LISTEN roles_changed
+_roles_reconnect_task = None  # Переподключение LISTEN после обрыва
+
 
 async def load_roles_from_db():
     """
     Загружает роли пользователей из базы данных
-    Обновляет глобальные переменные _ADMIN_ID и _ALLOWED_USERS
+    Обновляет реестр _ADMIN_ID, _ALLOWED_USERS и _ALLOWED_GROUPS
+    При ошибке сохраняет последние известные значения.
+    Если во время загрузки кэш сбросили, результат не считается свежим
+    и следующий запрос перечитает роли
+    """
+    global _ADMIN_ID, _ALLOWED_USERS, _ALLOWED_GROUPS, _roles_loaded_at
+    from utils.data import get_db_connection
+
+    generation = _roles_generation
+    try:
+        async with get_db_connection() as conn:
+            users = await conn.fetch("SELECT id, is_admin FROM users")
+            groups = await conn.fetch("SELECT tg_id FROM groups")
+
+        _ADMIN_ID = next((r["id"] for r in users if r["is_admin"]), None)
+        _ALLOWED_USERS = {r["id"] for r in users}
+        _ALLOWED_GROUPS = {r["tg_id"] for r in groups}
+        if generation == _roles_generation:
+            _roles_loaded_at = time.monotonic()
+    except Exception as e:
+        logger.error(f"Ошибка загрузки ролей из БД: {e}")
+
+
+def invalidate_roles():
+    """
+    Помечает реестр ролей устаревшим, следующий запрос перечитает его из БД
+    """
+    global _roles_loaded_at, _roles_generation
+    _roles_generation += 1
+    _roles_loaded_at = 0.0
+
+
+async def _ensure_roles():
+    """
+    Перезагружает роли только если кэш пуст, устарел или был сброшен
+    """
+    if _roles_loaded_at and time.monotonic() - _roles_loaded_at < ROLES_CACHE_TTL:
+        return
+    async with _roles_lock:
+        if _roles_loaded_at and time.monotonic() - _roles_loaded_at < ROLES_CACHE_TTL:
+            return
+        await load_roles_from_db()
+
+
+def _on_roles_changed(connection, pid, channel, payload):
+    logger.info(f"Роли изменены в таблице {payload}, кэш сброшен")
+    invalidate_roles()
+
+
+def _on_roles_listener_lost(connection):
+    global _roles_listener
+    logger.warning("Соединение LISTEN roles_changed потеряно, переподключаемся")
+    _roles_listener = None
+    invalidate_roles()
+    _schedule_roles_reconnect()
+
+
+def _schedule_roles_reconnect():
+    global _roles_reconnect_task
+    if _roles_reconnect_task is None or _roles_reconnect_task.done():
+        _roles_reconnect_task = asyncio.get_running_loop().create_task(_reconnect_roles_listener())
+
+
+async def _reconnect_roles_listener():
     """
-    global _ADMIN_ID, _ALLOWED_USERS, _ALLOWED_GROUPS
+    Переподключает LISTEN с растущей паузой; пока подписки нет, кэш живет по TTL
+    """
+    delay = ROLES_LISTENER_RETRY_MIN
+    while _roles_listener is None:
+        await asyncio.sleep(delay)
+        if await _connect_roles_listener():
+            # Уведомления за время обрыва потеряны
+            invalidate_roles()
+            logger.info(f"Подписка на {ROLES_CHANNEL} восстановлена")
+            return
+        delay = min(delay * 2, ROLES_LISTENER_RETRY_MAX)
+
+
+async def _connect_roles_listener() -> bool:
+    global _roles_listener
     try:
         conn = await asyncpg.connect(
             user=DB_USER,
@@ -46,63 +164,67 @@ async def load_roles_from_db():
             host=DB_HOST,
             port=DB_PORT
         )
-        # cursor = conn.cursor()
-
-        # # Получаем ID администратора (пользователь с is_admin = 1)
-        # cursor.execute("SELECT id FROM users WHERE is_admin = 1 LIMIT 1")
-        # row = cursor.fetchone()
-        # _ADMIN_ID = row[0] if row else None
-
-        # # Получаем список всех разрешенных пользователей
-        # cursor.execute("SELECT id FROM users")
-        # _ALLOWED_USERS = [r[0] for r in cursor.fetchall()]
-
-        # # Получаем список всех разрешенных групп
-        # cursor.execute("SELECT tg_id FROM groups")
-        # _ALLOWED_GROUPS = [r[0] for r in cursor.fetchall()]
-
-        row = await conn.fetchrow("SELECT id FROM users WHERE is_admin = True")
-        _ADMIN_ID = row["id"] if row else None
+        await conn.add_listener(ROLES_CHANNEL, _on_roles_changed)
+        conn.add_termination_listener(_on_roles_listener_lost)
+        _roles_listener = conn
+        return True
+    except Exception as e:
+        logger.error(f"Не удалось подписаться на {ROLES_CHANNEL}: {e}")
+        return False
 
-        rows = await conn.fetch("SELECT id FROM users")
-        _ALLOWED_USERS = [r["id"] for r in rows]
 
-        rows = await conn.fetch("SELECT tg_id FROM groups")
-        _ALLOWED_GROUPS = [r["tg_id"] for r in rows]
+async def start_roles_listener():
+    """
+    Подписывается на уведомления roles_changed (триггер на users/groups)
+    Использует отдельное соединение, чтобы не занимать соединение пула.
+    Если подключиться не удалось или соединение оборвалось, повторяет попытки в фоне
+    """
+    if _roles_listener is not None:
+        return
+    if not await _connect_roles_listener():
+        _schedule_roles_reconnect()
 
 
+async def stop_roles_listener():
+    """
+    Закрывает соединение подписки на изменения ролей
+    """
+    global _roles_listener, _roles_reconnect_task
+    task, _roles_reconnect_task = _roles_reconnect_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    conn, _roles_listener = _roles_listener, None
+    if conn is not None:
+        # Штатное закрытие - не обрыв, переподключение не нужно
+        conn.remove_termination_listener(_on_roles_listener_lost)
         await conn.close()
-    except Exception as e:
-        print(f"Ошибка загрузки ролей из БД: {e}")
-        _ADMIN_ID = None
-        _ALLOWED_USERS = []
-        _ALLOWED_GROUPS = []
 
 
 async def get_admin_id():
     """
-    Возвращает ID администратора
-    Перезагружает роли из БД перед возвратом
+    Возвращает ID администратора из реестра ролей
     """
-    await load_roles_from_db()
+    await _ensure_roles()
     return _ADMIN_ID
 
 
 async def get_allowed_users():
     """
-    Возвращает список всех разрешенных пользователей
-    Перезагружает роли из БД перед возвратом
+    Возвращает множество всех разрешенных пользователей из реестра ролей
     """
-    await load_roles_from_db()
+    await _ensure_roles()
     return _ALLOWED_USERS
 
 
 async def get_allowed_groups():
     """
-    Возвращает список всех разрешенных пользователей
-    Перезагружает роли из БД перед возвратом
+    Возвращает множество всех разрешенных групп из реестра ролей
     """
-    await load_roles_from_db()
+    await _ensure_roles()
     return _ALLOWED_GROUPS
 
 
@@ -143,23 +265,16 @@ async def set_admin_id(user_id: int):
         user_id: ID пользователя, которого назначают администратором
     """
     global _ADMIN_ID
-    conn = await asyncpg.connect(
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            host=DB_HOST,
-            port=DB_PORT
-    )
-    cursor = conn.cursor()
+    from utils.data import get_db_connection
 
-    # Сбрасываем права администратора у всех пользователей
-    cursor.execute("UPDATE users SET is_admin = 0")
-    # Назначаем права администратора указанному пользователю
-    cursor.execute("UPDATE users SET is_admin = 1 WHERE id = ?", (user_id,))
-    conn.commit()
-    await conn.close()
+    async with get_db_connection() as conn:
+        async with conn.transaction():
+            # Сбрасываем права администратора у всех пользователей
+            await conn.execute("UPDATE users SET is_admin = FALSE WHERE is_admin")
+            # Назначаем права администратора указанному пользователю
+            await conn.execute("UPDATE users SET is_admin = TRUE WHERE id = $1", user_id)
 
-    # Обновляем глобальную переменную
+    # Обновляем реестр
     _ADMIN_ID = user_id
 
 
@@ -169,23 +284,11 @@ async def remove_admin_id():
     Используется для сброса административных прав
     """
     global _ADMIN_ID
-    conn = await asyncpg.connect(
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            host=DB_HOST,
-            port=DB_PORT
-    )
-    cursor = conn.cursor()
+    from utils.data import get_db_connection
 
-    # Сбрасываем права администратора у всех пользователей
-    cursor.execute("UPDATE users SET is_admin = 0")
-    conn.commit()
-    await conn.close()
+    async with get_db_connection() as conn:
+        # Сбрасываем права администратора у всех пользователей
+        await conn.execute("UPDATE users SET is_admin = FALSE WHERE is_admin")
 
-    # Обновляем глобальную переменную
+    # Обновляем реестр
     _ADMIN_ID = None
-
-
-# Загружаем роли при импорте модуля
-load_roles_from_db
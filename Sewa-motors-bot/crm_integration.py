@@ -1,10 +1,12 @@
 import logging
 import requests
 import json
-from config import redis_client
+from config import redis_client, NOTIFICATIONS_MAX
 import uuid
+import time
 import asyncio
 import aiohttp
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
@@ -32,38 +34,78 @@ def create_bid_in_crm(url_users: str, other_fields: dict = None):
         logger.error(f"Ошибка при создании заявки в CRM: {e}")
         return None
 
+# Хранилище уведомлений CRM (см. demo/notifications.py):
+# hash с уведомлениями, zset по времени и set непрочитанных id
+NOTIFICATIONS_ITEMS_KEY = "notifications:items"
+NOTIFICATIONS_TIMELINE_KEY = "notifications:timeline"
+NOTIFICATIONS_UNREAD_KEY = "notifications:unread"
+EVENTS_STREAM_KEY = "crm:events"
+EVENTS_STREAM_MAXLEN = 10000
+
+# Тот же скрипт, что у CRM (demo/notifications.py): один источник в redis_scripts/
+ADD_NOTIFICATION_LUA = Path(__file__).resolve().parent / "redis_scripts" / "add_notification.lua"
+_add_notification_script = redis_client.register_script(ADD_NOTIFICATION_LUA.read_text())
+
+
 async def push_notification_to_redis(event: dict):
-    if "id" not in event:
-        event["id"] = str(uuid.uuid4())
-    if "read" not in event:
-        event["read"] = False
-    await redis_client.rpush("notifications_queue", json.dumps(event))
+    event = dict(event)
+    notif_id = str(event.pop("id", None) or uuid.uuid4())
+    is_read = bool(event.pop("read", False))
+    added = await _add_notification_script(
+        keys=[NOTIFICATIONS_ITEMS_KEY, NOTIFICATIONS_TIMELINE_KEY, NOTIFICATIONS_UNREAD_KEY],
+        args=[notif_id, json.dumps(event), time.time(), 0 if is_read else 1, NOTIFICATIONS_MAX],
+    )
+    if added:
+        # Живая доставка в открытые страницы CRM (SSE, см. demo/events.py)
+        await redis_client.xadd(
+            EVENTS_STREAM_KEY,
+            {"type": "notification", "data": json.dumps({**event, "id": notif_id, "read": is_read})},
+            maxlen=EVENTS_STREAM_MAXLEN,
+            approximate=True,
+        )
+
+
+
+# fetch_car_data_task кладет итог обработки заявки под этот ключ
+# и публикует его в канал с тем же именем (demo/tasks.py)
+BID_ENRICHED_KEY = "bid:enriched:{bid_id}"
+
 
+async def _next_pubsub_message(pubsub):
+    async for message in pubsub.listen():
+        if message["type"] == "message":
+            return message["data"]
 
 
 async def wait_for_bid_details(bid_id, timeout=10):
     """
     Ждём, пока Celery обновит заявку в CRM.
+    Событие приходит сразу после сохранения заявки; по таймауту
+    данные заявки запрашиваются у CRM один раз.
     """
+    key = BID_ENRICHED_KEY.format(bid_id=bid_id)
+    pubsub = redis_client.pubsub()
+    try:
+        # Подписка до проверки ключа: событие не потеряется между GET и SUBSCRIBE
+        await pubsub.subscribe(key)
+        raw = await redis_client.get(key)
+        if raw is None:
+            raw = await asyncio.wait_for(_next_pubsub_message(pubsub), timeout)
+        return json.loads(raw)
+    except asyncio.TimeoutError:
+        logger.warning(f"Заявка {bid_id} не обработана за {timeout} с, берем данные из CRM")
+    except Exception as e:
+        logger.error(f"Ошибка ожидания данных заявки {bid_id}: {e}")
+    finally:
+        await pubsub.reset()
+
     headers = {
-    "Authorization": f"Token {CRM_TOKEN}",
-    "Content-Type": "application/json"
+        "Authorization": f"Token {CRM_TOKEN}",
+        "Content-Type": "application/json"
     }
-    start = asyncio.get_event_loop().time()
-    while asyncio.get_event_loop().time() - start < timeout:
-        try:
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.get(f"{CRM_URL}{bid_id}/") as resp:
-                    data = await resp.json()
-                    if data.get("brand") and data.get("model"):
-                        return data
-        except Exception as e:
-            logger.error(f"Ошибка при получении данных заявки {bid_id}: {e}")
-        await asyncio.sleep(1)
-    async with aiohttp.ClientSession() as session:
+    async with aiohttp.ClientSession(headers=headers) as session:
         async with session.get(f"{CRM_URL}{bid_id}/") as resp:
             return await resp.json()
-        
 
 
 async def update_bid_topics(bid_id: int, thread_id: int) -> bool:
@@ -7,15 +7,19 @@ from handlers.common.constans import MAX_FILES_TO_SEND
 from utils.data import(
     get_all_orders_by_status,
     get_checklist_answers,
-    mark_order_as_shown,
     get_order_by_id,
     get_progress_manager_ids,
     get_open_orders_older_than,
     get_dealer_by_id,
-    get_company_by_id,
     get_thread_clients,
     get_open_orders_with_opened_at,
+    get_unshown_open_orders_older_than,
+    get_dealers_by_ids,
+    get_companies_by_ids,
+    mark_orders_as_shown,
  )
+from utils.rate_limiter import telegram_limiter
+from utils.file_id_cache import send_photo_cached, send_video_cached, send_media_group_cached
 from utils.file_handler import (
     get_user_files,
     get_files_by_stage_summary,
@@ -139,151 +143,155 @@ async def notify_managers_order_opened(bot, order):
         pass
 
 
+def _dealer_parts(dealer: dict) -> list:
+    parts = []
+    for key in ("name", "company_name", "phone", "address"):
+        value = dealer.get(key)
+        if value and str(value).strip() not in ("", "0"):
+            parts.append(str(value))
+    return parts
+
+
+def _render_reminder(order: dict, dealer: dict | None, company: dict | None):
+    """
+    Собирает текст, клавиатуру и путь к фото дилера для напоминания о заказе
+    Результат один на заказ и переиспользуется для всех получателей
+    """
+    lines = ["🔔 <b>Открытый заказ ожидает осмотрщика</b>\n"]
+
+    order_brand = order.get('brand', '')
+    order_model = order.get('model', '')
+    if order_brand and order_model:
+        lines.append(f"🚗 <b>{order_brand} {order_model}</b>")
+        details_list = []
+        if order.get('year'):
+            details_list.append(f"{order['year']} г.")
+        if order.get('mileage'):
+            details_list.append(f"{order['mileage']} км")
+        if order.get('power'):
+            details_list.append(f"{order['power']} л.с.")
+        if details_list:
+            lines.append("  ".join(details_list))
+
+    lines.append(f"🆔 Заказ: {order.get('id')}")
+    if order.get("opened_at"):
+        formatted = order["opened_at"].strftime("%d.%m.%Y %H:%M:%S")
+        lines.append(f"<b>📅 Создан:</b> {formatted}")
+    if order.get("url_users"):
+        lines.append(f"\n<b>🔗Ссылка на авто:</b> {order['url_users']}")
+
+    photo_path = None
+    if dealer:
+        parts = _dealer_parts(dealer)
+        if parts:
+            lines.append("\n<b>👨‍💻 Дилер:</b>\n" + "\n".join(parts))
+        if dealer.get("photo"):
+            local_path = os.path.join("/usr/src/app/storage", dealer["photo"])
+            if os.path.exists(local_path):
+                photo_path = local_path
+
+    if company:
+        lines.append(
+            "\n🏢<b> Компания: </b>\n" +
+            "Наименование: " + (company.get("name") or "Неизвестно") +
+            "\nИНН: " + (company.get("INN") or "Неизвестно") +
+            "\nАдрес: " + (company.get("OGRN") or "Неизвестно") +
+            "\nТелефон: " + (company.get("phone") or "Неизвестно") +
+            "\nE-mail: " + (company.get("email") or "Неизвестно")
+        )
+
+    lines.append("\nНажмите кнопку ниже, чтобы открыть заказ.")
+    open_kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="📥 Взять заказ",
+                    callback_data=f"order_time_{order.get('id')}",
+                )
+            ]
+        ]
+    )
+    return "\n".join(lines), open_kb, photo_path
+
+
+async def _deliver_reminder(bot, uid: int, order_id, text: str, open_kb, photo_path) -> bool:
+    try:
+        if photo_path:
+            await telegram_limiter.send(
+                uid,
+                send_photo_cached,
+                bot,
+                uid,
+                photo_path,
+                caption=text,
+                parse_mode="HTML",
+                reply_markup=open_kb,
+            )
+        else:
+            await telegram_limiter.send(
+                uid, bot.send_message, uid, text, parse_mode="HTML", reply_markup=open_kb
+            )
+        logger.info(f"reminder: sent to {uid} for order {order_id}")
+        return True
+    except Exception as e:
+        logger.error(f"reminder: failed to send to {uid} for order {order_id}: {e}")
+        return False
+
+
 async def reminder_job(bot):
+    """
+    Рассылает напоминания об открытых заказах, которые еще не показывались
+
+    Заказы, дилеры, компании и получатели загружаются несколькими
+    запросами на весь проход, текст собирается один раз на заказ,
+    отправка идет параллельно в пределах лимитов Telegram. Заказы,
+    доставленные хотя бы одному получателю, помечаются одним UPDATE.
+    """
     try:
-        open_orders = await get_open_orders_older_than(60)
+        open_orders = await get_unshown_open_orders_older_than(config.REMINDER_MIN_AGE)
         if not open_orders:
             return
 
-        for idx, order in enumerate(open_orders):
-            if idx > 0:
-                await asyncio.sleep(5)
-            if order.get("shown_to_bot") == 1:
-                logger.info(f"reminder: order {order.get('id')} already shown, skipping")
-                continue
+        dealers, companies, active_manager_ids, admin_id, allowed_users = await asyncio.gather(
+            get_dealers_by_ids({o["dealer_id"] for o in open_orders if o.get("dealer_id")}),
+            get_companies_by_ids({o["company_id"] for o in open_orders if o.get("company_id")}),
+            get_progress_manager_ids(),
+            config.get_admin_id(),
+            config.get_allowed_users(),
+        )
+        active_manager_ids = set(active_manager_ids)
+        targets = [
+            uid
+            for uid in (allowed_users or [])
+            if isinstance(uid, int) and uid > 100000
+            and uid != admin_id and uid not in active_manager_ids
+        ]
+        if not targets:
+            return
 
-            active_manager_ids = set(await get_progress_manager_ids())
-            admin_id = await config.get_admin_id()
-            allowed_users = set(
-                [
-                    uid
-                    for uid in (await config.get_allowed_users() or [])
-                    if isinstance(uid, int) and uid > 100000
-                ]
-            )
-            targets = [
-                uid
-                for uid in allowed_users
-                if uid and uid != admin_id and uid not in active_manager_ids
-            ]
-            dealer_text = ""
-            dealer_id = order.get("dealer_id")
-
-            logger.info(f"open_orders: {dealer_id}")
-            if dealer_id:
-                dealer = await get_dealer_by_id(dealer_id)
-                logger.info(f"dealer: {dealer}")
-                if dealer:
-                    photo = dealer.get("photo")
-                    parts = []
-                    if dealer.get("name"):
-                        if str(dealer["name"]).strip() not in ("", "0", None):
-                            parts.append(str(dealer["name"]))
-
-                    if dealer.get("company_name"):
-                        if str(dealer["company_name"]).strip() not in ("", "0", None):
-                            parts.append(str(dealer["company_name"]))
-
-                    if dealer.get("phone"):
-                        if str(dealer["phone"]).strip() not in ("", "0", None):
-                            parts.append(str(dealer["phone"]))
-
-                    if dealer.get("address"):
-                        if str(dealer["address"]).strip() not in ("", "0", None):
-                            parts.append(str(dealer["address"]))
-                    dealer_photo = dealer.get("photo")
-                    if dealer_photo:
-                        local_path = os.path.join("/usr/src/app/storage", dealer_photo)
-                        if os.path.exists(local_path):
-                            photo_obj = FSInputFile(local_path)
-                    if parts:
-                        dealer_text = "\n<b>👨‍💻 Дилер:</b>\n"+ "" + "\n".join(parts)
-                    
-            company_id = order.get("company_id")
-            logger.info(f"open_orders: {dealer_text}")
-            if order.get("url_users"):
-                link_text = f"\n<b>🔗Ссылка на авто:</b> {order['url_users']}"
-            if company_id:
-                company = await get_company_by_id(company_id)
-                if company:
-                    company_text = []
-                    company_text.append(
-                        "\n🏢<b> Компания: </b>\n" +
-                        "Наименование: " + (company.get("name") or "Неизвестно") +
-                        "\nИНН: " + (company.get("INN") or "Неизвестно") +
-                        "\nАдрес: " + (company.get("OGRN") or "Неизвестно") +
-                        "\nТелефон: " + (company.get("phone") or "Неизвестно") +
-                        "\nE-mail: " + (company.get("email") or "Неизвестно")
-                    )
-                else:
-                    company_text = ""
-            else:
-                company_text = ""
-            order_brand = order.get('brand','')
-            order_model = order.get('model','')
-            order_year = order.get('year','')
-            order_mileage = order.get('mileage','')
-            order_power = order.get('power','')
-            if order_brand and order_model:
-                text1 = f"🚗 <b>{order_brand} {order_model}</b>"
-                details_list = []
-                if order_year:
-                    details_list.append(f"{order_year} г.")
-                if order_mileage:
-                    details_list.append(f"{order_mileage} км")
-                if order_power:
-                    details_list.append(f"{order_power} л.с.")
-
-                if details_list:
-                    text1 += "\n" + "  ".join(details_list)
-                if order.get("opened_at"):
-                    date = order.get('opened_at')
-                    formatted = date.strftime("%d.%m.%Y %H:%M:%S")
-                    date_create = f"<b>📅 Создан:</b> {formatted}\n"
-            text = (
-                "🔔 <b>Открытый заказ ожидает осмотрщика</b>\n\n" + text1 +
-                f"\n🆔 Заказ: {order.get('id')}\n" +
-                date_create + link_text + '\n' + dealer_text + "\n" + company_text +
- 
-                "\n\nНажмите кнопку ниже, чтобы открыть заказ."
-            )
-            open_kb = InlineKeyboardMarkup(
-                inline_keyboard=[
-                    [
-                        InlineKeyboardButton(
-                            text="📥 Взять заказ",
-                            callback_data=f"order_time_{order.get('id')}",
-                        )
-                    ]
-                ]
+        deliveries = []
+        for order in open_orders:
+            text, open_kb, photo_path = _render_reminder(
+                order,
+                dealers.get(order.get("dealer_id")),
+                companies.get(order.get("company_id")),
             )
             for uid in targets:
-                try:
-                    if photo:
-                        await bot.send_photo(
-                        chat_id=uid,
-                        photo=photo_obj,
-                        caption=text,
-                        parse_mode="HTML",
-                        reply_markup=open_kb,
-                    )
-                    else:
-                        await bot.send_message(
-                            uid, text, parse_mode="HTML", reply_markup=open_kb
-                        )
-                    logger.info(f"reminder: sent to {uid} for order {order.get('id')}")
-                except Exception as e:
-                    logger.error(
-                        f"reminder: failed to send to {uid} for order {order.get('id')}: {e}"
-                    )
-                    continue
-            try:
-                await mark_order_as_shown(order.get("id"))
-                logger.info(f"reminder: shown_to_bot set True for order {order.get('id')}")
-            except Exception as e:
-                logger.error(f"reminder: failed to update shown_to_bot for order {order.get('id')}: {e}")
+                deliveries.append(
+                    (order["id"], _deliver_reminder(bot, uid, order["id"], text, open_kb, photo_path))
+                )
+
+        results = await asyncio.gather(*(coro for _, coro in deliveries))
+        delivered_ids = {
+            order_id for (order_id, _), ok in zip(deliveries, results) if ok
+        }
+
+        try:
+            await mark_orders_as_shown(delivered_ids)
+            logger.info(f"reminder: shown_to_bot set True for orders {sorted(delivered_ids)}")
+        except Exception as e:
+            logger.error(f"reminder: failed to update shown_to_bot for orders {sorted(delivered_ids)}: {e}")
 
-                
     except Exception as e:
         logger.error(f"reminder_job top-level error: {e}\n{traceback.format_exc()}")
 
@@ -467,15 +475,12 @@ async def send_files_to_admin(
 
         photos = [f for f in files if f.get("type") == "photo"]
         if photos:
-            media_group = [
-                InputMediaPhoto(media=FSInputFile(f["path"]))
-                for f in photos[:MAX_FILES_TO_SEND]
-            ]
-            if media_group:
-                await bot.send_media_group(admin_id, media_group)
+            await send_media_group_cached(
+                bot, admin_id, [f["path"] for f in photos[:MAX_FILES_TO_SEND]]
+            )
 
         for f in [f for f in files if f.get("type") == "video"]:
-            await bot.send_video(admin_id, FSInputFile(f["path"]))
+            await send_video_cached(bot, admin_id, f["path"])
 
         cp1 = checklist.get("checklist_point1") if isinstance(checklist, dict) else None
         cp2 = checklist.get("checklist_point2") if isinstance(checklist, dict) else None
@@ -17,6 +17,7 @@ from utils.data import (
     get_disabled_orders_by_company,
     mark_order_open,
     get_order_by_id,
+    get_analytics_snapshot,
 )
 
 router = Router()
@@ -60,6 +61,42 @@ async def become_manager_command(message: Message):
     )
 
 
+def _minutes(seconds):
+    return f"{seconds / 60:.0f} мин" if seconds is not None else "—"
+
+
+@router.message(Command("stats"))
+async def stats_command(message: Message):
+    if not await config.is_admin(message.from_user.id):
+        await message.answer("❌ Недостаточно прав.")
+        return
+
+    stats = await get_analytics_snapshot()
+    summary = stats["summary"]
+    lines = [
+        "📊 Статистика заявок",
+        f"Открыто: {summary['open']}, в работе: {summary['in_progress']}, без осмотрщика: {summary['unassigned']}",
+    ]
+    trend = stats["trend"]
+    if trend:
+        lines += [
+            f"За 7 дней открыто: {trend['opened_7d']}",
+            f"Назначение осмотрщика (7 дн.): {_minutes(trend['avg_assign_seconds_7d'])}",
+            f"Прибытие на осмотр (7 дн.): {_minutes(trend['avg_arrive_seconds_7d'])}",
+        ]
+    if stats["inspectors"]:
+        lines.append("\n🏆 Осмотрщики за 30 дней (выполнено / назначено):")
+        for row in stats["inspectors"]:
+            lines.append(
+                f"{row['rank_30d']}. {row['manager_id']}: {row['done_30d']} / {row['assigned_30d']}, "
+                f"прибытие {_minutes(row['avg_arrive_seconds_30d'])}"
+            )
+    if summary["refreshed_at"]:
+        lines.append(f"\nОбновлено: {summary['refreshed_at']:%d.%m %H:%M} UTC")
+
+    await message.answer("\n".join(lines))
+
+
 @router.message(Command("openorders"))
 async def open_orders_menu(message: Message):
     if not await config.is_admin(message.from_user.id):
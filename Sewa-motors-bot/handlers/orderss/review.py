@@ -22,6 +22,7 @@ from utils.data import (
 )
 
 from handlers.common.constans import MAX_FILES_TO_SEND
+from utils.file_id_cache import send_video_cached, send_media_group_cached
 router = Router()
 logger = logging.getLogger(__name__)
 
@@ -199,15 +200,15 @@ async def admin_confirm_order(callback: CallbackQuery, state: FSMContext):
         try:
             await callback.bot.send_message(uid, header_text, parse_mode="HTML", message_thread_id=thread_id)
             if photos:
-                media_group = [
-                    InputMediaPhoto(media=FSInputFile(f["path"]))
-                    for f in photos[:MAX_FILES_TO_SEND]
-                ]
-                if media_group:
-                    await callback.bot.send_media_group(uid, media_group, message_thread_id=thread_id)
+                await send_media_group_cached(
+                    callback.bot,
+                    uid,
+                    [f["path"] for f in photos[:MAX_FILES_TO_SEND]],
+                    message_thread_id=thread_id,
+                )
 
             for f in [f for f in files if f.get("type") == "video"]:
-                await callback.bot.send_video(uid, FSInputFile(f["path"]), message_thread_id=thread_id)
+                await send_video_cached(callback.bot, uid, f["path"], message_thread_id=thread_id)
             await callback.bot.send_message(uid, checklist_text, parse_mode="HTML", message_thread_id=thread_id)
             logger.info(f"reminder: sent to {uid} about open bids")
         except Exception as e:
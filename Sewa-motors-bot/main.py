@@ -1,7 +1,8 @@
 import asyncio
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
 import os
+import time
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
@@ -15,7 +16,9 @@ import re
 from config import BOT_TOKEN
 from handlers import files
 from crm_integration import create_bid_in_crm, wait_for_bid_details, update_bid_topics
-from utils.data import get_bid_by_thread_id,get_bid_info
+from utils.data import get_bid_by_thread_id, get_bid_info, init_db_pool, close_db_pool
+from utils.media_store import temp_path, store_file
+from utils.bid_feed import BidChangeFeed
 import requests
 CRM_URL = "http://web:8000/api/message/create/"
 from config import CRM_TOKEN
@@ -27,12 +30,13 @@ logger = logging.getLogger(__name__)
 router = Router()
 orders_router = Router()
 bot = Bot(token=BOT_TOKEN)
-local_folder = "storage/TGphoto"
-os.makedirs(local_folder, exist_ok=True)
 
 # Обработчик для сообщений и создания заявки
 @orders_router.message(lambda message: message.text and "#заявка" in message.text)
 async def test_all_messages(message: types.Message):
+    # Задержка приема: сообщение -> заявка в CRM -> данные с encar -> первая тема
+    started = time.monotonic()
+    queued_ms = max((datetime.now(timezone.utc) - message.date).total_seconds() * 1000, 0)
     match = re.search(r"https?://\S+", message.text)
     if match:
         url = match.group(0)
@@ -40,7 +44,10 @@ async def test_all_messages(message: types.Message):
             url_users=url
         )
     if created_bid:
+        created_ms = (time.monotonic() - started) * 1000
         bid_instance = await wait_for_bid_details(created_bid.get("id"))
+        enriched_ms = (time.monotonic() - started) * 1000
+        topic_ms = None
         name = f"{bid_instance.get('brand', '')} {bid_instance.get('model', '')} {bid_instance.get('year', '')}"
         last_topic = None
         allowed_groups = set(
@@ -51,6 +58,8 @@ async def test_all_messages(message: types.Message):
         for chat_id in allowed_groups:
             try:
                 last_topic = await bot.create_forum_topic(chat_id=chat_id, name=name)
+                if topic_ms is None:
+                    topic_ms = (time.monotonic() - started) * 1000
                 await message.reply(f"Заявка получена! Тема успешно создана в группе {chat_id}! Тема ID: {last_topic.message_thread_id}")
                 try:
                     await update_bid_topics(created_bid.get("id"), last_topic.message_thread_id)
@@ -63,6 +72,12 @@ async def test_all_messages(message: types.Message):
         if last_topic is None:
             await message.reply(f"Не удалось создать тему ни в одной группе.")
 
+        logger.info(
+            f"Прием заявки {created_bid.get('id')}: до бота {queued_ms:.0f} мс, заявка в CRM {created_ms:.0f} мс, "
+            f"данные авто {enriched_ms:.0f} мс, первая тема "
+            f"{f'{topic_ms:.0f} мс' if topic_ms is not None else 'не создана'} (от получения ботом)"
+        )
+
     else:
         await message.reply("Не могу найти ссылку в сообщении.")
 
@@ -92,27 +107,26 @@ async def log_message(message: types.Message):
         "created_at" : datetime.utcnow().isoformat() 
     }
 
+    # Медиа сохраняются в хранилище по содержимому: пересланное повторно фото не занимает места
     if getattr(message, "photo", None):
         photo = message.photo[-1]
         file_info = await bot.get_file(photo.file_id)
-        filename = os.path.basename(file_info.file_path)
-        local_path = os.path.join(local_folder, filename)
-        url = f"/media/TGphoto/{filename}"
-        await bot.download_file(file_info.file_path, local_path)
+        downloaded = temp_path()
+        await bot.download_file(file_info.file_path, downloaded)
+        stored_name = await store_file(downloaded, os.path.basename(file_info.file_path))
         payload["media"].append({
             "type": "photo",
-            "file_url": url,
+            "file_url": f"/media/{stored_name}",
         })
 
     if getattr(message, "video", None):
         file_info = await bot.get_file(message.video.file_id)
-        filename = os.path.basename(file_info.file_path)
-        local_path = os.path.join(local_folder, filename)
-        url = f"/media/TGphoto/{filename}"
-        await bot.download_file(file_info.file_path, local_path)
+        downloaded = temp_path()
+        await bot.download_file(file_info.file_path, downloaded)
+        stored_name = await store_file(downloaded, os.path.basename(file_info.file_path))
         payload["media"].append({
             "type": "video",
-            "file_url": url,
+            "file_url": f"/media/{stored_name}",
         })
     try:
         requests.post(CRM_URL, json=payload, headers={"Authorization": f"Token {CRM_TOKEN}"}, timeout=5)
@@ -130,9 +144,13 @@ async def main():
 
     # Создаем экземпляр бота
     bot = Bot(token=BOT_TOKEN)
+
+    # Открываем общий пул соединений с базой данных
+    await init_db_pool()
     
-    # Загружаем роли пользователей из базы данных
+    # Загружаем роли пользователей из базы данных и подписываемся на их изменения
     await config.load_roles_from_db()
+    await config.start_roles_listener()
 
     # Создаем диспетчер с хранилищем состояний в памяти
     dp = Dispatcher(storage=MemoryStorage())
@@ -175,37 +193,49 @@ async def main():
         ]
     )
 
-    try:
-        # Импортируем функцию для отправки напоминаний
-        from handlers.admin.notifications import reminder_open_bids, reminder_job 
-        async def reminders_loop():
-            """
-            Бесконечный цикл для отправки напоминаний
-            Проверяет заказы каждую минуту и отправляет уведомления
-            """
-            timer = 0
-            while True:
-                try:
-                    await reminder_job(bot)
-                    if timer >= 50:
-                        logger.info("15 минут прошли — запускаем reminder_open_bids")
-                        await reminder_open_bids(bot)
-                        timer = 0 
-                    else:
-                        logger.info(f"Таймер: {timer} секунд")
-                except Exception:
-                    pass
-                await asyncio.sleep(10)
-                timer +=10
-
-        # Запускаем фоновую задачу для напоминаний
-        asyncio.create_task(reminders_loop())
+    # Импортируем функции для отправки напоминаний
+    from handlers.admin.notifications import reminder_open_bids, reminder_job
+
+    def reminder_delay(event):
+        """
+        Открытая заявка попадает в напоминания, когда ей исполнится REMINDER_MIN_AGE секунд
+        """
+        if event.get("status") == "open":
+            return config.REMINDER_MIN_AGE + 1
+        return None
+
+    bid_feed = BidChangeFeed(
+        lambda: reminder_job(bot),
+        fallback_interval=config.BID_FALLBACK_POLL_INTERVAL,
+        delay_for=reminder_delay,
+        poll_interval=config.BID_DISCONNECTED_POLL_INTERVAL,
+    )
 
+    async def open_bids_digest_loop():
+        """
+        Периодически напоминает менеджерам о количестве открытых заявок
+        """
+        while True:
+            await asyncio.sleep(config.OPEN_BIDS_DIGEST_INTERVAL)
+            try:
+                await reminder_open_bids(bot)
+            except Exception as e:
+                logger.error(f"reminder_open_bids error: {e}")
+
+    # Запускаем ленту изменений заявок и периодическую сводку
+    bid_feed.start()
+    digest_task = asyncio.create_task(open_bids_digest_loop())
+
+    try:
         # Запускаем бота в режиме polling (опрос сервера Telegram)
         await dp.start_polling(bot)
     finally:
-        # Закрываем сессию бота при завершении
+        # Закрываем сессию бота, подписки и пул соединений при завершении
+        digest_task.cancel()
+        await bid_feed.stop()
         await bot.session.close()
+        await config.stop_roles_listener()
+        await close_db_pool()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,18 @@
+-- Добавление уведомления в хранилище CRM (demo/notifications.py, crm_integration.py).
+-- KEYS: items, timeline, unread; ARGV: id, payload, score, unread(0/1), max_items.
+-- Возвращает 0, если уведомление с таким id уже есть
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+if ARGV[4] == '1' then
+    redis.call('SADD', KEYS[3], ARGV[1])
+end
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[5])
+if excess > 0 then
+    local old = redis.call('ZRANGE', KEYS[2], 0, excess - 1)
+    redis.call('HDEL', KEYS[1], unpack(old))
+    redis.call('SREM', KEYS[3], unpack(old))
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, excess - 1)
+end
+return 1
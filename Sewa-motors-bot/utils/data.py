@@ -1,169 +1,167 @@
 import sqlite3
 from datetime import datetime, timedelta
-from config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from contextlib import asynccontextmanager
+from config import (
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_ACQUIRE_TIMEOUT,
+    DB_POOL_MAX_INACTIVE_LIFETIME, DB_STATEMENT_CACHE_SIZE, DB_COMMAND_TIMEOUT,
+)
 import asyncpg
 import asyncio
 
+_pool: asyncpg.Pool | None = None
+_pool_lock = asyncio.Lock()
+
+
+async def init_db_pool() -> asyncpg.Pool:
+    """
+    Создает общий пул соединений с Postgres (один на процесс)
+    Повторный вызов возвращает уже созданный пул
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                user=DB_USER,
+                password=DB_PASSWORD,
+                database=DB_NAME,
+                host=DB_HOST,
+                port=DB_PORT,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+                statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                command_timeout=DB_COMMAND_TIMEOUT,
+            )
+    return _pool
+
+
+async def close_db_pool():
+    """
+    Закрывает общий пул соединений при остановке бота
+    """
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+@asynccontextmanager
 async def get_db_connection():
-    conn = await asyncpg.connect(
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        host=DB_HOST,
-        port=DB_PORT
-    )
-    return conn
+    """
+    Выдает соединение из общего пула и возвращает его обратно после использования
+    """
+    pool = await init_db_pool()
+    async with pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
+        yield conn
 
 
 async def get_companies():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch("SELECT id, name FROM companies")
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 
 async def get_bids():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch("SELECT id, thread_id FROM bids where thread_id is not NULL")
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 
 async def get_bid_by_thread_id(thread_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT id FROM bid WHERE thread_id = $1",
             thread_id
         )
         return dict(row) if row else None
-    finally:
-        await conn.close()
 
 
 async def get_orders_by_company(company_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT * FROM bid WHERE company_id = $1", company_id
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
     
 
 async def get_thread_information(tg_id: int) -> int | None:
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT inspection_id FROM groups WHERE tg_id = $1", tg_id
         )
         return row["inspection_id"] if row else None
-    finally:
-        await conn.close()
     
 async def get_thread_clients(tg_id: int) -> int | None:
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT clients_id FROM groups WHERE tg_id = $1", tg_id
         )
         return row["clients_id"] if row else None
-    finally:
-        await conn.close()
 
 async def get_all_users(manager_id: int) -> int | None:
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT group_id FROM users WHERE id = $1 LIMIT 1", manager_id
         )
         return row["group_id"] if row else None
-    finally:
-        await conn.close()
 
 async def get_manager_group(id: int) -> int | None:
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT tg_id FROM groups WHERE id = $1 LIMIT 1", id
         )
         return row["tg_id"] if row else None
-    finally:
-        await conn.close()
 
 async def get_my_order(id: int) -> int | None:
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT count(id) as cnt FROM bid WHERE status = 'open' AND manager_id = $1", id
         )
         return row["cnt"] if row else None
-    finally:
-        await conn.close()
 
 async def get_order_by_id(order_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT * FROM bid WHERE id = $1", order_id
         )
         return dict(row) if row else None
-    finally:
-        await conn.close()
 
 async def get_all_orders_by_status(statuses: list):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         placeholders = ','.join(f"${i+1}" for i in range(len(statuses)))
         rows = await conn.fetch(
             f"SELECT * FROM bid WHERE status IN ({placeholders})", *statuses
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 async def get_orders_by_status(user_id: int, statuses: list):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         placeholders = ','.join(f"${i+2}" for i in range(len(statuses)))
         query = f"SELECT * FROM bid WHERE manager_id = $1 AND status IN ({placeholders})"
         rows = await conn.fetch(query, user_id, *statuses)
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 async def update_order_status(order_id: str, status: str):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         await conn.execute(
             "UPDATE bid SET status = $1 WHERE id = $2", status, order_id
         )
-    finally:
-        await conn.close()
 
 async def assign_manager_to_order(order_id: str, manager_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         await conn.execute(
             "UPDATE bid SET manager_id = $1 WHERE id = $2", manager_id, order_id
         )
-    finally:
-        await conn.close()
 
 
 async def clear_manager_for_order(order_id: str):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         await conn.execute(
             "UPDATE bid SET manager_id = NULL WHERE id = $1", order_id
         )
-    finally:
-        await conn.close()
 
 async def get_user_orders_by_single_status(user_id: int, status: str):
     return await get_orders_by_status(user_id, [status])
@@ -173,89 +171,64 @@ async def get_all_user_orders(user_id: int):
     return await get_orders_by_status(user_id, all_statuses)
 
 async def get_all_open_orders():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch("SELECT * FROM bid WHERE status = 'open'")
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 
 async def get_all_orders_for_me(manager_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT * FROM bid WHERE manager_id = $1", manager_id
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 
 async def get_bid_info(id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT * FROM bid WHERE id = $1", id
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 async def get_all_open_orders_for_me(manager_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT * FROM bid WHERE status = 'open' AND manager_id = $1", manager_id
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 
 async def get_orders_with_deadline():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch("SELECT * FROM bid WHERE deadline IS NOT NULL")
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 
 async def get_orders_with_opened_at():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT * FROM bid WHERE opened_at IS NOT NULL ORDER BY opened_at DESC"
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 async def get_open_orders_with_opened_at():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT * FROM bid WHERE status = 'open' AND manager_id IS NULL AND opened_at IS NOT NULL ORDER BY opened_at DESC"
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
     
 async def get_open_orders_with_opened_at_day():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT * FROM bid WHERE status = 'open' AND opened_at IS NOT NULL AND opened_at >= NOW() - INTERVAL '1 day' ORDER BY opened_at DESC"
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 
 async def get_available_orders_by_company(company_id: int, user_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             """
             SELECT * FROM bid
@@ -265,12 +238,9 @@ async def get_available_orders_by_company(company_id: int, user_id: int):
             company_id, user_id
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 async def get_companies_with_disabled_orders():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             """
             SELECT DISTINCT c.id, c.name
@@ -281,96 +251,133 @@ async def get_companies_with_disabled_orders():
             """
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 async def get_disabled_orders_by_company(company_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT * FROM bid WHERE company_id = $1 AND status = 'disabled'",
             company_id
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 async def get_active_manager_ids():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT DISTINCT manager_id FROM bid WHERE manager_id IS NOT NULL AND status IN ('progress','review')"
         )
         return [row["manager_id"] for row in rows]
-    finally:
-        await conn.close()
 
 
 async def get_progress_manager_ids():
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             "SELECT DISTINCT manager_id FROM bid WHERE manager_id IS NOT NULL AND status = 'progress'"
         )
         return [row["manager_id"] for row in rows]
-    finally:
-        await conn.close()
 
 
 async def mark_order_open(order_id: str):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         await conn.execute(
             "UPDATE bid SET status = 'open', opened_at = CURRENT_TIMESTAMP WHERE id = $1",
             order_id
         )
-    finally:
-        await conn.close()
 
 async def get_open_orders_older_than(min_age_seconds: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         rows = await conn.fetch(
             """
             SELECT *
             FROM bid
             WHERE status = 'open'
               AND opened_at IS NOT NULL
-              AND EXTRACT(EPOCH FROM (NOW() - opened_at)) >= $1
+              AND opened_at <= NOW() - make_interval(secs => $1)
             ORDER BY opened_at ASC
             """,
             min_age_seconds
         )
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
+
+async def get_unshown_open_orders_older_than(min_age_seconds: int):
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT *
+            FROM bid
+            WHERE status = 'open'
+              AND shown_to_bot = FALSE
+              AND opened_at IS NOT NULL
+              AND opened_at <= NOW() - make_interval(secs => $1)
+            ORDER BY opened_at ASC
+            """,
+            min_age_seconds
+        )
+        return [dict(row) for row in rows]
+
+async def get_companies_by_ids(company_ids: list):
+    if not company_ids:
+        return {}
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(
+            "SELECT * FROM companies WHERE id = ANY($1::bigint[])", list(company_ids)
+        )
+        return {row["id"]: dict(row) for row in rows}
+
+async def get_dealers_by_ids(dealer_ids: list):
+    if not dealer_ids:
+        return {}
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(
+            "SELECT * FROM dealers WHERE id = ANY($1::bigint[])", list(dealer_ids)
+        )
+        return {row["id"]: dict(row) for row in rows}
 
 async def get_company_by_id(company_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT * FROM companies WHERE id = $1", company_id
         )
         return dict(row) if row else None
-    finally:
-        await conn.close()
 
 async def get_dealer_by_id(dealer_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT * FROM dealers WHERE id = $1", dealer_id
         )
         return dict(row) if row else None
-    finally:
-        await conn.close()
+
+async def get_analytics_snapshot():
+    """
+    Сводка из материализованных представлений аналитики CRM (пересчитывает celery beat)
+    """
+    async with get_db_connection() as conn:
+        summary = await conn.fetchrow(
+            """
+            SELECT (SELECT refreshed_at FROM analytics_refresh_state WHERE id = 1) AS refreshed_at,
+                   (SELECT coalesce(sum(open), 0) FROM analytics_open_backlog) AS open,
+                   (SELECT coalesce(sum(in_progress), 0) FROM analytics_open_backlog) AS in_progress,
+                   (SELECT coalesce(sum(unassigned), 0) FROM analytics_open_backlog) AS unassigned
+            """
+        )
+        trend = await conn.fetchrow(
+            "SELECT * FROM analytics_daily_trend ORDER BY day DESC LIMIT 1"
+        )
+        inspectors = await conn.fetch(
+            """
+            SELECT * FROM analytics_inspector_throughput
+            ORDER BY rank_30d, manager_id
+            LIMIT 5
+            """
+        )
+        return {
+            "summary": dict(summary),
+            "trend": dict(trend) if trend else None,
+            "inspectors": [dict(row) for row in inspectors],
+        }
 
 async def _exec(query: str, *params):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         await conn.execute(query, *params)
-    finally:
-        await conn.close()
 
 async def ensure_user_exists(user_id: int):
     await _exec(
@@ -390,8 +397,7 @@ async def reset_checklist_answers(order_id: int):
     )
 
 async def get_checklist_answers(order_id: int):
-    conn = await get_db_connection()
-    try:
+    async with get_db_connection() as conn:
         row = await conn.fetchrow(
             "SELECT checklist_point1, checklist_point2 FROM bid WHERE id = $1",
             order_id
@@ -399,8 +405,6 @@ async def get_checklist_answers(order_id: int):
         if row:
             return dict(row)
         return {"checklist_point1": None, "checklist_point2": None}
-    finally:
-        await conn.close()
 
 async def set_checklist_answer_text(order_id: int, q_index: int, value_code: str):
     col = "checklist_point1" if q_index == 1 else "checklist_point2"
@@ -416,6 +420,14 @@ async def save_arrival_time(order_id: int, arrival_time: datetime | None, manage
 async def mark_order_as_shown(order_id: int):
     await _exec("UPDATE bid SET shown_to_bot = TRUE WHERE id = $1", order_id)
 
+async def mark_orders_as_shown(order_ids: list):
+    if not order_ids:
+        return
+    await _exec(
+        "UPDATE bid SET shown_to_bot = TRUE WHERE id = ANY($1::bigint[])",
+        list(order_ids)
+    )
+
 async def insert_file_record(bid_id: int, file_path: str):
     await _exec(
         "INSERT INTO photo (bid_id, file_url) VALUES ($1, $2)",
@@ -423,7 +435,6 @@ async def insert_file_record(bid_id: int, file_path: str):
     )
 
 async def get_photo_by_bid_id(bid_id: int):
-    conn = await get_db_connection()
-    rows = await conn.fetch("SELECT file_url FROM photo WHERE bid_id = $1", bid_id)
-    await conn.close()
+    async with get_db_connection() as conn:
+        rows = await conn.fetch("SELECT file_url FROM photo WHERE bid_id = $1", bid_id)
     return [dict(row) for row in rows] if rows else []
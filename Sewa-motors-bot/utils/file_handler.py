@@ -7,6 +7,7 @@ from utils.data import (
     insert_file_record,
     get_photo_by_bid_id,
 )
+from utils.media_store import temp_path, store_file, link_into
 from aiogram.types import FSInputFile
 import logging
 import os
@@ -24,9 +25,13 @@ async def save_file_with_stage(bot, file_id: str, user_id: int, order_id, stage_
 
         stage_prefix = _stage_prefix(stage_title)
         file_path = os.path.join(order_folder, f"{stage_prefix}_{datetime.now().strftime('%H%M%S')}_{file_name}")
-        relative_file_path = os.path.relpath(file_path, start='storage')
-        await insert_file_record(order_id, relative_file_path)
-        await bot.download_file(file.file_path, file_path)
+        # Файл хранится один раз в хранилище по содержимому, в папке заказа - жесткая ссылка на него.
+        # Запись в photo - после скачивания: CRM строит превью по готовому файлу
+        downloaded = temp_path()
+        await bot.download_file(file.file_path, downloaded)
+        stored_name = await store_file(downloaded, file_name)
+        link_into(stored_name, file_path)
+        await insert_file_record(order_id, stored_name)
         
         return True, file_path
 
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import logging
+import os
+from contextlib import asynccontextmanager
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, InputMediaPhoto, InputMediaVideo
+from config import redis_client, FILE_ID_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+FILE_ID_KEY = "tg_file_id:{digest}"
+
+# path -> (mtime, size, sha256), чтобы не перечитывать файл при каждой отправке
+_digests: dict[str, tuple[float, int, str]] = {}
+# Отдельная блокировка на файл: первую загрузку делает один отправитель,
+# остальные ждут и получают готовый file_id. path -> [блокировка, сколько отправителей ее держат или ждут];
+# запись удаляется, когда ее отпускает последний
+_upload_locks: dict[str, list] = {}
+
+# Ответы Telegram, после которых file_id из кэша нужно забыть и загрузить файл заново.
+# Прочие BadRequest (подпись, chat_id и т.п.) повторная загрузка не исправит
+STALE_FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file identifier", "invalid file_id", "invalid file id")
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+async def file_digest(path: str) -> str:
+    """
+    Возвращает SHA-256 содержимого файла, пересчитывая его только при изменении файла
+    """
+    stat = os.stat(path)
+    cached = _digests.get(path)
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+    digest = await asyncio.to_thread(_sha256, path)
+    _digests[path] = (stat.st_mtime, stat.st_size, digest)
+    return digest
+
+
+async def get_cached_file_id(path: str) -> str | None:
+    try:
+        return await redis_client.get(FILE_ID_KEY.format(digest=await file_digest(path)))
+    except Exception as e:
+        logger.error(f"file_id_cache: ошибка чтения для {path}: {e}")
+        return None
+
+
+async def remember_file_id(path: str, file_id: str):
+    try:
+        await redis_client.set(
+            FILE_ID_KEY.format(digest=await file_digest(path)), file_id, ex=FILE_ID_CACHE_TTL
+        )
+    except Exception as e:
+        logger.error(f"file_id_cache: ошибка записи для {path}: {e}")
+
+
+async def forget_file_id(path: str):
+    try:
+        await redis_client.delete(FILE_ID_KEY.format(digest=await file_digest(path)))
+    except Exception as e:
+        logger.error(f"file_id_cache: ошибка удаления для {path}: {e}")
+
+
+def extract_file_id(message) -> str | None:
+    """
+    Достает file_id из отправленного сообщения (фото, видео или документ)
+    """
+    if getattr(message, "photo", None):
+        return message.photo[-1].file_id
+    if getattr(message, "video", None):
+        return message.video.file_id
+    if getattr(message, "document", None):
+        return message.document.file_id
+    return None
+
+
+def is_stale_file_id(error: TelegramBadRequest) -> bool:
+    message = (error.message or "").lower()
+    return any(marker in message for marker in STALE_FILE_ID_ERRORS)
+
+
+@asynccontextmanager
+async def _upload_lock(path: str):
+    entry = _upload_locks.setdefault(path, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            _upload_locks.pop(path, None)
+
+
+async def _send_single(method, field: str, path: str, **kwargs):
+    file_id = await get_cached_file_id(path)
+    if file_id:
+        try:
+            return await method(**{field: file_id}, **kwargs)
+        except TelegramBadRequest as e:
+            if not is_stale_file_id(e):
+                raise
+            logger.warning(f"file_id_cache: file_id для {path} отклонен ({e}), загружаем заново")
+            await forget_file_id(path)
+
+    async with _upload_lock(path):
+        file_id = await get_cached_file_id(path)
+        if file_id:
+            return await method(**{field: file_id}, **kwargs)
+        message = await method(**{field: FSInputFile(path)}, **kwargs)
+        new_file_id = extract_file_id(message)
+        if new_file_id:
+            await remember_file_id(path, new_file_id)
+        return message
+
+
+async def send_photo_cached(bot, chat_id: int, path: str, **kwargs):
+    """
+    Отправляет фото, загружая файл в Telegram только при первой отправке
+    """
+    return await _send_single(bot.send_photo, "photo", path, chat_id=chat_id, **kwargs)
+
+
+async def send_video_cached(bot, chat_id: int, path: str, **kwargs):
+    """
+    Отправляет видео, загружая файл в Telegram только при первой отправке
+    """
+    return await _send_single(bot.send_video, "video", path, chat_id=chat_id, **kwargs)
+
+
+async def send_media_group_cached(bot, chat_id: int, paths: list, media_type: str = "photo", **kwargs):
+    """
+    Отправляет альбом, подставляя известные file_id вместо повторной загрузки
+
+    Args:
+        bot: Экземпляр бота
+        chat_id: ID чата
+        paths: Пути к локальным файлам альбома
+        media_type: "photo" или "video"
+    """
+    media_cls = InputMediaPhoto if media_type == "photo" else InputMediaVideo
+
+    async def _build(use_cache: bool):
+        file_ids = []
+        for path in paths:
+            file_ids.append(await get_cached_file_id(path) if use_cache else None)
+        media = [
+            media_cls(media=file_id or FSInputFile(path))
+            for path, file_id in zip(paths, file_ids)
+        ]
+        return media, any(file_ids)
+
+    media, used_cache = await _build(use_cache=True)
+    try:
+        messages = await bot.send_media_group(chat_id, media, **kwargs)
+    except TelegramBadRequest as e:
+        if not used_cache or not is_stale_file_id(e):
+            raise
+        logger.warning(f"file_id_cache: альбом отклонен ({e}), загружаем файлы заново")
+        for path in paths:
+            await forget_file_id(path)
+        media, _ = await _build(use_cache=False)
+        messages = await bot.send_media_group(chat_id, media, **kwargs)
+
+    for path, message in zip(paths, messages):
+        file_id = extract_file_id(message)
+        if file_id:
+            await remember_file_id(path, file_id)
+    return messages
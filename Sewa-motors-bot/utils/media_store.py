@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+from utils.data import get_db_connection
+
+# Хранилище файлов по содержимому, общее с CRM (demo/media_store.py):
+# storage/cas/ab/cd/<sha256><ext>, учет блобов - таблица media_blob.
+# Ссылки (ref_count) считают триггеры БД по путям cas/... в photo и demo_chatmedia.
+STORAGE_ROOT = "storage"
+CAS_DIR = "cas"
+CAS_TMP_DIR = os.path.join(STORAGE_ROOT, CAS_DIR, "tmp")
+HASH_CHUNK = 1024 * 1024
+
+REGISTER_SQL = """
+INSERT INTO media_blob (sha256, name, size, ref_count, last_seen)
+VALUES ($1, $2, $3, 0, now())
+ON CONFLICT (sha256) DO UPDATE SET
+    last_seen = now(),
+    name = coalesce(media_blob.name, EXCLUDED.name),
+    size = coalesce(media_blob.size, EXCLUDED.size)
+RETURNING name
+"""
+
+
+def temp_path():
+    """
+    Путь для скачивания файла: на том же томе, что и хранилище, чтобы перенос был атомарным
+    """
+    os.makedirs(CAS_TMP_DIR, exist_ok=True)
+    return os.path.join(CAS_TMP_DIR, uuid.uuid4().hex)
+
+
+def _digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _move_into_store(tmp_path, name):
+    target = os.path.join(STORAGE_ROOT, name)
+    if os.path.exists(target):
+        # Такой файл уже есть: копия не нужна
+        os.unlink(tmp_path)
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, target)
+
+
+async def store_file(tmp_path: str, filename: str = "") -> str:
+    """
+    Кладет скачанный файл в хранилище и возвращает его имя от storage/ (cas/ab/cd/<sha256><ext>).
+    Если такое содержимое уже сохранено, временный файл удаляется
+    """
+    digest = await asyncio.to_thread(_digest, tmp_path)
+    ext = os.path.splitext(filename)[1].lower()[:10]
+    candidate = "/".join([CAS_DIR, digest[:2], digest[2:4], digest + ext])
+    async with get_db_connection() as conn:
+        name = await conn.fetchval(REGISTER_SQL, digest, candidate, os.path.getsize(tmp_path))
+    await asyncio.to_thread(_move_into_store, tmp_path, name)
+    return name
+
+
+def link_into(name: str, target: str):
+    """
+    Жесткая ссылка на файл хранилища по обычному пути (папки заказов бот читает с диска)
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = os.path.join(os.path.dirname(target), f".link-{uuid.uuid4().hex}")
+    try:
+        os.link(os.path.join(STORAGE_ROOT, name), tmp)
+    except OSError:
+        shutil.copy2(os.path.join(STORAGE_ROOT, name), tmp)
+    os.replace(tmp, target)
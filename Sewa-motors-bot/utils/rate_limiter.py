@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from aiogram.exceptions import TelegramRetryAfter
+from config import TG_GLOBAL_RATE, TG_PER_CHAT_INTERVAL, TG_RETRY_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramRateLimiter:
+    """
+    Ограничитель частоты отправки сообщений в Telegram
+
+    Выдает слоты не чаще global_rate в секунду на весь бот и не чаще
+    одного сообщения в per_chat_interval секунд в один чат.
+    """
+
+    def __init__(self, global_rate: float, per_chat_interval: float, retry_attempts: int = 3):
+        self._interval = 1.0 / global_rate
+        self._per_chat_interval = per_chat_interval
+        self._retry_attempts = retry_attempts
+        self._next_slot = 0.0
+        self._chat_next_slot: dict[int, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, chat_id: int):
+        """
+        Ждет свободный слот для отправки в указанный чат
+        """
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            slot = max(slot, self._chat_next_slot.get(chat_id, 0.0))
+            self._chat_next_slot[chat_id] = slot + self._per_chat_interval
+            if len(self._chat_next_slot) > 10000:
+                self._chat_next_slot = {
+                    cid: t for cid, t in self._chat_next_slot.items() if t > now
+                }
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def send(self, chat_id: int, method, *args, **kwargs):
+        """
+        Вызывает метод бота в пределах лимитов, повторяя при RetryAfter
+
+        Args:
+            chat_id: ID чата, в который идет отправка
+            method: Метод бота (bot.send_message, bot.send_photo и т.д.)
+        """
+        for attempt in range(self._retry_attempts + 1):
+            await self.wait(chat_id)
+            try:
+                return await method(*args, **kwargs)
+            except TelegramRetryAfter as e:
+                if attempt >= self._retry_attempts:
+                    raise
+                logger.warning(f"Telegram просит подождать {e.retry_after} с перед отправкой в {chat_id}")
+                await asyncio.sleep(e.retry_after)
+
+
+telegram_limiter = TelegramRateLimiter(TG_GLOBAL_RATE, TG_PER_CHAT_INTERVAL, TG_RETRY_ATTEMPTS)
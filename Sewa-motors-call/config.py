@@ -1,9 +1,10 @@
 import os
+import time
+import logging
 import sqlite3
 from dotenv import load_dotenv
 import asyncpg
 import asyncio
-import os
 
 # Загружаем переменные окружения из файла .env
 load_dotenv(override=True)
@@ -17,6 +18,18 @@ DB_PORT = os.getenv("DB_PORT", "5432")
 # Токен бота из переменных окружения
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
+# Время жизни кэша ролей (сек); изменения в users/groups сбрасывают кэш сразу
+ROLES_CACHE_TTL = float(os.getenv("ROLES_CACHE_TTL", "300"))
+ROLES_CHANNEL = "roles_changed"
+ROLES_LISTENER_RETRY_MIN = 1.0   # Первая пауза перед переподключением LISTEN, сек
+ROLES_LISTENER_RETRY_MAX = 60.0  # Потолок паузы (удваивается после каждой неудачи), сек
+
+# Лента изменений заявок (LISTEN/NOTIFY на таблице bid)
+BID_CHANNEL = "bid_changes"
+BID_FALLBACK_POLL_INTERVAL = float(os.getenv("BID_FALLBACK_POLL_INTERVAL", "300"))  # Резервная проверка, сек
+BID_DISCONNECTED_POLL_INTERVAL = float(os.getenv("BID_DISCONNECTED_POLL_INTERVAL", "10"))  # Опрос, пока нет подписки, сек
+OPEN_BIDS_DIGEST_INTERVAL = float(os.getenv("OPEN_BIDS_DIGEST_INTERVAL", "30"))    # Сводка по открытым заявкам, сек
+
 # Настройки для работы с файлами
 MAX_FILE_SIZE = 40 * 1024 * 1024  # Максимальный размер файла: 40 МБ
 STORAGE_PATH = "storage/files"     # Путь для хранения файлов
@@ -26,63 +39,174 @@ ALLOWED_FILE_TYPES = ["photo", "document", "video"]  # Разрешенные т
 # Создаем папку для хранения файлов, если её нет
 os.makedirs(STORAGE_PATH, exist_ok=True)
 
-# Глобальные переменные для хранения ролей пользователей
-_CALLER_ID = None        # ID администратора
-_ALLOWED_USERS = []     # Список разрешенных пользователей
-_ALLOWED_GROUPS = []     # Список разрешенных пользователей
+logger = logging.getLogger(__name__)
+
+# Реестр ролей пользователей (кэш в памяти)
+_CALLER_ID = set()          # ID прозвонщиков
+_ALLOWED_USERS = set()      # Множество разрешенных пользователей
+_ALLOWED_GROUPS = set()     # Множество разрешенных групп
+_roles_loaded_at = 0.0      # Момент последней загрузки (time.monotonic)
+_roles_generation = 0       # Растет при каждом сбросе кэша
+_roles_lock = asyncio.Lock()
+_roles_listener = None      # Отдельное соединение для LISTEN roles_changed
+_roles_reconnect_task = None  # Переподключение LISTEN после обрыва
+
+
+async def _connect():
+    return await asyncpg.connect(
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        host=DB_HOST,
+        port=DB_PORT
+    )
+
 
 async def load_roles_from_db():
-    global _CALLER_ID, _ALLOWED_USERS, _ALLOWED_GROUPS
+    """
+    Загружает роли пользователей из базы данных
+    При ошибке сохраняет последние известные значения.
+    Если во время загрузки кэш сбросили, результат не считается свежим
+    и следующий запрос перечитает роли
+    """
+    global _CALLER_ID, _ALLOWED_USERS, _ALLOWED_GROUPS, _roles_loaded_at
+    generation = _roles_generation
     try:
-        conn = await asyncpg.connect(
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        rows = await conn.fetch("SELECT id FROM users WHERE is_caller = True")
-        _CALLER_ID = [r["id"] for r in rows]
-
-        rows = await conn.fetch("SELECT id FROM users")
-        _ALLOWED_USERS = [r["id"] for r in rows]
-
-        rows = await conn.fetch("SELECT tg_id FROM groups")
-        _ALLOWED_GROUPS = [r["tg_id"] for r in rows]
+        conn = await _connect()
+        try:
+            users = await conn.fetch("SELECT id, is_caller FROM users")
+            groups = await conn.fetch("SELECT tg_id FROM groups")
+        finally:
+            await conn.close()
+
+        _CALLER_ID = {r["id"] for r in users if r["is_caller"]}
+        _ALLOWED_USERS = {r["id"] for r in users}
+        _ALLOWED_GROUPS = {r["tg_id"] for r in groups}
+        if generation == _roles_generation:
+            _roles_loaded_at = time.monotonic()
+    except Exception as e:
+        logger.error(f"Ошибка загрузки ролей из БД: {e}")
 
-        await conn.close()
+
+def invalidate_roles():
+    """
+    Помечает реестр ролей устаревшим, следующий запрос перечитает его из БД
+    """
+    global _roles_loaded_at, _roles_generation
+    _roles_generation += 1
+    _roles_loaded_at = 0.0
+
+
+async def _ensure_roles():
+    """
+    Перезагружает роли только если кэш пуст, устарел или был сброшен
+    """
+    if _roles_loaded_at and time.monotonic() - _roles_loaded_at < ROLES_CACHE_TTL:
+        return
+    async with _roles_lock:
+        if _roles_loaded_at and time.monotonic() - _roles_loaded_at < ROLES_CACHE_TTL:
+            return
+        await load_roles_from_db()
+
+
+def _on_roles_changed(connection, pid, channel, payload):
+    logger.info(f"Роли изменены в таблице {payload}, кэш сброшен")
+    invalidate_roles()
+
+
+def _on_roles_listener_lost(connection):
+    global _roles_listener
+    logger.warning("Соединение LISTEN roles_changed потеряно, переподключаемся")
+    _roles_listener = None
+    invalidate_roles()
+    _schedule_roles_reconnect()
+
+
+def _schedule_roles_reconnect():
+    global _roles_reconnect_task
+    if _roles_reconnect_task is None or _roles_reconnect_task.done():
+        _roles_reconnect_task = asyncio.get_running_loop().create_task(_reconnect_roles_listener())
+
+
+async def _reconnect_roles_listener():
+    """
+    Переподключает LISTEN с растущей паузой; пока подписки нет, кэш живет по TTL
+    """
+    delay = ROLES_LISTENER_RETRY_MIN
+    while _roles_listener is None:
+        await asyncio.sleep(delay)
+        if await _connect_roles_listener():
+            # Уведомления за время обрыва потеряны
+            invalidate_roles()
+            logger.info(f"Подписка на {ROLES_CHANNEL} восстановлена")
+            return
+        delay = min(delay * 2, ROLES_LISTENER_RETRY_MAX)
+
+
+async def _connect_roles_listener() -> bool:
+    global _roles_listener
+    try:
+        conn = await _connect()
+        await conn.add_listener(ROLES_CHANNEL, _on_roles_changed)
+        conn.add_termination_listener(_on_roles_listener_lost)
+        _roles_listener = conn
+        return True
     except Exception as e:
-        print(f"Ошибка загрузки ролей из БД: {e}")
-        _CALLER_ID = []
-        _ALLOWED_USERS = []
-        _ALLOWED_GROUPS = []
+        logger.error(f"Не удалось подписаться на {ROLES_CHANNEL}: {e}")
+        return False
+
+
+async def start_roles_listener():
+    """
+    Подписывается на уведомления roles_changed (триггер на users/groups).
+    Если подключиться не удалось или соединение оборвалось, повторяет попытки в фоне
+    """
+    if _roles_listener is not None:
+        return
+    if not await _connect_roles_listener():
+        _schedule_roles_reconnect()
+
+
+async def stop_roles_listener():
+    """
+    Закрывает соединение подписки на изменения ролей
+    """
+    global _roles_listener, _roles_reconnect_task
+    task, _roles_reconnect_task = _roles_reconnect_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    conn, _roles_listener = _roles_listener, None
+    if conn is not None:
+        # Штатное закрытие - не обрыв, переподключение не нужно
+        conn.remove_termination_listener(_on_roles_listener_lost)
+        await conn.close()
+
 
 async def get_caller_id():
     """
-    Возвращает ID администратора
-    Перезагружает роли из БД перед возвратом
+    Возвращает множество ID прозвонщиков из реестра ролей
     """
-    await load_roles_from_db()
+    await _ensure_roles()
     return _CALLER_ID
 
 
 async def get_allowed_users():
     """
-    Возвращает список всех разрешенных пользователей
-    Перезагружает роли из БД перед возвратом
+    Возвращает множество всех разрешенных пользователей из реестра ролей
     """
-    await load_roles_from_db()
+    await _ensure_roles()
     return _ALLOWED_USERS
 
 
-
-
 async def get_allowed_groups():
     """
-    Возвращает список всех разрешенных пользователей
-    Перезагружает роли из БД перед возвратом
+    Возвращает множество всех разрешенных групп из реестра ролей
     """
-    await load_roles_from_db()
+    await _ensure_roles()
     return _ALLOWED_GROUPS
 
 
@@ -98,7 +222,3 @@ async def is_authorized(user_id: int) -> bool:
     """
     allowed_users = await get_allowed_users()
     return user_id in allowed_users
-
-
-# # Загружаем роли при импорте модуля
-load_roles_from_db
@@ -100,7 +100,6 @@ async def reminder_open_bids(bot):
             f"🔔 Внимание! Есть открытые заявки.\n"
             f"Количество открытых заявок на сегодня: <b> {count} </b>"
         )
-        await config.load_roles_from_db()
 
         allowed_users = set(
             uid
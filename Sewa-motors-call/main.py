@@ -1,10 +1,12 @@
 import asyncio
 from aiogram import Bot, Dispatcher
+import config
 from config import BOT_TOKEN
 from handlers import menu
 from handlers.menu import router
 import logging
 from handlers.notifications import reminder_job, reminder_open_bids
+from utils.bid_feed import BidChangeFeed
 
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
@@ -12,32 +14,45 @@ dp.include_router(menu.router)
 logging.basicConfig(level=logging.INFO)  # INFO или DEBUG
 logger = logging.getLogger(__name__)
 async def main():
+    # Загружаем роли и подписываемся на их изменения
+    await config.load_roles_from_db()
+    await config.start_roles_listener()
+
+    def reminder_delay(event):
+        """
+        Новые заявки на прозвон (status = ring) рассылаются сразу
+        """
+        return 0 if event.get("status") == "ring" else None
+
+    bid_feed = BidChangeFeed(
+        lambda: reminder_job(bot),
+        fallback_interval=config.BID_FALLBACK_POLL_INTERVAL,
+        delay_for=reminder_delay,
+        poll_interval=config.BID_DISCONNECTED_POLL_INTERVAL,
+    )
+
+    async def open_bids_digest_loop():
+        """
+        Периодически напоминает прозвонщикам об открытых заявках
+        """
+        while True:
+            await asyncio.sleep(config.OPEN_BIDS_DIGEST_INTERVAL)
+            try:
+                await reminder_open_bids(bot)
+            except Exception as e:
+                logger.error(f"reminder_open_bids error: {e}")
+
+    # Запускаем ленту изменений заявок и периодическую сводку
+    bid_feed.start()
+    digest_task = asyncio.create_task(open_bids_digest_loop())
+
     try:
-        async def reminders_loop():
-            """
-            Бесконечный цикл для отправки напоминаний
-            Проверяет заказы каждую минуту и отправляет уведомления
-            """
-            timer = 0
-            while True:
-                try:
-                    await reminder_job(bot)
-                    if timer >= 20:
-                        logger.info("15 минут прошли — запускаем reminder_open_bids")
-                        await reminder_open_bids(bot)
-                        timer = 0
-                    else:
-                        logger.info(f"Таймер: {timer} секунд")
-                except Exception:
-                    pass
-                await asyncio.sleep(10)
-                timer +=10
-
-        # Запускаем фоновую задачу для напоминаний
-        asyncio.create_task(reminders_loop())
         await dp.start_polling(bot)
     finally:
+        digest_task.cancel()
+        await bid_feed.stop()
         await bot.session.close()
+        await config.stop_roles_listener()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import asyncpg
+from config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, BID_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# Копия модуля лежит в Sewa-motors-bot/utils/bid_feed.py: каждый бот собирается и монтируется
+# только из своего каталога, общий пакет контейнеры не видят. Правки вносить в обе копии
+
+LISTEN_RETRY_MIN = 1.0   # Первая пауза перед переподключением LISTEN, сек
+LISTEN_RETRY_MAX = 60.0  # Потолок паузы (удваивается после каждой неудачи), сек
+
+
+class BidChangeFeed:
+    """
+    Лента изменений заявок на основе Postgres LISTEN/NOTIFY
+
+    Триггер на таблице bid публикует событие при создании заявки и смене
+    статуса. Лента держит одно отдельное соединение с подпиской и будит
+    обработчик сразу после подходящего события. Обработчик выполняется
+    строго по одному, пачка событий схлопывается в один запуск. Если
+    событий нет дольше fallback_interval, обработчик все равно запускается,
+    чтобы подобрать пропущенные уведомления.
+
+    Оборванная подписка восстанавливается в фоне с растущей паузой; пока
+    подписки нет, обработчик запускается каждые poll_interval секунд,
+    как прежний опрос.
+    """
+
+    def __init__(self, handler, fallback_interval: float, delay_for=None, poll_interval: float = 10):
+        """
+        Args:
+            handler: Корутина без аргументов, которая обрабатывает изменения
+            fallback_interval: Интервал резервного запуска без событий, сек
+            delay_for: Функция event -> задержка в секундах или None,
+                если событие не требует запуска обработчика
+            poll_interval: Интервал запуска, пока подписки нет, сек
+        """
+        self._handler = handler
+        self._fallback_interval = fallback_interval
+        self._poll_interval = poll_interval
+        self._delay_for = delay_for or (lambda event: 0)
+        self._wakeup = asyncio.Event()
+        self._conn = None
+        self._task = None
+        self._reconnect_task = None
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.error(f"bid_feed: некорректное событие {payload!r}")
+            return
+        delay = self._delay_for(event)
+        if delay is None:
+            return
+        logger.info(f"bid_feed: событие {event}, запуск через {delay} с")
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.wake)
+        else:
+            self.wake()
+
+    def _on_connection_lost(self, connection):
+        logger.warning("bid_feed: соединение LISTEN потеряно, переподключаемся")
+        self._conn = None
+        self.wake()
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = LISTEN_RETRY_MIN
+        while self._conn is None:
+            await asyncio.sleep(delay)
+            if await self._connect():
+                # События за время обрыва потеряны: обработчик подберет их сам
+                self.wake()
+                return
+            delay = min(delay * 2, LISTEN_RETRY_MAX)
+
+    async def _connect(self) -> bool:
+        try:
+            conn = await asyncpg.connect(
+                user=DB_USER,
+                password=DB_PASSWORD,
+                database=DB_NAME,
+                host=DB_HOST,
+                port=DB_PORT
+            )
+            await conn.add_listener(BID_CHANNEL, self._on_notify)
+            conn.add_termination_listener(self._on_connection_lost)
+            self._conn = conn
+            logger.info(f"bid_feed: подписка на {BID_CHANNEL} активна")
+            return True
+        except Exception as e:
+            logger.error(f"bid_feed: не удалось подписаться на {BID_CHANNEL}: {e}")
+            return False
+
+    async def _run(self):
+        if not await self._connect():
+            self._schedule_reconnect()
+        while True:
+            try:
+                await self._handler()
+            except Exception as e:
+                logger.error(f"bid_feed: ошибка обработчика: {e}")
+            timeout = self._fallback_interval if self._conn is not None else self._poll_interval
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if self._conn is not None:
+                    logger.info("bid_feed: резервный запуск без событий")
+            self._wakeup.clear()
+
+    def start(self):
+        """
+        Запускает ленту: первый проход обработчика выполняется сразу
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._reconnect_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._reconnect_task = None
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            # Штатное закрытие - не обрыв, переподключение не нужно
+            conn.remove_termination_listener(self._on_connection_lost)
+            await conn.close()
@@ -1,8 +1,12 @@
 from django.contrib import admin
 from django.core.exceptions import ValidationError
 from .models import *
-from django.utils.html import format_html
+from django.db.models import Count, Prefetch
+from django.utils.html import format_html, format_html_join
 from django.utils import timezone
+from demo.pagination import EstimatedCountPaginator
+from demo.response_cache import invalidate
+from demo.thumbnails import thumbnail_url
 
 
 @admin.register(Client)
@@ -16,16 +20,22 @@ class ClientAdmin(admin.ModelAdmin):
 
 @admin.register(StatusFile)
 class StatusFileAdmin(admin.ModelAdmin):
-    list_display = ('doc_type', 'file', 'uploaded_at', 'id')
+    list_display = ('doc_type', 'file', 'file_preview', 'uploaded_at', 'id')
     list_filter = ('doc_type', 'uploaded_at')
     search_fields = ('doc_type',)
     ordering = ('-uploaded_at',)
     list_per_page = 20
-    readonly_fields = ('uploaded_at',)
-    
+    readonly_fields = ('uploaded_at', 'file_preview')
+
+    def file_preview(self, obj):
+        if obj.thumbnails and obj.thumbnails.get("sizes"):
+            return format_html('<img src="{}" width="80" loading="lazy"/>', thumbnail_url(obj.file, obj.thumbnails))
+        return "-"
+    file_preview.short_description = 'Превью'
+
     fieldsets = (
         ('Основная информация', {
-            'fields': ('doc_type', 'file')
+            'fields': ('doc_type', 'file', 'file_preview')
         }),
         ('Метаданные', {
             'fields': ('uploaded_at',),
@@ -42,10 +52,16 @@ class StatusOrdersAdmin(admin.ModelAdmin):
     ordering = ('id',)
     list_per_page = 20
     filter_horizontal = ('files',)
-    
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(files_count=Count('files'))
+
     def get_files_count(self, obj):
-        return obj.files.count()
+        return obj.files_count
     get_files_count.short_description = 'Количество файлов'
+    get_files_count.admin_order_field = 'files_count'
     
     fieldsets = (
         ('Статус заказа', {
@@ -63,8 +79,11 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'client', 'VIN', 'number_order', 'number_note', 'date', 'status')
     list_filter = ('date', 'status__current_status', 'client')
     search_fields = ('VIN', 'number_order', 'number_note', 'client__name')
-    ordering = ('-date',)
+    ordering = ('-date', '-id')
     list_per_page = 20
+    list_select_related = ('client', 'status')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ('date',)
     
     fieldsets = (
@@ -94,6 +113,8 @@ class CompaniesAdmin(admin.ModelAdmin):
 
     def approve_company(self, request, queryset):
         queryset.update(is_approved=True)
+        # update не шлет сигналы company_changed: кэш ответов и ETag компаний сбрасываем сами
+        invalidate("company", *queryset.values_list("pk", flat=True))
 
     approve_company.short_description = "Одобрить компанию"
 
@@ -113,17 +134,25 @@ class DealersAdmin(admin.ModelAdmin):
 
     def photo_preview(self, obj):
         if obj.photo:
-            return format_html('<img src="{}" width="80"/>', obj.photo.url)
+            return format_html('<img src="{}" width="80" loading="lazy"/>', thumbnail_url(obj.photo, obj.thumbnails))
         return "-"
     photo_preview.short_description = 'Фото'
 
 @admin.register(CarsPhoto)
 class CarsPhotoAdmin(admin.ModelAdmin):
-    list_display = ('id', 'photo_preview')
-    
+    list_display = ('id', 'bid', 'photo_preview')
+    list_select_related = ('bid',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ('bid',)
+
     def photo_preview(self, obj):
         if obj.file_url:
-            return format_html('<img src="{}" width="100"/>', obj.file_url.url)
+            return format_html(
+                '<a href="{}" target="_blank"><img src="{}" width="100" loading="lazy"/></a>',
+                obj.file_url.url, thumbnail_url(obj.file_url, obj.thumbnails),
+            )
         return "-"
     photo_preview.short_description = 'Фото'
 
@@ -137,10 +166,23 @@ class UserAdmin(admin.ModelAdmin):
 class BidAdmin(admin.ModelAdmin):
     list_display = ('id', 'company', 'brand', 'model', 'year', 'status', 'dealer', 'photos_preview', 'thread_id')
     search_fields = ('brand', 'model', 'user__username', 'company__name', 'dealer__name')
+    # Фильтры идут по индексам bid_status_opened_idx, bid_company_status_idx и индексу dealer_id
     list_filter = ('status', 'company', 'dealer')
+    list_select_related = ('company', 'dealer')
     ordering = ('-id',)
     exclude = ('user', 'manager', 'opened_at', 'deadline')
     readonly_fields = ('company','photos_preview', 'checklist_point1','checklist_point2', 'arrived_time')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Фото всех заявок страницы - одним запросом вместо запроса на строку
+        photos = CarsPhoto.objects.only('id', 'bid_id', 'file_url', 'thumbnails').order_by('id')
+        return (
+            super().get_queryset(request)
+            .defer('search_vector')
+            .prefetch_related(Prefetch('photos', queryset=photos))
+        )
 
     def save_model(self, request, obj, form, change):
         if obj.status == "open" and not obj.opened_at:
@@ -156,10 +198,11 @@ class BidAdmin(admin.ModelAdmin):
         photos = obj.photos.all()
         if not photos:
             return "Нет фото"
-        html = ""
-        for p in photos:
-            html += f'<a href="{p.file_url.url}" target="_blank"><img src="{p.file_url}" width="50" style="margin-right:5px"/></a>'
-        return format_html(html)
+        return format_html_join(
+            "",
+            '<a href="{}" target="_blank"><img src="{}" width="50" loading="lazy" style="margin-right:5px"/></a>',
+            ((p.file_url.url, thumbnail_url(p.file_url, p.thumbnails)) for p in photos),
+        )
     photos_preview.short_description = "Фото"
 
 
@@ -174,7 +217,8 @@ class GroupsAdmin(admin.ModelAdmin):
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
-    pass
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 
@@ -183,6 +227,25 @@ class ChatMediaAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'name', 'size', 'ref_count', 'last_seen')
+    search_fields = ('sha256',)
+    ordering = ('-last_seen',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Счетчики ведут триггеры базы, файлы удаляет media_store_gc_task
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.site_header = "CRM Demo - Администрирование"
 admin.site.site_title = "CRM Demo"
 admin.site.index_title = "Панель управления"
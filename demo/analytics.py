@@ -0,0 +1,135 @@
+import logging
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Перекрытие окна обновления: транзакция, начатая до прошлого прогона и закоммиченная
+# после него, несет last_update из прошлого. Повторная обработка идемпотентна.
+WATERMARK_OVERLAP = "5 minutes"
+ANALYTICS_LOCK_ID = 7301   # pg_advisory_xact_lock: один пересчет за раз
+
+MATERIALIZED_VIEWS = ("analytics_open_backlog", "analytics_inspector_throughput", "analytics_daily_trend")
+
+# День открытия заявки считается по UTC, как и TIME_ZONE проекта
+REFRESH_SQL = [
+    """
+    CREATE TEMP TABLE analytics_changed ON COMMIT DROP AS
+    SELECT id, opened_at, company_id, manager_id, status, assigned_at, arrived_time
+    FROM bid
+    WHERE last_update > %(since)s
+    """,
+    """
+    CREATE TEMP TABLE analytics_touched_days ON COMMIT DROP AS
+    SELECT day FROM analytics_bid_facts WHERE bid_id IN (SELECT id FROM analytics_changed)
+    UNION
+    SELECT (opened_at AT TIME ZONE 'UTC')::date FROM analytics_changed WHERE opened_at IS NOT NULL
+    """,
+    """
+    DELETE FROM analytics_bid_facts
+    WHERE bid_id IN (SELECT id FROM analytics_changed WHERE opened_at IS NULL)
+    """,
+    """
+    INSERT INTO analytics_bid_facts (bid_id, day, company_id, manager_id, status, assign_seconds, arrive_seconds)
+    SELECT id,
+           (opened_at AT TIME ZONE 'UTC')::date,
+           coalesce(company_id, 0),
+           coalesce(manager_id, 0),
+           status,
+           CASE WHEN assigned_at >= opened_at THEN extract(epoch FROM assigned_at - opened_at) END,
+           CASE WHEN arrived_time >= opened_at THEN extract(epoch FROM arrived_time - opened_at) END
+    FROM analytics_changed
+    WHERE opened_at IS NOT NULL
+    ON CONFLICT (bid_id) DO UPDATE SET
+        day = EXCLUDED.day,
+        company_id = EXCLUDED.company_id,
+        manager_id = EXCLUDED.manager_id,
+        status = EXCLUDED.status,
+        assign_seconds = EXCLUDED.assign_seconds,
+        arrive_seconds = EXCLUDED.arrive_seconds
+    """,
+    "DELETE FROM analytics_bid_daily WHERE day IN (SELECT day FROM analytics_touched_days)",
+    """
+    INSERT INTO analytics_bid_daily (day, company_id, manager_id, opened, assigned, done,
+                                     assign_samples, assign_seconds_sum, arrive_samples, arrive_seconds_sum)
+    SELECT day, company_id, manager_id,
+           count(*),
+           count(*) FILTER (WHERE manager_id <> 0),
+           count(*) FILTER (WHERE status = 'done'),
+           count(assign_seconds),
+           coalesce(sum(assign_seconds), 0),
+           count(arrive_seconds),
+           coalesce(sum(arrive_seconds), 0)
+    FROM analytics_bid_facts
+    WHERE day IN (SELECT day FROM analytics_touched_days)
+    GROUP BY day, company_id, manager_id
+    """,
+]
+
+# Итоги для шапки отчета. Средние за 30 дней считаются по суммам, а не как среднее средних
+SUMMARY_SQL = """
+SELECT (SELECT refreshed_at FROM analytics_refresh_state WHERE id = 1) AS refreshed_at,
+       (SELECT coalesce(sum(open), 0) FROM analytics_open_backlog) AS open,
+       (SELECT coalesce(sum(in_progress), 0) FROM analytics_open_backlog) AS in_progress,
+       (SELECT coalesce(sum(unassigned), 0) FROM analytics_open_backlog) AS unassigned,
+       (SELECT coalesce(sum(opened), 0) FROM analytics_daily_trend WHERE day > current_date - 30) AS opened_30d,
+       (SELECT coalesce(sum(done), 0) FROM analytics_daily_trend WHERE day > current_date - 30) AS done_30d,
+       (SELECT sum(assign_seconds_sum) / nullif(sum(assign_samples), 0)
+        FROM analytics_bid_daily WHERE day > current_date - 30) AS avg_assign_seconds_30d,
+       (SELECT sum(arrive_seconds_sum) / nullif(sum(arrive_samples), 0)
+        FROM analytics_bid_daily WHERE day > current_date - 30) AS avg_arrive_seconds_30d
+"""
+
+
+def refresh(full=False):
+    """
+    Обновляет слои аналитики. Обычный прогон обрабатывает только заявки,
+    измененные после прошлого (по bid.last_update), и пересчитывает затронутые дни;
+    full=True пересобирает все с нуля (удаленные заявки, сдвиги часов).
+    Возвращает число обработанных заявок или None, если пересчет уже идет
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [ANALYTICS_LOCK_ID])
+        if not cursor.fetchone()[0]:
+            logger.info("Аналитика: пересчет уже идет, пропускаем")
+            return None
+
+        if full:
+            cursor.execute("TRUNCATE analytics_bid_facts, analytics_bid_daily")
+            since = "-infinity"
+        else:
+            cursor.execute(
+                f"SELECT watermark - INTERVAL '{WATERMARK_OVERLAP}' FROM analytics_refresh_state WHERE id = 1"
+            )
+            since = cursor.fetchone()[0]
+
+        for sql in REFRESH_SQL:
+            cursor.execute(sql, {"since": since} if "%(" in sql else None)
+        cursor.execute("SELECT count(*) FROM analytics_changed")
+        changed = cursor.fetchone()[0]
+
+        for view in MATERIALIZED_VIEWS:
+            cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+        # now() - время начала транзакции: все, что закоммичено позже, попадет в следующий прогон
+        cursor.execute("UPDATE analytics_refresh_state SET watermark = now(), refreshed_at = clock_timestamp() WHERE id = 1")
+
+    logger.info(f"Аналитика обновлена: заявок {changed}{' (полный пересчет)' if full else ''}")
+    return changed
+
+
+def _fetch(cursor, sql, params=None):
+    cursor.execute(sql, params)
+    columns = [col.name for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def snapshot():
+    """
+    Данные для /api/analytics/: только чтение готовых представлений
+    """
+    with connection.cursor() as cursor:
+        return {
+            "summary": _fetch(cursor, SUMMARY_SQL)[0],
+            "backlog": _fetch(cursor, "SELECT * FROM analytics_open_backlog ORDER BY open + in_progress DESC"),
+            "inspectors": _fetch(cursor, "SELECT * FROM analytics_inspector_throughput ORDER BY rank_30d, manager_id"),
+            "trend": _fetch(cursor, "SELECT * FROM analytics_daily_trend ORDER BY day"),
+        }
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DemoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'demo'
+
+    def ready(self):
+        from demo import signals  # noqa: F401
@@ -0,0 +1,205 @@
+import codecs
+import csv
+import json
+import logging
+import uuid
+from django.db import transaction
+from demo.encar import extract_car_id
+from demo.models import bid
+from demo.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Прогресс импорта в Redis: hash bid_import:{job_id}
+#   status     - running / done / failed (текст ошибки в error)
+#   user_id    - кто запустил импорт
+#   rows       - прочитано строк
+#   created    - создано заявок
+#   skipped    - повторы carid внутри файла
+#   invalid    - строки с ошибкой (первые IMPORT_MAX_ERRORS лежат в errors, JSON)
+#   enrich_total / enrich_done - заявок отправлено на обогащение / обработано
+IMPORT_JOB_KEY = "bid_import:{job_id}"
+IMPORT_JOB_TTL = 24 * 3600
+IMPORT_CHUNK = 1000         # Строк в одном bulk_create и одной задаче обогащения
+IMPORT_MAX_ERRORS = 100
+
+CSV_FORMAT = "csv"
+NDJSON_FORMAT = "ndjson"
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-lines", "application/ndjson")
+
+# Поля заявки, которые можно передать в строке импорта
+URL_FIELDS = ("url_users", "url", "link")
+TEXT_FIELDS = ("brand", "model", "fuel_type", "drive_type", "engine", "power", "transmission")
+INT_FIELDS = ("year", "mileage")
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def detect_format(content_type, filename=None, requested=None):
+    """
+    Формат по ?format=, расширению файла или Content-Type. По умолчанию CSV
+    """
+    if requested in (CSV_FORMAT, NDJSON_FORMAT):
+        return requested
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return NDJSON_FORMAT
+    if content_type and content_type.split(";")[0].strip().lower() in NDJSON_CONTENT_TYPES:
+        return NDJSON_FORMAT
+    return CSV_FORMAT
+
+
+def iter_rows(lines, fmt):
+    """
+    Строки файла (bytes) -> (номер строки, dict). Файл читается построчно и в память целиком не попадает
+    """
+    text_lines = codecs.iterdecode(lines, "utf-8-sig")
+    if fmt == NDJSON_FORMAT:
+        for line_no, line in enumerate(text_lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, ImportRowError("некорректный JSON")
+                continue
+            yield line_no, row if isinstance(row, dict) else ImportRowError("ожидался объект JSON")
+        return
+
+    reader = csv.reader(text_lines)
+    first_row = next(reader, None)
+    if first_row is None:
+        return
+    header = [column.strip().lower() for column in first_row]
+    if not set(header) & set(URL_FIELDS + TEXT_FIELDS + INT_FIELDS):
+        # Файл без заголовка: одна колонка со ссылками, первая строка - уже данные (регистр не трогаем)
+        if first_row:
+            yield 1, {"url_users": first_row[0]}
+        header = ["url_users"]
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        yield reader.line_num, dict(zip(header, values))
+
+
+def clean_row(row):
+    """
+    Проверяет строку импорта и возвращает (поля заявки, carid)
+    """
+    url = next((str(row[f]).strip() for f in URL_FIELDS if row.get(f)), None)
+    if not url:
+        raise ImportRowError("нет ссылки на авто (url_users)")
+    carid = extract_car_id(url)
+    if not carid:
+        raise ImportRowError(f"в ссылке нет carid: {url[:200]}")
+
+    fields = {"url_users": url[:500]}
+    for field in TEXT_FIELDS:
+        value = row.get(field)
+        if value not in (None, ""):
+            fields[field] = str(value).strip()[:100]
+    for field in INT_FIELDS:
+        value = row.get(field)
+        if value in (None, ""):
+            continue
+        try:
+            fields[field] = int(value)
+        except (TypeError, ValueError):
+            raise ImportRowError(f"{field}: ожидалось целое число, получено {str(value)[:50]}")
+    return fields, carid
+
+
+def create_job(user_id):
+    job_id = uuid.uuid4().hex
+    key = IMPORT_JOB_KEY.format(job_id=job_id)
+    pipe = redis_client.pipeline()
+    pipe.hset(key, mapping={
+        "status": "running", "user_id": user_id, "rows": 0, "created": 0, "skipped": 0, "invalid": 0,
+        "errors": "[]", "enrich_total": 0, "enrich_done": 0,
+    })
+    pipe.expire(key, IMPORT_JOB_TTL)
+    pipe.execute()
+    return job_id
+
+
+def get_job(job_id, user_id=None):
+    """
+    Прогресс импорта или None, если задачи нет (или она чужая при переданном user_id)
+    """
+    job = redis_client.hgetall(IMPORT_JOB_KEY.format(job_id=job_id))
+    if not job or (user_id is not None and job.get("user_id") != str(user_id)):
+        return None
+    result = {"job_id": job_id, "status": job["status"], "errors": json.loads(job.get("errors") or "[]")}
+    if job.get("error"):
+        result["error"] = job["error"]
+    for field in ("rows", "created", "skipped", "invalid", "enrich_total", "enrich_done"):
+        result[field] = int(job.get(field, 0))
+    return result
+
+
+def mark_enriched(job_id, count):
+    redis_client.hincrby(IMPORT_JOB_KEY.format(job_id=job_id), "enrich_done", count)
+
+
+def run_import(job_id, rows, user, company, enrich):
+    """
+    Создает заявки порциями по IMPORT_CHUNK. После коммита каждой порции
+    вызывает enrich(bid_ids, job_id) - постановку задачи обогащения.
+
+    Args:
+        job_id: id задачи импорта (create_job)
+        rows: Итератор (номер строки, dict или ImportRowError) из iter_rows
+        user: Автор заявок
+        company: Компания заявок или None
+        enrich: Функция постановки обогащения порции
+    """
+    key = IMPORT_JOB_KEY.format(job_id=job_id)
+    seen_carids = set()
+    errors = []
+    batch = []
+    counters = {"rows": 0, "skipped": 0, "invalid": 0}
+
+    def flush():
+        bid_ids = []
+        if batch:
+            with transaction.atomic():
+                bid_ids = [b.id for b in bid.objects.bulk_create(batch)]
+                transaction.on_commit(lambda: enrich(bid_ids, job_id))
+        pipe = redis_client.pipeline()
+        pipe.hincrby(key, "created", len(bid_ids))
+        pipe.hincrby(key, "enrich_total", len(bid_ids))
+        for field, value in counters.items():
+            pipe.hincrby(key, field, value)
+            counters[field] = 0
+        pipe.hset(key, "errors", json.dumps(errors, ensure_ascii=False))
+        pipe.execute()
+        batch.clear()
+
+    try:
+        for line_no, row in rows:
+            counters["rows"] += 1
+            try:
+                if isinstance(row, ImportRowError):
+                    raise row
+                fields, carid = clean_row(row)
+            except ImportRowError as e:
+                counters["invalid"] += 1
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    errors.append({"line": line_no, "error": str(e)})
+                continue
+            if carid in seen_carids:
+                counters["skipped"] += 1
+                continue
+            seen_carids.add(carid)
+            batch.append(bid(user=user, company=company, **fields))
+            if len(batch) >= IMPORT_CHUNK:
+                flush()
+        flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        logger.error(f"Импорт {job_id} прерван: {e}")
+        redis_client.hset(key, mapping={"status": "failed", "error": str(e)})
+        raise
+
+    redis_client.hset(key, "status", "done")
+    return get_job(job_id)
@@ -0,0 +1,161 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+import requests
+from demo import telegram
+from demo.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_RATE = 25         # Сообщений в секунду на всех воркерах (лимит Telegram ~30 на бота)
+BROADCAST_WORKERS = 8       # Параллельных запросов к Bot API
+MEDIA_GROUP_LIMIT = 10      # Максимум файлов в одном sendMediaGroup
+RETRY_ATTEMPTS = 3          # Повторы при retry_after
+BROADCAST_LIMIT_KEY = "ratelimit:telegram:broadcast"
+
+# Общее для всех воркеров ведро токенов (как слот запроса в demo.encar): берет токен
+# и возвращает, сколько ждать (мс). Токены могут уйти в минус - это очередь ожидающих.
+# KEYS: ключ ведра; ARGV: скорость (токенов в секунду), емкость
+_take_token = redis_client.register_script("""
+local now = redis.call('TIME')
+local now_ms = now[1] * 1000 + math.floor(now[2] / 1000)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now_ms
+tokens = math.min(capacity, tokens + (now_ms - ts) * rate / 1000) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now_ms)
+local wait_ms = 0
+if tokens < 0 then
+    wait_ms = math.ceil(-tokens * 1000 / rate)
+end
+redis.call('PEXPIRE', KEYS[1], wait_ms + 60000)
+return wait_ms
+""")
+
+
+def acquire_token():
+    """
+    Ждет токен рассылки: все процессы и потоки воркеров вместе шлют не больше BROADCAST_RATE в секунду
+    """
+    delay_ms = _take_token(keys=[BROADCAST_LIMIT_KEY], args=[BROADCAST_RATE, BROADCAST_RATE])
+    if delay_ms > 0:
+        time.sleep(delay_ms / 1000)
+
+
+def _call_limited(method, **kwargs):
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        acquire_token()
+        try:
+            return telegram.call(method, **kwargs)
+        except telegram.TelegramError as e:
+            if e.retry_after is None or attempt >= RETRY_ATTEMPTS:
+                raise
+            logger.warning(f"Telegram просит подождать {e.retry_after} с ({method})")
+            time.sleep(e.retry_after)
+
+
+def _broadcast(chat_ids, send):
+    results = []
+    with ThreadPoolExecutor(max_workers=BROADCAST_WORKERS) as pool:
+        futures = {pool.submit(send, chat_id): chat_id for chat_id in chat_ids}
+        for future in as_completed(futures):
+            chat_id = futures[future]
+            try:
+                future.result()
+                results.append({"chat_id": chat_id, "ok": True})
+            except (telegram.TelegramError, requests.RequestException) as e:
+                results.append({"chat_id": chat_id, "ok": False, "error": str(e)})
+    return results
+
+
+def _chunks(items):
+    return [items[i:i + MEDIA_GROUP_LIMIT] for i in range(0, len(items), MEDIA_GROUP_LIMIT)]
+
+
+def _send_documents(chat_id, documents, caption):
+    """
+    Отправляет документы альбомами по MEDIA_GROUP_LIMIT.
+    documents: file_id (str) или (путь, имя файла) для первой загрузки.
+    Возвращает file_id отправленных документов в том же порядке
+    """
+    file_ids = []
+    for chunk_index, chunk in enumerate(_chunks(documents)):
+        chunk_caption = caption if chunk_index == 0 else None
+        with ExitStack() as stack:
+            files = {}
+            media = []
+            for i, doc in enumerate(chunk):
+                if isinstance(doc, str):
+                    ref = doc
+                else:
+                    path, name = doc
+                    files[f"file{i}"] = (name, stack.enter_context(open(path, "rb")), "application/octet-stream")
+                    ref = f"attach://file{i}"
+                media.append({"type": "document", "media": ref})
+            if chunk_caption:
+                media[0]["caption"] = chunk_caption
+
+            if len(media) == 1:
+                # sendMediaGroup принимает от 2 файлов
+                data = {"chat_id": chat_id}
+                if chunk_caption:
+                    data["caption"] = chunk_caption
+                if files:
+                    result = _call_limited("sendDocument", data=data, files={"document": files["file0"]})
+                else:
+                    data["document"] = media[0]["media"]
+                    result = _call_limited("sendDocument", data=data)
+                file_ids.append(result["document"]["file_id"])
+            else:
+                result = _call_limited(
+                    "sendMediaGroup",
+                    data={"chat_id": chat_id, "media": json.dumps(media, ensure_ascii=False)},
+                    files=files or None,
+                )
+                file_ids.extend(m["document"]["file_id"] for m in result)
+    return file_ids
+
+
+def broadcast_message(chat_ids, text):
+    """
+    Рассылает текст всем chat_ids. Возвращает результат по каждому получателю
+    """
+    return _broadcast(
+        chat_ids,
+        lambda chat_id: _call_limited(
+            "sendMessage", json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        ),
+    )
+
+
+def broadcast_documents(chat_ids, documents, caption=None):
+    """
+    Рассылает документы всем chat_ids. Файлы загружаются в Telegram один раз
+    (первому получателю), остальным уходят по file_id.
+
+    Args:
+        chat_ids: Получатели
+        documents: Список (путь, имя файла)
+        caption: Подпись к первому документу
+    """
+    if not documents:
+        return []
+
+    results = []
+    file_ids = None
+    pending = list(chat_ids)
+    while pending and file_ids is None:
+        chat_id = pending.pop(0)
+        try:
+            file_ids = _send_documents(chat_id, documents, caption)
+            results.append({"chat_id": chat_id, "ok": True})
+        except (telegram.TelegramError, requests.RequestException, OSError) as e:
+            results.append({"chat_id": chat_id, "ok": False, "error": str(e)})
+
+    if file_ids is not None:
+        results += _broadcast(pending, lambda chat_id: _send_documents(chat_id, file_ids, caption))
+    return results
@@ -0,0 +1,82 @@
+import hashlib
+import logging
+from functools import wraps
+import redis
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from demo.models import bid, Order, ChatMessage
+from demo.response_cache import object_versions, ALL
+
+logger = logging.getLogger(__name__)
+
+# ETag для условных GET считаются без сериализации ответа: по bid.last_update
+# (триггер bid_touch_last_update обновляет его и при записи ботов), агрегатам
+# по выборке и версиям объектов из demo.response_cache.
+
+
+def _etag(*parts):
+    return hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def conditional(etag_func):
+    """
+    Условный GET: при совпадении If-None-Match отдает 304 без вызова вьюхи.
+    Ставится под @api_view, чтобы проверка шла после аутентификации DRF.
+    etag_func(request, *args, **kwargs) возвращает ETag или None (ответ без ETag)
+    """
+    def safe_etag(request, *args, **kwargs):
+        try:
+            return etag_func(request, *args, **kwargs)
+        except redis.RedisError as e:
+            logger.warning(f"ETag не посчитан, Redis недоступен: {e}")
+            return None
+
+    def decorator(view):
+        conditional_view = condition(etag_func=safe_etag)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                # Браузер должен каждый раз сверять ETag, а не брать ответ из своего кэша
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def bid_etag(request, pk):
+    last_update = bid.objects.filter(pk=pk).values_list("last_update", flat=True).first()
+    if last_update is None:
+        return None
+    (version,) = object_versions(("bid", pk))
+    return _etag("bid", pk, last_update.timestamp(), version)
+
+
+def bid_list_etag(request):
+    state = bid.objects.filter(user=request.user).aggregate(
+        count=Count("id"), last_id=Max("id"), last_update=Max("last_update")
+    )
+    last_update = state["last_update"].timestamp() if state["last_update"] else 0
+    # Версия компаний: в заявках отдается company_name
+    versions = object_versions(("bid", ALL), ("company", ALL))
+    return _etag("bids", request.user.pk, state["count"], state["last_id"], last_update, *versions)
+
+
+def order_list_etag(request):
+    state = Order.objects.aggregate(count=Count("id"), last_id=Max("id"))
+    (version,) = object_versions(("order", ALL))
+    return _etag("orders", state["count"], state["last_id"], version)
+
+
+def company_etag(request, pk):
+    (version,) = object_versions(("company", pk))
+    # current_user_id и current_user_role зависят от пользователя
+    return _etag("company", pk, request.user.pk, version)
+
+
+def thread_etag(request, pk):
+    state = ChatMessage.objects.filter(message_thread_id=pk).aggregate(count=Count("id"), last_id=Max("id"))
+    (version,) = object_versions(("thread", pk))
+    return _etag("thread", pk, state["count"], state["last_id"], version)
@@ -0,0 +1,105 @@
+import json
+import time
+import logging
+from urllib.parse import urlparse, parse_qs
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from demo.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+CAR_CACHE_KEY = "encar:car:{car_id}"
+RATE_LIMIT_KEY = "ratelimit:{host}"
+
+# Одна сессия на процесс воркера: keep-alive соединения с api.encar.com
+session = requests.Session()
+session.headers.update({
+    "User-Agent": "Mozilla/5.0",
+    "Referer": "https://buy.encar.com/",
+    "Origin": "https://buy.encar.com",
+    "Accept": "application/json, text/plain, */*",
+})
+session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=10))
+
+# Общий для всех воркеров слот запроса к хосту: возвращает, сколько ждать (мс).
+# KEYS: ключ хоста; ARGV: минимальный интервал между запросами (мс)
+_reserve_slot = redis_client.register_script("""
+local now = redis.call('TIME')
+local now_ms = now[1] * 1000 + math.floor(now[2] / 1000)
+local next_ms = tonumber(redis.call('GET', KEYS[1]) or '0')
+local slot = math.max(now_ms, next_ms)
+redis.call('SET', KEYS[1], slot + tonumber(ARGV[1]), 'PX', tonumber(ARGV[1]) + 60000)
+return slot - now_ms
+""")
+
+
+def wait_for_host(host, min_interval):
+    """
+    Ждет своей очереди к host: запросы всех воркеров идут не чаще раза в min_interval секунд
+    """
+    delay_ms = _reserve_slot(keys=[RATE_LIMIT_KEY.format(host=host)], args=[int(min_interval * 1000)])
+    if delay_ms > 0:
+        time.sleep(delay_ms / 1000)
+
+
+def extract_car_id(url):
+    carid_list = parse_qs(urlparse(url).query).get("carid")
+    return carid_list[0] if carid_list else None
+
+
+def parse_car_data(raw_car):
+    fuels = {
+        "디젤": "Дизель",
+        "가솔린": "Бензин",
+        "가솔린+전기": "Гибрид",
+        "전기": "Электро",
+    }
+
+    transmissions = {
+        "오토": "Автомат",
+        "수동": "Механика",
+    }
+
+    return {
+        "brand": raw_car.get("manufacturerNm"),
+        "model": raw_car.get("modelNm"),
+        "year": raw_car.get("formYear"),
+        "engine": str(round(raw_car.get("displacement", 0) / 1000, 2)) if raw_car.get("displacement") else None,
+        "fuel_type": fuels.get(raw_car.get("fuelNm"), raw_car.get("fuelNm")),
+        "mileage": raw_car.get("mileage"),
+        "transmission": transmissions.get(raw_car.get("transmission"), raw_car.get("transmission")),
+    }
+
+
+def fetch_cars(car_ids):
+    """
+    Данные по машинам {car_id: parsed}. Кэшированные берутся из Redis,
+    остальные запрашиваются у encar одним запросом со списком carIds
+    """
+    car_ids = list(dict.fromkeys(car_ids))
+    if not car_ids:
+        return {}
+
+    cached = redis_client.mget([CAR_CACHE_KEY.format(car_id=car_id) for car_id in car_ids])
+    cars = {car_id: json.loads(raw) for car_id, raw in zip(car_ids, cached) if raw}
+    missing = [car_id for car_id in car_ids if car_id not in cars]
+    if not missing:
+        return cars
+
+    wait_for_host(urlparse(settings.ENCAR_API_URL).netloc, settings.ENCAR_MIN_INTERVAL)
+    resp = session.get(f"{settings.ENCAR_API_URL}?carIds={','.join(missing)}", timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
+    if not isinstance(data, list):
+        return cars
+
+    pipe = redis_client.pipeline(transaction=False)
+    for index, raw_car in enumerate(data):
+        car_id = str(raw_car.get("carId") or (missing[index] if len(data) == len(missing) else ""))
+        if car_id not in missing:
+            continue
+        cars[car_id] = parse_car_data(raw_car)
+        pipe.set(CAR_CACHE_KEY.format(car_id=car_id), json.dumps(cars[car_id]), ex=settings.ENCAR_CACHE_TTL)
+    pipe.execute()
+    return cars
@@ -0,0 +1,58 @@
+import json
+import redis
+from demo.redis_client import get_async_redis
+
+# Лента событий для браузеров (SSE). События пишутся в Redis Stream:
+# в отличие от обычного PUBLISH поток хранит последние EVENTS_STREAM_MAXLEN
+# событий, поэтому переподключившийся клиент получает все, что пропустил
+# после Last-Event-ID. Бот пишет в тот же поток (crm_integration.py).
+EVENTS_STREAM_KEY = "crm:events"
+EVENTS_STREAM_MAXLEN = 10000
+HEARTBEAT_MS = 15000
+
+
+async def publish_event(event_type, data):
+    """
+    Отправляет событие всем подключенным клиентам (type: notification, message)
+    """
+    await get_async_redis().xadd(
+        EVENTS_STREAM_KEY,
+        {"type": event_type, "data": json.dumps(data, ensure_ascii=False)},
+        maxlen=EVENTS_STREAM_MAXLEN,
+        approximate=True,
+    )
+
+
+def _format_event(entry_id, fields):
+    return f"id: {entry_id}\nevent: {fields['type']}\ndata: {fields['data']}\n\n"
+
+
+async def event_stream(last_event_id):
+    """
+    Пропущенные события после last_event_id, затем новые по мере поступления
+    """
+    ar = get_async_redis()
+    missed = []
+    if last_event_id:
+        try:
+            missed = await ar.xrange(EVENTS_STREAM_KEY, min=f"({last_event_id}")
+        except redis.exceptions.ResponseError:
+            last_event_id = None
+    if not last_event_id:
+        # Начинаем с текущего конца потока (не "$", чтобы не терять события между XREAD)
+        latest = await ar.xrevrange(EVENTS_STREAM_KEY, count=1)
+        last_event_id = latest[0][0] if latest else "0-0"
+    for entry_id, fields in missed:
+        last_event_id = entry_id
+        yield _format_event(entry_id, fields)
+
+    while True:
+        response = await ar.xread({EVENTS_STREAM_KEY: last_event_id}, block=HEARTBEAT_MS)
+        if not response:
+            yield ": ping\n\n"
+            continue
+        for _, entries in response:
+            for entry_id, fields in entries:
+                last_event_id = entry_id
+                yield _format_event(entry_id, fields)
+
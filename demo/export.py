@@ -0,0 +1,201 @@
+import csv
+import datetime
+import tempfile
+from asgiref.sync import sync_to_async
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from demo.models import bid, Order, ChatMessage, user_company
+
+EXPORT_CHUNK = 2000                 # Строк за одну выборку серверного курсора
+CSV_FLUSH_ROWS = 500                # Строк CSV в одном куске ответа
+XLSX_SPOOL_SIZE = 8 * 1024 * 1024   # Больше - xlsx собирается во временном файле на диске
+XLSX_READ_CHUNK = 64 * 1024
+XLSX_MAX_ROWS = 1048575             # Лимит строк листа Excel без заголовка
+
+CSV_FORMAT = "csv"
+XLSX_FORMAT = "xlsx"
+CONTENT_TYPES = {
+    CSV_FORMAT: "text/csv; charset=utf-8",
+    XLSX_FORMAT: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# columns: (заголовок, поле для values_list); filters: фильтр запроса -> поле;
+# scope: поле компании, по которому сотрудник (не персонал) видит только свои данные
+EXPORTS = {
+    "bids": {
+        "model": bid,
+        "columns": [
+            ("ID", "id"),
+            ("Создана", "create_at"),
+            ("Статус", "status"),
+            ("Компания", "company__name"),
+            ("Марка", "brand"),
+            ("Модель", "model"),
+            ("Год", "year"),
+            ("Пробег", "mileage"),
+            ("Двигатель", "engine"),
+            ("Топливо", "fuel_type"),
+            ("Коробка", "transmission"),
+            ("Осмотрщик", "manager_id"),
+            ("Дилер", "dealer__company_name"),
+            ("Открыта", "opened_at"),
+            ("Прибытие", "arrived_time"),
+            ("Ссылка клиента", "url_users"),
+            ("Ссылка", "url"),
+        ],
+        "filters": {"company": "company_id", "status": "status", "date": "create_at"},
+        "scope": "company_id",
+    },
+    "orders": {
+        "model": Order,
+        "columns": [
+            ("ID", "id"),
+            ("Дата", "date"),
+            ("VIN", "VIN"),
+            ("Номер заказа", "number_order"),
+            ("Номер накладной", "number_note"),
+            ("Клиент", "client__name"),
+            ("Телефон", "client__phone"),
+            ("Статус", "status__current_status"),
+        ],
+        # У заказов нет привязки к компании: видимость та же, что у all_orders
+        "filters": {"status": "status__current_status", "date": "date"},
+        "scope": None,
+    },
+    "messages": {
+        "model": ChatMessage,
+        "columns": [
+            ("ID", "id"),
+            ("Время", "created_at"),
+            ("Заявка", "bid_id"),
+            ("Тема", "message_thread_id"),
+            ("Пользователь", "username"),
+            ("ID пользователя", "user_id"),
+            ("В бот", "to_bot"),
+            ("Доставка", "delivery_status"),
+            ("Текст", "text"),
+        ],
+        "filters": {"company": "bid__company_id", "status": "delivery_status", "date": "created_at"},
+        "scope": "bid__company_id",
+    },
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _parse_day(value, name):
+    day = parse_date(value)
+    if day is None:
+        raise ExportError(f"{name}: ожидалась дата ГГГГ-ММ-ДД")
+    return day
+
+
+def build_queryset(kind, user, params):
+    """
+    Выборка для выгрузки с фильтрами ?company=&status=&date_from=&date_to= (даты включительно)
+    """
+    spec = EXPORTS[kind]
+    filters = spec["filters"]
+    qs = spec["model"].objects.all()
+
+    if spec["scope"] and not user.is_staff:
+        companies = user_company.objects.filter(user_id=user, company_id__is_approved=True).values("company_id")
+        qs = qs.filter(**{f"{spec['scope']}__in": companies})
+
+    for param in ("company", "status"):
+        value = params.get(param)
+        if not value:
+            continue
+        if param not in filters:
+            raise ExportError(f"Фильтр {param} для {kind} не поддерживается")
+        if param == "company" and not value.isdigit():
+            raise ExportError("company: ожидался id компании")
+        qs = qs.filter(**{filters[param]: value})
+
+    date_field = filters["date"]
+    is_datetime = isinstance(spec["model"]._meta.get_field(date_field), models.DateTimeField)
+    for param, lookup, shift in (("date_from", "gte", 0), ("date_to", "lt", 1)):
+        if not params.get(param):
+            continue
+        day = _parse_day(params[param], param) + datetime.timedelta(days=shift)
+        bound = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min)) if is_datetime else day
+        qs = qs.filter(**{f"{date_field}__{lookup}": bound})
+
+    return qs.order_by("id").values_list(*[field for _, field in spec["columns"]])
+
+
+class _Echo:
+    # csv.writer пишет строку сюда и сразу получает ее обратно
+    def write(self, value):
+        return value
+
+
+async def stream_csv(kind, queryset):
+    """
+    CSV по мере чтения серверного курсора: память не зависит от объема выгрузки
+    """
+    writer = csv.writer(_Echo())
+    # BOM, чтобы Excel открыл UTF-8 без мастера импорта
+    yield "\ufeff" + writer.writerow([header for header, _ in EXPORTS[kind]["columns"]])
+    lines = []
+    async for row in queryset.aiterator(chunk_size=EXPORT_CHUNK):
+        lines.append(writer.writerow(row))
+        if len(lines) >= CSV_FLUSH_ROWS:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def _xlsx_value(value, illegal_characters):
+    # Excel не хранит часовой пояс и не принимает управляющие символы в тексте
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    if isinstance(value, str):
+        return illegal_characters.sub("", value)
+    return value
+
+
+def _build_xlsx(kind, queryset):
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    headers = [header for header, _ in EXPORTS[kind]["columns"]]
+    workbook = Workbook(write_only=True)
+    sheet = None
+    rows_in_sheet = XLSX_MAX_ROWS
+    for row in queryset.iterator(chunk_size=EXPORT_CHUNK):
+        if rows_in_sheet >= XLSX_MAX_ROWS:
+            sheet = workbook.create_sheet(f"{kind} {len(workbook.worksheets) + 1}")
+            sheet.append(headers)
+            rows_in_sheet = 0
+        sheet.append([_xlsx_value(value, ILLEGAL_CHARACTERS_RE) for value in row])
+        rows_in_sheet += 1
+    if sheet is None:
+        workbook.create_sheet(kind).append(headers)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE)
+    workbook.save(spool)
+    spool.seek(0)
+    return spool
+
+
+async def stream_xlsx(kind, queryset):
+    """
+    XLSX - zip-архив, его нельзя отдавать до конца сборки: книга пишется
+    в режиме write_only во временный файл, затем файл отдается кусками.
+    Без openpyxl поднимает ImportError до начала ответа
+    """
+    spool = await sync_to_async(_build_xlsx)(kind, queryset)
+
+    async def chunks():
+        try:
+            while chunk := await sync_to_async(spool.read)(XLSX_READ_CHUNK):
+                yield chunk
+        finally:
+            spool.close()
+
+    return chunks()
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from demo import thumbnails
+
+BATCH = 500
+
+
+def _generate(kind, pk, force):
+    # Выполняется в процессе пула: ошибка одного файла не должна останавливать остальные
+    try:
+        result = thumbnails.generate(kind, pk, force=force)
+    except Exception as e:
+        return pk, f"ошибка: {e}"
+    if result is None:
+        return pk, "пропущен"
+    return pk, "ошибка" if "error" in result else "готово"
+
+
+class Command(BaseCommand):
+    help = "Строит превью для уже загруженных фото заявок, фото дилеров и документов статусов в пуле процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=list(thumbnails.SOURCES), action="append",
+                            help="Вид файлов (можно несколько раз); по умолчанию все")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Процессов в пуле")
+        parser.add_argument("--force", action="store_true", help="Перестроить и уже готовые превью")
+
+    def handle(self, *args, **options):
+        kinds = options["kind"] or list(thumbnails.SOURCES)
+        force = options["force"]
+        jobs = []
+        for kind in kinds:
+            if force:
+                model, field = thumbnails.SOURCES[kind]
+                ids = list(model.objects.exclude(**{field: ""}).order_by("id").values_list("id", flat=True))
+            else:
+                ids = thumbnails.pending(kind)
+            self.stdout.write(f"{kind}: {len(ids)} файлов")
+            jobs += [(kind, pk) for pk in ids]
+        if not jobs:
+            return
+
+        # Процессы запускаются через spawn и заново настраивают Django: с fork
+        # дочерние процессы унаследовали бы открытые соединения с базой
+        connections.close_all()
+        context = multiprocessing.get_context("spawn")
+        counts = {}
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=options["workers"], mp_context=context, initializer=django.setup) as pool:
+            for start in range(0, len(jobs), BATCH):
+                batch = jobs[start:start + BATCH]
+                results = pool.map(
+                    _generate, [kind for kind, _ in batch], [pk for _, pk in batch], [force] * len(batch), chunksize=8
+                )
+                for (kind, _), (pk, status) in zip(batch, results):
+                    if status.startswith("ошибка:"):
+                        self.stderr.write(f"{kind} {pk}: {status}")
+                        status = "ошибка"
+                    counts[status] = counts.get(status, 0) + 1
+                done = start + len(batch)
+                rate = done / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(f"Обработано {done} из {len(jobs)} ({rate:.1f}/с)")
+
+        self.stdout.write(self.style.SUCCESS(", ".join(f"{status}: {n}" for status, n in sorted(counts.items()))))
@@ -0,0 +1,130 @@
+import statistics
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.core.signals import request_started, request_finished
+from django.db import close_old_connections, connection, transaction
+from django.test import Client
+from django.urls import reverse
+from demo.models import User, Companies
+
+TARGET_MS = 300
+
+SYNTHETIC_SQL = [
+    """
+    INSERT INTO companies (name, "INN", is_approved)
+    SELECT 'Компания ' || g, (7700000000 + g)::text, TRUE
+    FROM generate_series(1, %(companies)s) g
+    """,
+    """
+    INSERT INTO dealers (company_name, name, photo)
+    SELECT 'Дилер ' || g, 'Менеджер ' || g, ''
+    FROM generate_series(1, %(companies)s) g
+    """,
+    """
+    INSERT INTO bid (create_at, last_update, status, shown_to_bot, in_stock, caller_saw,
+                     brand, model, year, company_id, dealer_id)
+    SELECT now(), now(),
+           (ARRAY['open', 'progress', 'review', 'done', 'disabled'])[1 + g %% 5],
+           TRUE, FALSE, TRUE,
+           (ARRAY['Hyundai', 'Kia', 'Genesis', 'BMW', 'Mercedes-Benz', 'Audi', 'Toyota', 'Volkswagen'])[1 + g %% 8],
+           (ARRAY['Sonata', 'Sorento', 'G80', 'X5', 'E-Class', 'A6', 'Camry', 'Tiguan', 'Palisade', 'K5'])[1 + g %% 10],
+           2015 + g %% 10,
+           (SELECT min(id) FROM companies) + g %% %(companies)s,
+           (SELECT min(id) FROM dealers) + g %% %(companies)s
+    FROM generate_series(1, %(bids)s) g
+    """,
+    """
+    INSERT INTO photo (bid_id, file_url)
+    SELECT b.id, 'photos/' || b.id || '_' || n || '.jpg'
+    FROM (SELECT id FROM bid ORDER BY id DESC LIMIT %(photo_bids)s) b, generate_series(1, 3) n
+    """,
+    """
+    INSERT INTO statuses (current_status)
+    SELECT (ARRAY['payment', 'parking', 'preparation', 'order_received'])[1 + g %% 4]
+    FROM generate_series(1, %(statuses)s) g
+    """,
+    "ANALYZE companies",
+    "ANALYZE dealers",
+    "ANALYZE bid",
+    "ANALYZE photo",
+    "ANALYZE statuses",
+]
+
+
+class Command(BaseCommand):
+    help = "Замер списков админки на синтетических данных (по умолчанию 1M заявок); все изменения откатываются"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bids", type=int, default=1000000, help="Сколько синтетических заявок добавить")
+        parser.add_argument("--repeat", type=int, default=10, help="Повторов каждого запроса")
+
+    def handle(self, *args, **options):
+        bids = options["bids"]
+        params = {
+            "bids": bids,
+            "companies": max(bids // 1000, 1),
+            "photo_bids": max(bids // 10, 1),
+            "statuses": max(bids // 10, 1),
+        }
+
+        # Тестовый клиент закрывает "устаревшее" соединение после запроса, а внутри
+        # транзакции оно всегда считается таким - синтетические данные пропали бы
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with transaction.atomic():
+                self.stdout.write(f"Синтетические данные: {bids} заявок")
+                with connection.cursor() as cursor:
+                    for sql in SYNTHETIC_SQL:
+                        cursor.execute(sql, params if "%(" in sql else None)
+                slow = self.run_cases(options["repeat"])
+                # Синтетические данные в базе не остаются
+                transaction.set_rollback(True)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+
+        if slow:
+            self.stdout.write(self.style.WARNING(f"Медленнее {TARGET_MS} мс (p95): {', '.join(slow)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Все списки быстрее {TARGET_MS} мс (p95)"))
+
+    def run_cases(self, repeat):
+        suffix = uuid.uuid4().hex[:8]
+        admin_user = User.objects.create(
+            username=f"admin-bench-{suffix}", email=f"admin-bench-{suffix}@example.invalid",
+            is_staff=True, is_superuser=True,
+        )
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(admin_user)
+
+        bids_url = reverse("admin:demo_bid_changelist")
+        company_id = Companies.objects.order_by("-id").values_list("id", flat=True).first()
+        cases = [
+            ("заявки", bids_url),
+            ("заявки: статус", f"{bids_url}?status__exact=open"),
+            ("заявки: компания", f"{bids_url}?company__id__exact={company_id}"),
+            ("заявки: поиск", f"{bids_url}?q=palisade"),
+            ("заявки: страница 100", f"{bids_url}?p=100"),
+            ("фото", reverse("admin:demo_carsphoto_changelist")),
+            ("статусы заказов", reverse("admin:demo_status_orders_changelist")),
+        ]
+
+        slow = []
+        for label, url in cases:
+            client.get(url)  # прогрев кэша планов и страниц
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            p50 = statistics.median(timings)
+            p95 = sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)]
+            line = f"{label}: HTTP {response.status_code}, p50 {p50:.1f} мс, p95 {p95:.1f} мс"
+            if response.status_code != 200 or p95 > TARGET_MS:
+                slow.append(label)
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+        return slow
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import statistics
+import time
+import aiohttp
+from django.core.management.base import BaseCommand, CommandError
+
+TARGET_P95_MS = 500
+MAX_ERROR_RATE = 0.01
+LEVELS = "25,50,100,200,400"
+
+# Смесь запросов оператора CRM: уведомления - async-вьюха, списки - sync
+REQUESTS = [
+    "/api/notifications/",
+    "/api/message/",
+    "/api/bid/all/",
+    "/api/order/all/",
+]
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def rss_mb(pid):
+    """
+    Суммарный RSS процесса и всех его потомков (мастер gunicorn + воркеры), МБ
+    """
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+        stack += _children(current)
+    return total / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный замер веб-сервера: ступени одновременных клиентов (смесь API-запросов) "
+        "плюс открытые SSE-подключения; печатает RPS, p50/p95, ошибки и RSS сервера. "
+        "Для сравнения WSGI и ASGI запускается дважды против сервера с тем же WEB_CONCURRENCY: "
+        "вместимость - последняя ступень с p95 < --target-ms и ошибками < 1%"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000", help="Адрес сервера")
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--levels", default=LEVELS, help="Ступени одновременных клиентов через запятую")
+        parser.add_argument("--duration", type=float, default=20, help="Длительность ступени, с")
+        parser.add_argument("--sse", type=int, default=0, help="Сколько SSE-подключений /api/events/ держать открытыми")
+        parser.add_argument("--pid", type=int, help="PID мастер-процесса сервера для замера RSS (тот же хост/контейнер)")
+        parser.add_argument("--target-ms", type=float, default=TARGET_P95_MS, help="Порог p95, мс")
+        parser.add_argument("--label", default="", help="Подпись прогона (например, wsgi или asgi)")
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options["levels"].split(",") if level.strip()]
+        if options["pid"] and not os.path.exists(f"/proc/{options['pid']}"):
+            raise CommandError(f"Процесс {options['pid']} не найден: запускайте на хосте сервера")
+        asyncio.run(self.run(levels, options))
+
+    async def login(self, session, options):
+        async with session.post(
+            f"{options['url']}/api/login/",
+            json={"username": options["username"], "password": options["password"]},
+        ) as response:
+            if response.status != 200:
+                raise CommandError(f"Вход не удался: HTTP {response.status}")
+
+    async def hold_sse(self, session, url, opened, stop):
+        try:
+            async with session.get(f"{url}/api/events/", timeout=aiohttp.ClientTimeout(total=None)) as response:
+                opened.append(response.status == 200)
+                while not stop.is_set():
+                    if not await response.content.readline():
+                        break
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            opened.append(False)
+
+    async def client(self, session, url, deadline, timings, errors, offset):
+        i = offset
+        while time.monotonic() < deadline:
+            path = REQUESTS[i % len(REQUESTS)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                async with session.get(f"{url}{path}") as response:
+                    await response.read()
+                    ok = response.status < 400
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                timings.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(path)
+
+    async def run(self, levels, options):
+        url = options["url"].rstrip("/")
+        connector = aiohttp.TCPConnector(limit=0)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            # Сессионная кука: /api/events/ принимает только сессию
+            await self.login(session, options)
+
+            stop = asyncio.Event()
+            opened = []
+            sse = [asyncio.create_task(self.hold_sse(session, url, opened, stop)) for _ in range(options["sse"])]
+            if sse:
+                await asyncio.sleep(2)
+                self.stdout.write(f"SSE: открыто {sum(opened)} из {options['sse']}")
+
+            label = f"[{options['label']}] " if options["label"] else ""
+            capacity = None
+            for level in levels:
+                timings, errors = [], []
+                started = time.monotonic()
+                deadline = started + options["duration"]
+                peak_rss = 0.0
+                workers = [
+                    asyncio.create_task(self.client(session, url, deadline, timings, errors, n))
+                    for n in range(level)
+                ]
+                while not all(worker.done() for worker in workers):
+                    if options["pid"]:
+                        peak_rss = max(peak_rss, rss_mb(options["pid"]))
+                    await asyncio.sleep(0.5)
+                elapsed = time.monotonic() - started
+
+                total = len(timings) + len(errors)
+                error_rate = len(errors) / total if total else 1.0
+                p50 = statistics.median(timings) if timings else float("nan")
+                p95 = sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)] if timings else float("nan")
+                line = (
+                    f"{label}клиентов {level}: {len(timings) / elapsed:.0f} запр/с, p50 {p50:.0f} мс, "
+                    f"p95 {p95:.0f} мс, ошибок {error_rate:.1%}"
+                )
+                if options["pid"]:
+                    line += f", RSS сервера {peak_rss:.0f} МБ"
+                if timings and p95 <= options["target_ms"] and error_rate < MAX_ERROR_RATE:
+                    capacity = (level, peak_rss)
+                    self.stdout.write(line)
+                else:
+                    self.stdout.write(self.style.WARNING(line))
+
+            stop.set()
+            for task in sse:
+                task.cancel()
+            await asyncio.gather(*sse, return_exceptions=True)
+
+        if capacity is None:
+            self.stdout.write(self.style.WARNING(f"{label}Ни одна ступень не уложилась в p95 {options['target_ms']:.0f} мс"))
+        else:
+            memory = f" при RSS {capacity[1]:.0f} МБ" if options["pid"] else ""
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}Вместимость: {capacity[0]} одновременных клиентов{memory} и {options['sse']} SSE"
+            ))
@@ -0,0 +1,117 @@
+import statistics
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.core.signals import request_started, request_finished
+from django.db import close_old_connections, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from demo.models import User, Order
+from demo.serializers import OrdersSerializer
+from demo.views import orders_with_relations
+
+PAGE = 500
+
+SYNTHETIC_SQL = [
+    """
+    INSERT INTO clients (name, phone, comment)
+    SELECT (ARRAY['Иванов', 'Петров', 'Сидоров', 'Кузнецов', 'Смирнов'])[1 + g %% 5] || ' ' || g, '+7900' || g, ''
+    FROM generate_series(1, %(orders)s) g
+    """,
+    """
+    INSERT INTO statuses (current_status)
+    SELECT (ARRAY['payment', 'parking', 'preparation', 'order_received'])[1 + g %% 4]
+    FROM generate_series(1, %(orders)s) g
+    """,
+    """
+    INSERT INTO orders ("VIN", number_order, number_note, date, client_id, status_id)
+    SELECT 'KMHE' || lpad(g::text, 13, '0'), 'SM-' || g, 'BL-' || g, now()::date,
+           (SELECT max(id) FROM clients) - %(orders)s + g,
+           (SELECT max(id) FROM statuses) - %(orders)s + g
+    FROM generate_series(1, %(orders)s) g
+    """,
+    """
+    INSERT INTO status_orders_files (file, doc_type, uploaded_at)
+    SELECT 'docs/bench/' || g || '.pdf', (ARRAY['payment', 'parking', 'preparation'])[1 + g %% 3], now()
+    FROM generate_series(1, %(files)s) g
+    """,
+    """
+    INSERT INTO statuses_files (status_orders_id, statusfile_id)
+    SELECT (SELECT max(id) FROM statuses) - %(orders)s + 1 + (g - 1) / %(files_per_order)s,
+           (SELECT max(id) FROM status_orders_files) - %(files)s + g
+    FROM generate_series(1, %(files)s) g
+    """,
+    "ANALYZE clients",
+    "ANALYZE statuses",
+    "ANALYZE orders",
+    "ANALYZE status_orders_files",
+    "ANALYZE statuses_files",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер списка и карточки заказов на синтетических данных (по умолчанию 10k заказов "
+        "по 3 файла статуса): число запросов и время с предзагрузкой и без; все изменения откатываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=10000, help="Сколько синтетических заказов добавить")
+        parser.add_argument("--files", type=int, default=3, help="Файлов статуса на заказ")
+        parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого замера")
+
+    def handle(self, *args, **options):
+        orders = options["orders"]
+        params = {
+            "orders": orders,
+            "files": orders * options["files"],
+            "files_per_order": options["files"],
+        }
+
+        # Тестовый клиент закрывает "устаревшее" соединение после запроса, а внутри
+        # транзакции оно всегда считается таким - синтетические данные пропали бы
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with transaction.atomic():
+                self.stdout.write(f"Синтетические данные: {orders} заказов, {params['files']} файлов статусов")
+                with connection.cursor() as cursor:
+                    for sql in SYNTHETIC_SQL:
+                        cursor.execute(sql, params if "%(" in sql else None)
+                self.run_cases(options["repeat"])
+                # Синтетические данные в базе не остаются
+                transaction.set_rollback(True)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+
+    def run_cases(self, repeat):
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create(username=f"orders-bench-{suffix}", email=f"orders-bench-{suffix}@example.invalid")
+        client = APIClient(HTTP_HOST="localhost")
+        client.force_authenticate(user)
+        last_id = Order.objects.order_by("-id").values_list("id", flat=True).first()
+
+        def serialize(queryset):
+            return OrdersSerializer(queryset, many=True).data
+
+        cases = [
+            (f"страница {PAGE}, без предзагрузки", lambda: serialize(Order.objects.order_by("-id")[:PAGE])),
+            (f"страница {PAGE}, orders_with_relations", lambda: serialize(orders_with_relations().order_by("-id")[:PAGE])),
+            ("все заказы, orders_with_relations", lambda: serialize(orders_with_relations().order_by("-id"))),
+            ("карточка, orders_with_relations", lambda: OrdersSerializer(orders_with_relations().get(pk=last_id)).data),
+            (f"GET /api/order/all/?limit={PAGE}", lambda: client.get(f"{reverse('all_orders')}?limit={PAGE}")),
+        ]
+
+        for label, run in cases:
+            run()  # прогрев кэша планов и страниц
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - started) * 1000)
+            p50 = statistics.median(timings)
+            p95 = sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)]
+            self.stdout.write(f"{label}: запросов {len(queries)}, p50 {p50:.1f} мс, p95 {p95:.1f} мс")
@@ -0,0 +1,124 @@
+import statistics
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from demo.models import User, Companies, user_company
+from demo.search import search_bids, search_orders, search_dealers
+
+TARGET_MS = 50
+CAR_ID_BASE = 30000000
+
+SYNTHETIC_SQL = [
+    """
+    INSERT INTO companies (name, "INN", is_approved)
+    SELECT 'Компания ' || g, (7700000000 + g)::text, TRUE
+    FROM generate_series(1, %(companies)s) g
+    """,
+    """
+    INSERT INTO dealers (company_name, name, photo)
+    SELECT 'Дилер ' || g, 'Менеджер ' || g, ''
+    FROM generate_series(1, %(companies)s) g
+    """,
+    """
+    INSERT INTO bid (create_at, last_update, status, shown_to_bot, in_stock, caller_saw,
+                     brand, model, year, url, url_users, company_id, dealer_id)
+    SELECT now(), now(), 'open', TRUE, FALSE, TRUE,
+           (ARRAY['Hyundai', 'Kia', 'Genesis', 'BMW', 'Mercedes-Benz', 'Audi', 'Toyota', 'Volkswagen'])[1 + g %% 8],
+           (ARRAY['Sonata', 'Sorento', 'G80', 'X5', 'E-Class', 'A6', 'Camry', 'Tiguan', 'Palisade', 'K5'])[1 + g %% 10],
+           2015 + g %% 10,
+           'https://fem.encar.com/cars/detail/' || (%(car_id_base)s + g),
+           'https://www.encar.com/dc/dc_cardetailview.do?carid=' || (%(car_id_base)s + g),
+           (SELECT min(id) FROM companies) + g %% %(companies)s,
+           (SELECT min(id) FROM dealers) + g %% %(companies)s
+    FROM generate_series(1, %(bids)s) g
+    """,
+    """
+    INSERT INTO clients (name, phone, comment)
+    SELECT (ARRAY['Иванов', 'Петров', 'Сидоров', 'Кузнецов', 'Смирнов'])[1 + g %% 5] || ' ' || g, '+7900' || g, ''
+    FROM generate_series(1, %(orders)s) g
+    """,
+    """
+    INSERT INTO statuses (current_status)
+    SELECT 'payment' FROM generate_series(1, %(orders)s) g
+    """,
+    """
+    INSERT INTO orders ("VIN", number_order, number_note, date, client_id, status_id)
+    SELECT 'KMHE' || lpad(g::text, 13, '0'), 'SM-' || g, 'BL-' || g, now()::date,
+           (SELECT max(id) FROM clients) - %(orders)s + g,
+           (SELECT max(id) FROM statuses) - %(orders)s + g
+    FROM generate_series(1, %(orders)s) g
+    """,
+    "ANALYZE companies",
+    "ANALYZE dealers",
+    "ANALYZE bid",
+    "ANALYZE clients",
+    "ANALYZE orders",
+]
+
+
+class Command(BaseCommand):
+    help = "Замер /api/search/ на синтетических данных (по умолчанию 500k заявок); все изменения откатываются"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bids", type=int, default=500000, help="Сколько синтетических заявок добавить")
+        parser.add_argument("--repeat", type=int, default=20, help="Повторов каждого запроса")
+
+    def handle(self, *args, **options):
+        bids = options["bids"]
+        params = {
+            "bids": bids,
+            "companies": max(bids // 100, 1),
+            "orders": max(bids // 10, 1),
+            "car_id_base": CAR_ID_BASE,
+        }
+
+        with transaction.atomic():
+            self.stdout.write(f"Синтетические данные: {params['bids']} заявок, {params['orders']} заказов")
+            with connection.cursor() as cursor:
+                for sql in SYNTHETIC_SQL:
+                    cursor.execute(sql, params if "%(" in sql else None)
+
+            suffix = uuid.uuid4().hex[:8]
+            manager = User.objects.create(username=f"search-bench-{suffix}", email=f"search-bench-{suffix}@example.invalid")
+            staff = User.objects.create(
+                username=f"search-bench-staff-{suffix}", email=f"search-bench-staff-{suffix}@example.invalid", is_staff=True
+            )
+            user_company.objects.create(user_id=manager, company_id=Companies.objects.order_by("-id").first())
+
+            cases = [
+                ("заявки: префикс марки", lambda: search_bids(manager, "hyun")),
+                ("заявки: марка с опечаткой", lambda: search_bids(manager, "Hyndai")),
+                ("заявки: марка и модель", lambda: search_bids(manager, "genesis g80")),
+                ("заявки: carid из ссылки", lambda: search_bids(manager, str(CAR_ID_BASE + bids // 2))),
+                ("заявки: все компании (персонал)", lambda: search_bids(staff, "palisad")),
+                ("заказы: VIN", lambda: search_orders(manager, f"kmhe{bids // 20:013d}")),
+                ("заказы: номер заказа", lambda: search_orders(manager, f"SM-{bids // 20}")),
+                ("заказы: клиент с опечаткой", lambda: search_orders(manager, "Кузнецоф")),
+                ("дилеры: название", lambda: search_dealers(staff, "Дилер 42")),
+            ]
+
+            slow = []
+            for label, run in cases:
+                run()  # прогрев кэша планов и страниц
+                timings = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    found = run()
+                    timings.append((time.perf_counter() - started) * 1000)
+                p50 = statistics.median(timings)
+                p95 = sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)]
+                line = f"{label}: найдено {len(found)}, p50 {p50:.1f} мс, p95 {p95:.1f} мс"
+                if p95 > TARGET_MS:
+                    slow.append(label)
+                    self.stdout.write(self.style.WARNING(line))
+                else:
+                    self.stdout.write(line)
+
+            # Синтетические данные в базе не остаются
+            transaction.set_rollback(True)
+
+        if slow:
+            self.stdout.write(self.style.WARNING(f"Медленнее {TARGET_MS} мс (p95): {', '.join(slow)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Все запросы быстрее {TARGET_MS} мс (p95)"))
@@ -0,0 +1,116 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from demo.media_store import (
+    CAS_TMP_DIR, media_store, cas_name, file_digest, is_content_addressed, link_or_copy, register_blob,
+)
+from demo.thumbnails import THUMBS_DIR
+
+# Ссылки на файлы в базе: (таблица, колонка, префикс значения перед путем от MEDIA_ROOT)
+REFERENCES = [
+    ("photo", "file_url", ""),
+    ("status_orders_files", "file", ""),
+    ("demo_chatmedia", "file_url", "/media/"),
+]
+# У этих таблиц превью строились по старому пути - сбрасываем, их перестроит sweep
+THUMBNAIL_TABLES = ("photo", "status_orders_files")
+
+
+def _scan(root):
+    for directory, dirs, files in os.walk(root):
+        relative_dir = os.path.relpath(directory, root)
+        dirs[:] = [
+            d for d in dirs
+            if d != THUMBS_DIR and os.path.normpath(os.path.join(relative_dir, d)) != os.path.normpath(CAS_TMP_DIR)
+        ]
+        for filename in files:
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path) and not os.path.islink(path):
+                yield path
+
+
+def _hash(path):
+    try:
+        return path, os.path.getsize(path), file_digest(path)
+    except OSError as e:
+        return path, None, e
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит файлы MEDIA_ROOT в хранилище по содержимому: одинаковые файлы становятся "
+        "жесткими ссылками на один блоб cas/ab/cd/<sha256>, ссылки в photo, demo_chatmedia "
+        "и status_orders_files переписываются на блобы"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Потоков для подсчета SHA-256")
+        parser.add_argument("--dry-run", action="store_true", help="Только посчитать, сколько места освободится")
+
+    def handle(self, *args, **options):
+        root = str(media_store.location)
+        dry_run = options["dry_run"]
+        started = time.monotonic()
+        seen = {}        # sha256 -> путь первого файла (для --dry-run)
+        renames = []     # (старое имя, имя блоба)
+        files = duplicates = freed = 0
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for path, size, digest in pool.map(_hash, _scan(root)):
+                if size is None:
+                    self.stderr.write(f"{path}: {digest}")
+                    continue
+                files += 1
+                relative = os.path.relpath(path, root).replace(os.sep, "/")
+
+                if dry_run:
+                    if digest in seen and not os.path.samefile(seen[digest], path):
+                        duplicates += 1
+                        freed += size
+                    seen.setdefault(digest, path)
+                    continue
+
+                name = register_blob(digest, cas_name(digest, relative), size)
+                blob_path = media_store.path(name)
+                if not os.path.exists(blob_path):
+                    # Первая копия: блоб - вторая жесткая ссылка на тот же файл
+                    link_or_copy(path, blob_path)
+                elif not os.path.samefile(path, blob_path):
+                    link_or_copy(blob_path, path)
+                    duplicates += 1
+                    freed += size
+                if not is_content_addressed(relative):
+                    renames.append((relative, name))
+
+                if files % 1000 == 0:
+                    self.stdout.write(f"Просмотрено {files} файлов, дубликатов {duplicates}")
+
+        if not dry_run and renames:
+            updated = self.rewrite_references(renames)
+            self.stdout.write(f"Ссылок в базе переписано на блобы: {updated}")
+
+        action = "Можно освободить" if dry_run else "Освобождено"
+        self.stdout.write(self.style.SUCCESS(
+            f"Файлов {files}, дубликатов {duplicates}. {action} {freed / 1024 / 1024:.1f} МБ "
+            f"за {time.monotonic() - started:.0f} с"
+        ))
+        if not dry_run and renames:
+            self.stdout.write("Превью перестроит sweep_thumbnails_task или backfill_thumbnails")
+
+    def rewrite_references(self, renames):
+        updated = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("CREATE TEMP TABLE media_rename (old text PRIMARY KEY, new text NOT NULL) ON COMMIT DROP")
+            cursor.executemany("INSERT INTO media_rename (old, new) VALUES (%s, %s) ON CONFLICT DO NOTHING", renames)
+            for table, column, prefix in REFERENCES:
+                reset = ", thumbnails = NULL" if table in THUMBNAIL_TABLES else ""
+                # Триггеры media_blob_ref увеличивают ref_count блобов на каждую переписанную строку
+                cursor.execute(
+                    f"UPDATE {table} t SET {column} = %s || r.new{reset} "
+                    f"FROM media_rename r WHERE t.{column} = %s || r.old",
+                    [prefix, prefix],
+                )
+                updated += cursor.rowcount
+        return updated
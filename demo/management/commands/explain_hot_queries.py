@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# Горячие выборки ботов и API (см. Sewa-motors-bot/Sewa-motors-call utils/data.py)
+HOT_QUERIES = [
+    ("bid по теме форума", "SELECT id FROM bid WHERE thread_id = 42"),
+    (
+        "открытые без осмотрщика",
+        "SELECT * FROM bid WHERE status = 'open' AND manager_id IS NULL "
+        "AND opened_at IS NOT NULL ORDER BY opened_at DESC",
+    ),
+    (
+        "открытые за сутки",
+        "SELECT * FROM bid WHERE status = 'open' AND opened_at IS NOT NULL "
+        "AND opened_at >= NOW() - INTERVAL '1 day' ORDER BY opened_at DESC",
+    ),
+    (
+        "напоминания (не показанные)",
+        "SELECT * FROM bid WHERE status = 'open' AND shown_to_bot = FALSE AND opened_at IS NOT NULL "
+        "AND opened_at <= NOW() - make_interval(secs => 60) ORDER BY opened_at ASC",
+    ),
+    ("открытые у осмотрщика", "SELECT count(id) FROM bid WHERE status = 'open' AND manager_id = 1"),
+    ("прозвон без дилера", "SELECT * FROM bid WHERE status = 'ring' AND dealer_id IS NULL"),
+    ("закрытые компании", "SELECT * FROM bid WHERE company_id = 1 AND status = 'disabled'"),
+    ("компания по ИНН", "SELECT * FROM companies WHERE \"INN\" = '7700000042'"),
+    ("группа по tg_id", "SELECT inspection_id FROM groups WHERE tg_id = 42"),
+    ("фото заявки", "SELECT file_url FROM photo WHERE bid_id = 42"),
+]
+
+SYNTHETIC_SQL = [
+    """
+    INSERT INTO companies (name, "INN", is_approved)
+    SELECT 'Компания ' || g, (7700000000 + g)::text, TRUE
+    FROM generate_series(1, %(companies)s) g
+    """,
+    """
+    INSERT INTO groups (tg_id, inspection_id, clients_id, calls_id)
+    SELECT g, g, g, g FROM generate_series(1, %(companies)s) g
+    """,
+    """
+    INSERT INTO bid (create_at, last_update, status, shown_to_bot, in_stock, caller_saw,
+                     opened_at, thread_id, company_id)
+    SELECT now() - g * INTERVAL '1 minute',
+           now(),
+           (ARRAY['disable', 'ring', 'open', 'progress', 'review', 'disabled'])[1 + g %% 6],
+           g %% 10 <> 0,
+           FALSE,
+           TRUE,
+           CASE WHEN g %% 6 = 2 THEN now() - (g %% 5000) * INTERVAL '1 minute' END,
+           CASE WHEN g %% 3 = 0 THEN g END,
+           (SELECT min(id) FROM companies)
+    FROM generate_series(1, %(bids)s) g
+    """,
+    "ANALYZE bid",
+    "ANALYZE companies",
+    "ANALYZE groups",
+]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN ANALYZE горячих выборок bid/companies/groups/photo (с --synthetic N на временных данных)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--synthetic",
+            type=int,
+            default=0,
+            help="Добавить N синтетических заявок перед замером; все изменения откатываются",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if options["synthetic"]:
+                    params = {"bids": options["synthetic"], "companies": max(options["synthetic"] // 100, 1)}
+                    for sql in SYNTHETIC_SQL:
+                        cursor.execute(sql, params if "%(" in sql else None)
+
+                seq_scans = []
+                for label, sql in HOT_QUERIES:
+                    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")
+                    plan = [row[0] for row in cursor.fetchall()]
+                    self.stdout.write(self.style.MIGRATE_HEADING(f"== {label}"))
+                    self.stdout.write(sql)
+                    self.stdout.write("\n".join(plan) + "\n")
+                    if any("Seq Scan" in line for line in plan):
+                        seq_scans.append(label)
+
+            # Синтетические данные в базе не остаются
+            transaction.set_rollback(True)
+
+        if seq_scans:
+            self.stdout.write(self.style.WARNING(f"Seq Scan: {', '.join(seq_scans)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Seq Scan не найден ни в одной выборке"))
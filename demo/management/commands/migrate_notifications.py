@@ -0,0 +1,36 @@
+from datetime import datetime
+import json
+from django.core.management.base import BaseCommand
+from demo.notifications import add_notification, r, LEGACY_QUEUE_KEY
+
+
+class Command(BaseCommand):
+    help = "Переносит уведомления из старого списка notifications_queue в новое хранилище"
+
+    def handle(self, *args, **options):
+        raw = r.lrange(LEGACY_QUEUE_KEY, 0, -1)
+        if not raw:
+            self.stdout.write("Старых уведомлений нет")
+            return
+
+        migrated = skipped = 0
+        for position, item in enumerate(raw):
+            try:
+                event = json.loads(item)
+            except ValueError:
+                skipped += 1
+                continue
+            try:
+                score = datetime.strptime(event.get("time", ""), "%Y-%m-%d %H:%M:%S").timestamp()
+            except ValueError:
+                score = None
+            # Сохраняем исходный порядок для записей с одинаковым временем
+            score = (score or 0) + position / 1_000_000
+            if add_notification(event, score=score):
+                migrated += 1
+            else:
+                skipped += 1
+
+        # Старый список не удаляем, а оставляем копией до ручной проверки
+        r.rename(LEGACY_QUEUE_KEY, f"{LEGACY_QUEUE_KEY}:migrated")
+        self.stdout.write(self.style.SUCCESS(f"Перенесено: {migrated}, пропущено: {skipped}"))
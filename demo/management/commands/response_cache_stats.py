@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from demo.response_cache import cache_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Попадания и промахи кэша ответов детальных эндпоинтов (demo.response_cache)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Обнулить счетчики после вывода")
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        if not stats:
+            self.stdout.write("Обращений к кэшу еще не было")
+        for kind, counters in sorted(stats.items()):
+            self.stdout.write(
+                f"{kind}: hit={counters['hit']} miss={counters['miss']} ratio={counters['ratio']:.1%}"
+            )
+        if options["reset"]:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("Счетчики обнулены"))
@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import time
+from functools import partial
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.utils.deconstruct import deconstructible
+
+logger = logging.getLogger(__name__)
+
+# Общее хранилище файлов по содержимому (CRM и боты пишут в один том storage):
+#   cas/ab/cd/<sha256><ext>   - один файл на SHA-256, каталоги по первым байтам хэша
+#   cas/tmp/                  - недописанные файлы; в cas/ попадают атомарным os.replace.
+#                               Брошенные (откат, падение процесса) удаляет сборщик мусора
+# Таблица media_blob: строка на хэш, ref_count ведут триггеры photo, demo_chatmedia
+# и status_orders_files по путям cas/... в их колонках (в том числе для вставок ботов).
+# Запись в хранилище сначала регистрирует хэш (last_seen = now()), потом кладет файл:
+# сборщик мусора не трогает блоб моложе MEDIA_STORE_GC_GRACE_HOURS, а строку блоба
+# удаляет под блокировкой вместе с переносом файла (см. collect_garbage).
+CAS_DIR = "cas"
+CAS_TMP_DIR = "cas/tmp"
+CAS_NAME_RE = re.compile(r"(?:^|/)cas/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})")
+HASH_CHUNK = 1024 * 1024
+
+REGISTER_SQL = """
+INSERT INTO media_blob (sha256, name, size, ref_count, last_seen)
+VALUES (%s, %s, %s, 0, now())
+ON CONFLICT (sha256) DO UPDATE SET
+    last_seen = now(),
+    name = coalesce(media_blob.name, EXCLUDED.name),
+    size = coalesce(media_blob.size, EXCLUDED.size)
+RETURNING name
+"""
+
+
+def cas_name(digest, filename=""):
+    ext = posixpath.splitext(filename)[1].lower()[:10]
+    return posixpath.join(CAS_DIR, digest[:2], digest[2:4], digest + ext)
+
+
+def is_content_addressed(name):
+    return bool(name and CAS_NAME_RE.search(name))
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def register_blob(digest, name, size):
+    """
+    Регистрирует хэш в media_blob и возвращает имя файла блоба: если такое
+    содержимое уже есть (возможно, с другим расширением) - имя существующего
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(REGISTER_SQL, [digest, name, size])
+        return cursor.fetchone()[0]
+
+
+def link_or_copy(source, target):
+    """
+    Жесткая ссылка target -> source через временное имя: target заменяется
+    атомарно. Между разными файловыми системами - копия
+    """
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".link-")
+    os.close(fd)
+    os.unlink(tmp)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copy2(source, tmp)
+    os.replace(tmp, target)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage, который сохраняет файл под именем cas/ab/cd/<sha256><ext>.
+    Одинаковое содержимое пишется на диск один раз; upload_to поля
+    влияет только на расширение
+    """
+
+    def _save(self, name, content):
+        tmp_dir = self.path(CAS_TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            # Строка блоба заблокирована upsert'ом до конца транзакции вызывающего: сборщик мусора ее пропустит
+            stored = register_blob(sha.hexdigest(), cas_name(sha.hexdigest(), name), size)
+            path = self.path(stored)
+            if os.path.exists(path):
+                os.unlink(tmp)
+            else:
+                # mkstemp создает файл 0600 - nginx его бы не прочитал
+                os.chmod(tmp, self.file_permissions_mode if self.file_permissions_mode is not None else 0o644)
+                # Файл появляется в cas/ только вместе со строкой media_blob: при откате
+                # транзакции он остается в cas/tmp, откуда его удалит сборщик мусора
+                transaction.on_commit(partial(self._publish, tmp, path))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return stored
+
+    @staticmethod
+    def _publish(tmp, path):
+        if os.path.exists(path):
+            os.unlink(tmp)   # Тот же блоб успела положить параллельная загрузка
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp, path)
+
+    def delete(self, name):
+        # Файл блоба могут использовать другие записи: удаляет только сборщик мусора
+        if is_content_addressed(name):
+            return
+        super().delete(name)
+
+
+media_store = ContentAddressedStorage()
+
+
+CANDIDATES_SQL = """
+SELECT sha256 FROM media_blob
+WHERE ref_count <= 0 AND last_seen < now() - make_interval(hours => %s)
+ORDER BY last_seen
+"""
+
+# Повторная проверка под блокировкой: между выборкой и удалением блоб мог снова
+# понадобиться (register_blob обновит last_seen, триггер - ref_count)
+LOCK_SQL = """
+SELECT name, size FROM media_blob
+WHERE sha256 = %s AND ref_count <= 0 AND last_seen < now() - make_interval(hours => %s)
+FOR UPDATE SKIP LOCKED
+"""
+
+
+def _remove_stale_tmp(root, grace_hours):
+    # Недописанные загрузки и файлы откаченных транзакций
+    tmp_dir = os.path.join(root, CAS_TMP_DIR)
+    if not os.path.isdir(tmp_dir):
+        return 0
+    deadline = time.time() - grace_hours * 3600
+    removed = 0
+    for entry in os.scandir(tmp_dir):
+        if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < deadline:
+            os.unlink(entry.path)
+            removed += 1
+    return removed
+
+
+def _collect_blob(digest, grace_hours):
+    """
+    Удаляет один блоб. Строка блокируется и удаляется в одной транзакции с переносом
+    файла в cas/tmp: параллельная загрузка того же содержимого ждет блокировку и после
+    коммита уже не находит файл - кладет свой. Возвращает освобожденные байты или None
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(LOCK_SQL, [digest, grace_hours])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        name, size = row
+        trash = None
+        if name:
+            path = media_store.path(name)
+            if not os.path.exists(path):
+                # Строку не удаляем: скорее всего, не смонтирован том storage
+                logger.error(f"Хранилище файлов: файл блоба {digest} не найден ({path}), блоб оставлен")
+                return None
+            trash = media_store.path(posixpath.join(CAS_TMP_DIR, f"gc-{digest}"))
+            os.makedirs(os.path.dirname(trash), exist_ok=True)
+            os.replace(path, trash)
+        try:
+            cursor.execute("DELETE FROM media_blob WHERE sha256 = %s", [digest])
+            thumbs = os.path.join(os.path.dirname(path), ".thumbs") if name else None
+            if thumbs and os.path.isdir(thumbs):
+                for entry in os.scandir(thumbs):
+                    if entry.name.startswith(digest):
+                        os.unlink(entry.path)
+        except BaseException:
+            if trash:
+                os.replace(trash, path)
+            raise
+    if trash:
+        os.unlink(trash)
+    return size or 0
+
+
+def collect_garbage(grace_hours):
+    """
+    Удаляет блобы без ссылок (ref_count = 0), не использованные дольше grace_hours,
+    вместе с их превью, и брошенные файлы cas/tmp. Возвращает (число блобов, освобождено байт)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(CANDIDATES_SQL, [grace_hours])
+        candidates = [digest for digest, in cursor.fetchall()]
+
+    removed = freed = 0
+    for digest in candidates:
+        size = _collect_blob(digest, grace_hours)
+        if size is not None:
+            removed += 1
+            freed += size
+    stale = _remove_stale_tmp(str(media_store.location), grace_hours)
+    logger.info(
+        f"Хранилище файлов: удалено блобов {removed} из {len(candidates)}, освобождено {freed} байт, "
+        f"брошенных временных файлов {stale}"
+    )
+    return removed, freed
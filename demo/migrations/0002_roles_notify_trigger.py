@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+# Боты держат роли (users/groups) в памяти и сбрасывают кэш
+# по уведомлению из канала roles_changed.
+ROLES_NOTIFY_SQL = """
+CREATE OR REPLACE FUNCTION notify_roles_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('roles_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_roles_changed ON users;
+CREATE TRIGGER users_roles_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_roles_changed();
+
+DROP TRIGGER IF EXISTS groups_roles_changed ON groups;
+CREATE TRIGGER groups_roles_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON groups
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_roles_changed();
+"""
+
+ROLES_NOTIFY_REVERSE_SQL = """
+DROP TRIGGER IF EXISTS users_roles_changed ON users;
+DROP TRIGGER IF EXISTS groups_roles_changed ON groups;
+DROP FUNCTION IF EXISTS notify_roles_changed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunSQL(ROLES_NOTIFY_SQL, ROLES_NOTIFY_REVERSE_SQL),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+# Боты подписываются на канал bid_changes и реагируют на новые заявки
+# и смену статуса сразу, без опроса таблицы bid.
+BID_NOTIFY_SQL = """
+CREATE OR REPLACE FUNCTION notify_bid_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.status IS NOT DISTINCT FROM OLD.status THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify(
+        'bid_changes',
+        json_build_object(
+            'id', NEW.id,
+            'op', TG_OP,
+            'status', NEW.status,
+            'old_status', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+            'company_id', NEW.company_id,
+            'dealer_id', NEW.dealer_id
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bid_changed ON bid;
+CREATE TRIGGER bid_changed
+    AFTER INSERT OR UPDATE OF status ON bid
+    FOR EACH ROW EXECUTE FUNCTION notify_bid_changed();
+"""
+
+BID_NOTIFY_REVERSE_SQL = """
+DROP TRIGGER IF EXISTS bid_changed ON bid;
+DROP FUNCTION IF EXISTS notify_bid_changed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0002_roles_notify_trigger"),
+    ]
+
+    operations = [
+        migrations.RunSQL(BID_NOTIFY_SQL, BID_NOTIFY_REVERSE_SQL),
+    ]
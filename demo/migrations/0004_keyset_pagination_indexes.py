@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0003_bid_notify_trigger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bid",
+            index=models.Index(fields=["user", "-id"], name="bid_user_id_desc_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(fields=["message_thread_id", "-id"], name="chatmsg_thread_id_desc_idx"),
+        ),
+    ]
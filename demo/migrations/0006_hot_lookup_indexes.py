@@ -0,0 +1,64 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# Индексы под выборки ботов и API. Создаются CONCURRENTLY,
+# чтобы не блокировать запись в bid на время построения.
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("demo", "0005_chatmessage_delivery"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="bid",
+            index=models.Index(condition=models.Q(thread_id__isnull=False), fields=["thread_id"], name="bid_thread_id_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=models.Index(fields=["status", "opened_at"], name="bid_status_opened_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=models.Index(
+                condition=models.Q(manager__isnull=True),
+                fields=["status", "opened_at"],
+                name="bid_unassigned_opened_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=models.Index(
+                condition=models.Q(status="open", shown_to_bot=False),
+                fields=["opened_at"],
+                name="bid_open_unshown_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=models.Index(fields=["manager", "status"], name="bid_manager_status_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=models.Index(fields=["company", "status"], name="bid_company_status_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=models.Index(condition=models.Q(dealer__isnull=True), fields=["status"], name="bid_no_dealer_status_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="companies",
+            index=models.Index(fields=["INN"], name="companies_inn_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="groups",
+            index=models.Index(fields=["tg_id"], name="groups_tg_id_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="dealers",
+            index=models.Index(fields=["company_name"], name="dealers_company_name_idx"),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+# Боты меняют bid напрямую SQL-запросами, и auto_now у last_update не срабатывает.
+# Триггер обновляет last_update при любом UPDATE: по нему считаются ETag заявок.
+BID_TOUCH_SQL = """
+CREATE OR REPLACE FUNCTION bid_touch_last_update() RETURNS trigger AS $$
+BEGIN
+    NEW.last_update = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bid_touch_last_update ON bid;
+CREATE TRIGGER bid_touch_last_update
+    BEFORE UPDATE ON bid
+    FOR EACH ROW EXECUTE FUNCTION bid_touch_last_update();
+"""
+
+BID_TOUCH_REVERSE_SQL = """
+DROP TRIGGER IF EXISTS bid_touch_last_update ON bid;
+DROP FUNCTION IF EXISTS bid_touch_last_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0006_hot_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(BID_TOUCH_SQL, BID_TOUCH_REVERSE_SQL),
+    ]
@@ -0,0 +1,121 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+# Поиск по заявкам, заказам и дилерам (demo.search): tsvector-колонки
+# и GIN-индексы pg_trgm. Индексы строятся CONCURRENTLY, без блокировки записи.
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("demo", "0007_bid_touch_last_update"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="bid",
+            name="search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.CombinedSearchVector(
+                    django.contrib.postgres.search.SearchVector("brand", config="simple", weight="A"),
+                    "||",
+                    django.contrib.postgres.search.SearchVector("model", config="simple", weight="B"),
+                    django.contrib.postgres.search.SearchConfig("simple"),
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.CombinedSearchVector(
+                    django.contrib.postgres.search.SearchVector("VIN", "number_order", config="simple", weight="A"),
+                    "||",
+                    django.contrib.postgres.search.SearchVector("number_note", config="simple", weight="B"),
+                    django.contrib.postgres.search.SearchConfig("simple"),
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddField(
+            model_name="dealers",
+            name="search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.CombinedSearchVector(
+                    django.contrib.postgres.search.SearchVector("company_name", config="simple", weight="A"),
+                    "||",
+                    django.contrib.postgres.search.SearchVector("name", config="simple", weight="B"),
+                    django.contrib.postgres.search.SearchConfig("simple"),
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="bid_search_vector_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["brand"], name="bid_brand_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["model"], name="bid_model_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["url"], name="bid_url_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["url_users"], name="bid_url_users_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="orders_search_vector_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["VIN"], name="orders_vin_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["number_order"], name="orders_number_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="client",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"], name="clients_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="dealers",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="dealers_search_vector_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="dealers",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["company_name"], name="dealers_company_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+    ]
@@ -0,0 +1,155 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# Время назначения осмотрщика: боты пишут manager_id напрямую, поэтому его
+# фиксирует триггер. Колонка принадлежит триггеру: при неизменном manager_id
+# значение сохраняется, даже если ORM записал устаревшее.
+ASSIGNMENT_SQL = """
+CREATE OR REPLACE FUNCTION bid_track_assignment() RETURNS trigger AS $$
+BEGIN
+    IF NEW.manager_id IS NULL THEN
+        NEW.assigned_at = NULL;
+    ELSIF TG_OP = 'INSERT' OR OLD.manager_id IS DISTINCT FROM NEW.manager_id THEN
+        NEW.assigned_at = now();
+    ELSE
+        NEW.assigned_at = OLD.assigned_at;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bid_track_assignment ON bid;
+CREATE TRIGGER bid_track_assignment
+    BEFORE INSERT OR UPDATE ON bid
+    FOR EACH ROW EXECUTE FUNCTION bid_track_assignment();
+"""
+
+ASSIGNMENT_REVERSE_SQL = """
+DROP TRIGGER IF EXISTS bid_track_assignment ON bid;
+DROP FUNCTION IF EXISTS bid_track_assignment();
+"""
+
+# Слои аналитики (demo.analytics):
+#   analytics_bid_facts     - по строке на открытую заявку, обновляется по bid.last_update
+#   analytics_bid_daily     - сводка по (день открытия, компания, осмотрщик), пересчитываются только затронутые дни
+#   analytics_*             - материализованные представления для /api/analytics/ и бота
+ANALYTICS_SQL = """
+CREATE TABLE analytics_refresh_state (
+    id integer PRIMARY KEY,
+    watermark timestamptz NOT NULL,
+    refreshed_at timestamptz
+);
+INSERT INTO analytics_refresh_state (id, watermark) VALUES (1, '-infinity');
+
+CREATE TABLE analytics_bid_facts (
+    bid_id bigint PRIMARY KEY REFERENCES bid (id) ON DELETE CASCADE,
+    day date NOT NULL,
+    company_id bigint NOT NULL,
+    manager_id bigint NOT NULL,
+    status varchar(20) NOT NULL,
+    assign_seconds double precision,
+    arrive_seconds double precision
+);
+CREATE INDEX analytics_bid_facts_day_idx ON analytics_bid_facts (day);
+
+CREATE TABLE analytics_bid_daily (
+    day date NOT NULL,
+    company_id bigint NOT NULL,
+    manager_id bigint NOT NULL,
+    opened integer NOT NULL,
+    assigned integer NOT NULL,
+    done integer NOT NULL,
+    assign_samples integer NOT NULL,
+    assign_seconds_sum double precision NOT NULL,
+    arrive_samples integer NOT NULL,
+    arrive_seconds_sum double precision NOT NULL,
+    PRIMARY KEY (day, company_id, manager_id)
+);
+
+CREATE MATERIALIZED VIEW analytics_open_backlog AS
+SELECT coalesce(b.company_id, 0) AS company_id,
+       max(c.name) AS company_name,
+       count(*) FILTER (WHERE b.status = 'open') AS open,
+       count(*) FILTER (WHERE b.status = 'progress') AS in_progress,
+       count(*) FILTER (WHERE b.status = 'open' AND b.manager_id IS NULL) AS unassigned,
+       min(b.opened_at) AS oldest_opened_at,
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM now() - b.opened_at)) AS median_age_seconds
+FROM bid b
+LEFT JOIN companies c ON c.id = b.company_id
+WHERE b.status IN ('open', 'progress') AND b.opened_at IS NOT NULL
+GROUP BY coalesce(b.company_id, 0);
+CREATE UNIQUE INDEX analytics_open_backlog_company_idx ON analytics_open_backlog (company_id);
+
+CREATE MATERIALIZED VIEW analytics_inspector_throughput AS
+SELECT manager_id,
+       coalesce(sum(assigned) FILTER (WHERE day > current_date - 7), 0) AS assigned_7d,
+       coalesce(sum(arrive_samples) FILTER (WHERE day > current_date - 7), 0) AS arrived_7d,
+       coalesce(sum(done) FILTER (WHERE day > current_date - 7), 0) AS done_7d,
+       sum(assigned) AS assigned_30d,
+       sum(arrive_samples) AS arrived_30d,
+       sum(done) AS done_30d,
+       sum(assign_seconds_sum) / nullif(sum(assign_samples), 0) AS avg_assign_seconds_30d,
+       sum(arrive_seconds_sum) / nullif(sum(arrive_samples), 0) AS avg_arrive_seconds_30d,
+       rank() OVER (ORDER BY sum(done) DESC) AS rank_30d
+FROM analytics_bid_daily
+WHERE manager_id <> 0 AND day > current_date - 30
+GROUP BY manager_id;
+CREATE UNIQUE INDEX analytics_inspector_throughput_manager_idx ON analytics_inspector_throughput (manager_id);
+
+CREATE MATERIALIZED VIEW analytics_daily_trend AS
+WITH per_day AS (
+    SELECT day,
+           sum(opened) AS opened,
+           sum(assigned) AS assigned,
+           sum(done) AS done,
+           sum(assign_samples) AS assign_samples,
+           sum(assign_seconds_sum) AS assign_seconds_sum,
+           sum(arrive_samples) AS arrive_samples,
+           sum(arrive_seconds_sum) AS arrive_seconds_sum
+    FROM analytics_bid_daily
+    WHERE day > current_date - 90
+    GROUP BY day
+)
+SELECT day, opened, assigned, done,
+       assign_seconds_sum / nullif(assign_samples, 0) AS avg_assign_seconds,
+       arrive_seconds_sum / nullif(arrive_samples, 0) AS avg_arrive_seconds,
+       sum(assign_seconds_sum) OVER week / nullif(sum(assign_samples) OVER week, 0) AS avg_assign_seconds_7d,
+       sum(arrive_seconds_sum) OVER week / nullif(sum(arrive_samples) OVER week, 0) AS avg_arrive_seconds_7d,
+       sum(opened) OVER week AS opened_7d
+FROM per_day
+WINDOW week AS (ORDER BY day RANGE BETWEEN INTERVAL '6 days' PRECEDING AND CURRENT ROW);
+CREATE UNIQUE INDEX analytics_daily_trend_day_idx ON analytics_daily_trend (day);
+"""
+
+ANALYTICS_REVERSE_SQL = """
+DROP MATERIALIZED VIEW IF EXISTS analytics_daily_trend;
+DROP MATERIALIZED VIEW IF EXISTS analytics_inspector_throughput;
+DROP MATERIALIZED VIEW IF EXISTS analytics_open_backlog;
+DROP TABLE IF EXISTS analytics_bid_daily;
+DROP TABLE IF EXISTS analytics_bid_facts;
+DROP TABLE IF EXISTS analytics_refresh_state;
+"""
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("demo", "0008_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bid",
+            name="assigned_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(ASSIGNMENT_SQL, ASSIGNMENT_REVERSE_SQL),
+        AddIndexConcurrently(
+            model_name="bid",
+            index=models.Index(fields=["last_update"], name="bid_last_update_idx"),
+        ),
+        migrations.RunSQL(ANALYTICS_SQL, ANALYTICS_REVERSE_SQL),
+    ]
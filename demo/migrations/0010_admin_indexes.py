@@ -0,0 +1,23 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# Индексы под фильтры и сортировку списков админки (заказы по дате, статусы)
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("demo", "0009_analytics"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="status_orders",
+            index=models.Index(fields=["current_status"], name="statuses_current_status_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(fields=["-date", "-id"], name="orders_date_desc_idx"),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# Превью изображений (demo.thumbnails). Колонки без значения по умолчанию:
+# добавление мгновенное, а вставки ботов в photo не меняются
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("demo", "0010_admin_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="carsphoto",
+            name="thumbnails",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="dealers",
+            name="thumbnails",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="statusfile",
+            name="thumbnails",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name="carsphoto",
+            index=models.Index(
+                condition=models.Q(("thumbnails__isnull", True)), fields=["id"], name="photo_thumbnails_pending_idx"
+            ),
+        ),
+    ]
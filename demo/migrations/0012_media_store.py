@@ -0,0 +1,93 @@
+import demo.media_store
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+# Счетчики ссылок на блобы хранилища (demo.media_store). Ссылкой считается путь
+# cas/ab/cd/<sha256> в колонке файла: так учитываются и вставки ботов в photo
+# и demo_chatmedia (там URL /media/cas/...).
+BLOB_REF_SQL = r"""
+CREATE OR REPLACE FUNCTION media_blob_ref() RETURNS trigger AS $$
+DECLARE
+    pattern constant text := '(?:^|/)cas/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})';
+    old_hash text;
+    new_hash text;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        old_hash = substring(to_jsonb(OLD) ->> TG_ARGV[0] FROM pattern);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        new_hash = substring(to_jsonb(NEW) ->> TG_ARGV[0] FROM pattern);
+    END IF;
+    IF old_hash IS NOT DISTINCT FROM new_hash THEN
+        RETURN NULL;
+    END IF;
+    IF old_hash IS NOT NULL THEN
+        UPDATE media_blob SET ref_count = ref_count - 1, last_seen = now() WHERE sha256 = old_hash;
+    END IF;
+    IF new_hash IS NOT NULL THEN
+        INSERT INTO media_blob (sha256, ref_count, last_seen) VALUES (new_hash, 1, now())
+        ON CONFLICT (sha256) DO UPDATE SET ref_count = media_blob.ref_count + 1, last_seen = now();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER photo_media_blob_ref
+    AFTER INSERT OR UPDATE OF file_url OR DELETE ON photo
+    FOR EACH ROW EXECUTE FUNCTION media_blob_ref('file_url');
+CREATE TRIGGER chatmedia_media_blob_ref
+    AFTER INSERT OR UPDATE OF file_url OR DELETE ON demo_chatmedia
+    FOR EACH ROW EXECUTE FUNCTION media_blob_ref('file_url');
+CREATE TRIGGER status_file_media_blob_ref
+    AFTER INSERT OR UPDATE OF file OR DELETE ON status_orders_files
+    FOR EACH ROW EXECUTE FUNCTION media_blob_ref('file');
+"""
+
+BLOB_REF_REVERSE_SQL = """
+DROP TRIGGER IF EXISTS photo_media_blob_ref ON photo;
+DROP TRIGGER IF EXISTS chatmedia_media_blob_ref ON demo_chatmedia;
+DROP TRIGGER IF EXISTS status_file_media_blob_ref ON status_orders_files;
+DROP FUNCTION IF EXISTS media_blob_ref();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0011_thumbnails"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaBlob",
+            fields=[
+                ("sha256", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("name", models.CharField(blank=True, max_length=255, null=True)),
+                ("size", models.BigIntegerField(blank=True, null=True)),
+                ("ref_count", models.IntegerField(db_default=0)),
+                ("last_seen", models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+            ],
+            options={
+                "verbose_name": "Файл хранилища",
+                "verbose_name_plural": "Файлы хранилища",
+                "db_table": "media_blob",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("ref_count__lte", 0)), fields=["last_seen"], name="media_blob_unreferenced_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AlterField(
+            model_name="carsphoto",
+            name="file_url",
+            field=models.FileField(storage=demo.media_store.ContentAddressedStorage(), upload_to=""),
+        ),
+        migrations.AlterField(
+            model_name="statusfile",
+            name="file",
+            field=models.FileField(storage=demo.media_store.ContentAddressedStorage(), upload_to="docs/%Y/%m/%d/"),
+        ),
+        migrations.RunSQL(BLOB_REF_SQL, BLOB_REF_REVERSE_SQL),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+# Превью, записанные с ошибкой "файл не найден" (воркер celery не видел том storage),
+# сбрасываются в NULL: sweep_thumbnails_task построит их заново
+RETRY_MISSING_SQL = """
+UPDATE photo SET thumbnails = NULL WHERE thumbnails ->> 'error' = 'файл не найден';
+UPDATE dealers SET thumbnails = NULL WHERE thumbnails ->> 'error' = 'файл не найден';
+UPDATE status_orders_files SET thumbnails = NULL WHERE thumbnails ->> 'error' = 'файл не найден';
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0012_media_store"),
+    ]
+
+    operations = [
+        migrations.RunSQL(RETRY_MISSING_SQL, migrations.RunSQL.noop),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models.functions import Now
+from demo.media_store import media_store
 
 
 class Companies(models.Model):
@@ -15,6 +19,9 @@ class Companies(models.Model):
         db_table = "companies"
         verbose_name = "Компания"
         verbose_name_plural = "Компании"
+        indexes = [
+            models.Index(fields=["INN"], name="companies_inn_idx"),
+        ]
     def __str__(self):
         return self.name
     
@@ -55,6 +62,9 @@ class Client(models.Model):
         db_table = "clients"
         verbose_name = "Клиент"
         verbose_name_plural = "Клиенты"
+        indexes = [
+            GinIndex(fields=["name"], name="clients_name_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
 
 class StatusFile(models.Model):
     DOC_TYPE_CHOICES = [
@@ -67,9 +77,11 @@ class StatusFile(models.Model):
         ("order_received", "Заказ получен"),
     ]
 
-    file = models.FileField(upload_to='docs/%Y/%m/%d/')
+    file = models.FileField(upload_to='docs/%Y/%m/%d/', storage=media_store)
     doc_type = models.CharField(max_length=50, choices=DOC_TYPE_CHOICES)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Превью (demo.thumbnails); NULL - еще не обработан
+    thumbnails = models.JSONField(blank=True, null=True, editable=False)
     class Meta:
         db_table = "status_orders_files"
         verbose_name = "Файл к статусам"
@@ -95,6 +107,9 @@ class Status_orders(models.Model):
         db_table = "statuses"
         verbose_name = "Статус"
         verbose_name_plural = "Статусы"
+        indexes = [
+            models.Index(fields=["current_status"], name="statuses_current_status_idx"),
+        ]
 
 class Order(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
@@ -103,10 +118,25 @@ class Order(models.Model):
     number_note = models.CharField(max_length=100)
     date = models.DateField(auto_now_add=True)
     status = models.ForeignKey(Status_orders, on_delete=models.CASCADE)
+    # Поиск (demo.search): вектор считает сам Postgres при любой записи
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("VIN", "number_order", weight="A", config="simple")
+            + SearchVector("number_note", weight="B", config="simple")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     class Meta:
         db_table = "orders"
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
+        indexes = [
+            models.Index(fields=["-date", "-id"], name="orders_date_desc_idx"),
+            GinIndex(fields=["search_vector"], name="orders_search_vector_idx"),
+            GinIndex(fields=["VIN"], name="orders_vin_trgm_idx", opclasses=["gin_trgm_ops"]),
+            GinIndex(fields=["number_order"], name="orders_number_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
 
 class Groups(models.Model):
     tg_id=models.BigIntegerField()
@@ -117,6 +147,9 @@ class Groups(models.Model):
         db_table = "groups"
         verbose_name = "Группа"
         verbose_name_plural = "Группы"
+        indexes = [
+            models.Index(fields=["tg_id"], name="groups_tg_id_idx"),
+        ]
 
 class TGUsers(models.Model):
     id = models.BigIntegerField(primary_key=True,verbose_name="ID пользователя в телеграм")
@@ -136,10 +169,25 @@ class Dealers(models.Model):
     phone = models.CharField(max_length=100, blank=True, null=True, verbose_name="Телефон компании")
     address = models.CharField(max_length=100, blank=True, null=True, verbose_name="Адрес компании")
     photo = models.FileField(upload_to='dealers/%Y/%m/%d/', blank=True)
+    # Превью (demo.thumbnails); NULL - еще не обработан
+    thumbnails = models.JSONField(blank=True, null=True, editable=False)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("company_name", weight="A", config="simple")
+            + SearchVector("name", weight="B", config="simple")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     class Meta:
         db_table = "dealers"
         verbose_name = "Дилер"
         verbose_name_plural = "Дилеры"
+        indexes = [
+            models.Index(fields=["company_name"], name="dealers_company_name_idx"),
+            GinIndex(fields=["search_vector"], name="dealers_search_vector_idx"),
+            GinIndex(fields=["company_name"], name="dealers_company_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
     def __str__(self):
         return self.company_name or "Без названия"
 
@@ -175,28 +223,72 @@ class bid(models.Model):
     dealer = models.ForeignKey(Dealers, on_delete=models.CASCADE, blank=True, null=True, verbose_name="Дилер")
     opened_at = models.DateTimeField(blank=True, null=True)
     arrived_time = models.DateTimeField(blank=True, null=True)
+    # Заполняет триггер bid_track_assignment при назначении осмотрщика (в том числе ботами)
+    assigned_at = models.DateTimeField(blank=True, null=True, editable=False)
     thread_id = models.BigIntegerField(blank=True, null=True)
     checklist_point1 = models.CharField(max_length=100, null=True, blank=True, verbose_name="Состояние бампера")
     checklist_point2 = models.CharField(max_length=100, null=True, blank=True, verbose_name="Уровень топлива в баке")
     shown_to_bot = models.BooleanField(default=False, verbose_name="Уведомление боту показано")
     in_stock = models.BooleanField(default=False, verbose_name="Авто в наличии")
     caller_saw = models.BooleanField(default=False, verbose_name="Отправлено в чат просмотрщиков")
+    # Поиск (demo.search): вектор считает сам Postgres, в том числе для записей ботов
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("brand", weight="A", config="simple")
+            + SearchVector("model", weight="B", config="simple")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     class Meta:
         db_table = "bid"
         verbose_name = "Заявка"
         verbose_name_plural = "Заявки"
+        indexes = [
+            models.Index(fields=["user", "-id"], name="bid_user_id_desc_idx"),
+            # Выборки ботов (Sewa-motors-bot / Sewa-motors-call utils/data.py)
+            models.Index(fields=["thread_id"], name="bid_thread_id_idx", condition=models.Q(thread_id__isnull=False)),
+            models.Index(fields=["status", "opened_at"], name="bid_status_opened_idx"),
+            models.Index(
+                fields=["status", "opened_at"],
+                name="bid_unassigned_opened_idx",
+                condition=models.Q(manager__isnull=True),
+            ),
+            models.Index(
+                fields=["opened_at"],
+                name="bid_open_unshown_idx",
+                condition=models.Q(status="open", shown_to_bot=False),
+            ),
+            models.Index(fields=["manager", "status"], name="bid_manager_status_idx"),
+            models.Index(fields=["company", "status"], name="bid_company_status_idx"),
+            models.Index(fields=["status"], name="bid_no_dealer_status_idx", condition=models.Q(dealer__isnull=True)),
+            # Инкрементальное обновление аналитики (demo.analytics)
+            models.Index(fields=["last_update"], name="bid_last_update_idx"),
+            # Поиск (demo.search)
+            GinIndex(fields=["search_vector"], name="bid_search_vector_idx"),
+            GinIndex(fields=["brand"], name="bid_brand_trgm_idx", opclasses=["gin_trgm_ops"]),
+            GinIndex(fields=["model"], name="bid_model_trgm_idx", opclasses=["gin_trgm_ops"]),
+            GinIndex(fields=["url"], name="bid_url_trgm_idx", opclasses=["gin_trgm_ops"]),
+            GinIndex(fields=["url_users"], name="bid_url_users_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
     def __str__(self):
         return f"Заявка #{self.id} — {self.brand} {self.model} ({self.year})"
     
 class CarsPhoto(models.Model):
     bid = models.ForeignKey(bid, on_delete=models.CASCADE, blank=True, null=True, related_name="photos")
-    file_url = models.FileField() 
+    file_url = models.FileField(storage=media_store)
+    # Превью (demo.thumbnails); NULL - еще не обработан. Боты вставляют фото
+    # SQL-запросом, такие строки подбирает периодическая задача
+    thumbnails = models.JSONField(blank=True, null=True, editable=False)
     def __str__(self):
-        return f"Photo for Order #{self.bid.id}" 
+        return f"Photo for Order #{self.bid_id}"
     class Meta:
         db_table = "photo"
         verbose_name = "Фото"
         verbose_name_plural = "Фото"
+        indexes = [
+            models.Index(fields=["id"], name="photo_thumbnails_pending_idx", condition=models.Q(thumbnails__isnull=True)),
+        ]
 
 class ChatMessage(models.Model):
     bid = models.ForeignKey(bid, on_delete=models.CASCADE)
@@ -210,6 +302,20 @@ class ChatMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     to_bot = models.BooleanField(default=False)
 
+    # Доставка ответов из CRM в Telegram (outbox, задача deliver_chat_message)
+    DELIVERY_STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка отправки'),
+    ]
+    delivery_status = models.CharField(max_length=20, choices=DELIVERY_STATUS_CHOICES, blank=True, null=True)
+    delivery_error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["message_thread_id", "-id"], name="chatmsg_thread_id_desc_idx"),
+        ]
+
 #хранение файлов из сообщений
 class ChatMedia(models.Model):
     message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name='media')
@@ -217,3 +323,22 @@ class ChatMedia(models.Model):
     file_url = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+
+#общее хранилище файлов по содержимому (demo.media_store)
+class MediaBlob(models.Model):
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255, blank=True, null=True)   # путь cas/ab/cd/<sha256><ext> от MEDIA_ROOT
+    size = models.BigIntegerField(blank=True, null=True)
+    # Ведут триггеры media_blob_ref на photo, demo_chatmedia и status_orders_files
+    ref_count = models.IntegerField(db_default=0)
+    last_seen = models.DateTimeField(db_default=Now())
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count})"
+    class Meta:
+        db_table = "media_blob"
+        verbose_name = "Файл хранилища"
+        verbose_name_plural = "Файлы хранилища"
+        indexes = [
+            models.Index(fields=["last_seen"], name="media_blob_unreferenced_idx", condition=models.Q(ref_count__lte=0)),
+        ]
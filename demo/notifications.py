@@ -0,0 +1,93 @@
+import json
+import time
+import uuid
+from django.conf import settings
+from demo.redis_client import redis_client as r, get_async_redis
+
+# Хранилище уведомлений в Redis:
+#   notifications:items    - hash id -> JSON уведомления
+#   notifications:timeline - zset id по времени создания (для постраничного чтения)
+#   notifications:unread   - set непрочитанных id (SCARD дает счетчик за O(1))
+# Бот пишет в то же хранилище тем же скриптом (crm_integration.push_notification_to_redis).
+NOTIFICATIONS_ITEMS_KEY = "notifications:items"
+NOTIFICATIONS_TIMELINE_KEY = "notifications:timeline"
+NOTIFICATIONS_UNREAD_KEY = "notifications:unread"
+LEGACY_QUEUE_KEY = "notifications_queue"
+
+# Скрипт добавления общий с ботом: лежит в его каталоге, который видят оба контейнера
+# KEYS: items, timeline, unread; ARGV: id, payload, score, unread(0/1), max_items
+ADD_SCRIPT_PATH = settings.BASE_DIR / "Sewa-motors-bot" / "redis_scripts" / "add_notification.lua"
+_ADD_SCRIPT = r.register_script(ADD_SCRIPT_PATH.read_text())
+
+# KEYS: items, unread; ARGV: id. Возвращает новое значение read или -1.
+# Регистрируется на клиенте текущего цикла событий (get_async_redis)
+_TOGGLE_LUA = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+    return -1
+end
+if redis.call('SREM', KEYS[2], ARGV[1]) == 1 then
+    return 1
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+return 0
+"""
+
+
+def add_notification(event, score=None):
+    """
+    Сохраняет уведомление; при превышении NOTIFICATIONS_MAX удаляет самые старые.
+    Возвращает False, если уведомление с таким id уже есть.
+    """
+    event = dict(event)
+    notif_id = str(event.pop("id", None) or uuid.uuid4())
+    is_read = bool(event.pop("read", False))
+    added = _ADD_SCRIPT(
+        keys=[NOTIFICATIONS_ITEMS_KEY, NOTIFICATIONS_TIMELINE_KEY, NOTIFICATIONS_UNREAD_KEY],
+        args=[notif_id, json.dumps(event), score or time.time(), 0 if is_read else 1, settings.NOTIFICATIONS_MAX],
+    )
+    return bool(added)
+
+
+async def list_notifications(before=None, limit=50):
+    """
+    Уведомления от новых к старым, созданные строго раньше before (timestamp).
+    Возвращает (уведомления, before для следующей страницы или None)
+    """
+    ar = get_async_redis()
+    max_score = f"({before}" if before is not None else "+inf"
+    entries = await ar.zrevrangebyscore(
+        NOTIFICATIONS_TIMELINE_KEY, max_score, "-inf", start=0, num=limit, withscores=True
+    )
+    if not entries:
+        return [], None
+
+    ids = [notif_id for notif_id, _ in entries]
+    async with ar.pipeline(transaction=False) as pipe:
+        pipe.hmget(NOTIFICATIONS_ITEMS_KEY, ids)
+        pipe.smismember(NOTIFICATIONS_UNREAD_KEY, ids)
+        raw_items, unread_flags = await pipe.execute()
+
+    notifications = []
+    for notif_id, raw, unread in zip(ids, raw_items, unread_flags):
+        if raw is None:
+            continue
+        notif = json.loads(raw)
+        notif["id"] = notif_id
+        notif["read"] = not unread
+        notifications.append(notif)
+
+    next_before = entries[-1][1] if len(entries) == limit else None
+    return notifications, next_before
+
+
+async def toggle_read(notif_id):
+    """
+    Переключает признак прочтения. Возвращает новое значение или None, если уведомления нет
+    """
+    toggle = get_async_redis().register_script(_TOGGLE_LUA)
+    result = await toggle(keys=[NOTIFICATIONS_ITEMS_KEY, NOTIFICATIONS_UNREAD_KEY], args=[notif_id])
+    return None if result == -1 else bool(result)
+
+
+async def unread_count():
+    return await get_async_redis().scard(NOTIFICATIONS_UNREAD_KEY)
@@ -0,0 +1,27 @@
+import asyncio
+import weakref
+import redis
+import redis.asyncio as aioredis
+
+REDIS_URL = "redis://redis:6379/0"
+
+# Общий пул соединений с Redis для Celery, команд и sync-вьюх
+redis_pool = redis.ConnectionPool.from_url(REDIS_URL, decode_responses=True)
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+# Асинхронные клиенты - по одному на цикл событий: соединение redis.asyncio привязано к циклу,
+# в котором открыто. Воркер uvicorn живет в одном цикле, а runserver/WSGI, тестовый клиент
+# и async_to_sync запускают async-вьюху в новом цикле на каждый запрос
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    """
+    Асинхронный клиент Redis текущего цикла событий (создается при первом обращении)
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = aioredis.Redis(connection_pool=aioredis.ConnectionPool.from_url(REDIS_URL, decode_responses=True))
+        _async_clients[loop] = client
+    return client
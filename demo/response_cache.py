@@ -0,0 +1,145 @@
+import json
+import logging
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from demo.redis_client import redis_client as r
+
+logger = logging.getLogger(__name__)
+
+# Кэш сериализованных ответов детальных эндпоинтов в Redis:
+#   respcache:ver:{kind}:{pk}              - версия объекта, INCR при каждом изменении (demo.signals)
+#   respcache:ver:{kind}:all               - версия всех объектов типа (для ETag списков)
+#   respcache:{kind}:{pk}:{variant}:v{N}   - JSON ответа для версии N, живет ttl секунд
+#   respcache:stats                        - hash счетчиков {kind}:hit / {kind}:miss
+# Старые версии после инвалидации больше не читаются и истекают сами.
+VERSION_KEY = "respcache:ver:{kind}:{pk}"
+ENTRY_PREFIX = "respcache:{kind}:{pk}:{variant}:v"
+STATS_KEY = "respcache:stats"
+ALL = "all"
+
+# Отсутствующая версия (новый объект или очищенный Redis) начинается с текущего времени в мс,
+# поэтому не повторяет выданную раньше - на этом держатся ETag (demo.conditional)
+_CURRENT_VERSION = """
+local function current_version(key)
+    local version = redis.call('GET', key)
+    if not version then
+        local now = redis.call('TIME')
+        version = string.format('%d', now[1] * 1000 + math.floor(now[2] / 1000))
+        redis.call('SET', key, version)
+    end
+    return version
+end
+"""
+
+# Версия, запись и счетчик за один запрос к Redis.
+# KEYS: версия, stats; ARGV: префикс ключа записи, kind. Возвращает {версия, JSON или nil}
+_LOOKUP_SCRIPT = r.register_script(_CURRENT_VERSION + """
+local version = current_version(KEYS[1])
+local data = redis.call('GET', ARGV[1] .. version)
+redis.call('HINCRBY', KEYS[2], ARGV[2] .. (data and ':hit' or ':miss'), 1)
+return {version, data}
+""")
+
+# KEYS: ключи версий. Возвращает текущие версии в том же порядке
+_VERSIONS_SCRIPT = r.register_script(_CURRENT_VERSION + """
+local versions = {}
+for i, key in ipairs(KEYS) do
+    versions[i] = current_version(key)
+end
+return versions
+""")
+
+# KEYS: ключи версий для повышения
+_BUMP_SCRIPT = r.register_script(_CURRENT_VERSION + """
+for _, key in ipairs(KEYS) do
+    current_version(key)
+    redis.call('INCR', key)
+end
+return #KEYS
+""")
+
+
+def get_or_build(kind, pk, build, variant="detail", ttl=None):
+    """
+    Ответ из кэша или build() с сохранением под текущей версией объекта.
+    Если Redis недоступен, просто вызывает build().
+
+    Args:
+        kind: Тип объекта (bid, company, order)
+        pk: id объекта
+        build: Функция без аргументов, возвращающая сериализованные данные
+        variant: Вид ответа по тому же объекту
+        ttl: Время жизни записи, по умолчанию RESPONSE_CACHE_TTL
+
+    Returns:
+        (data, hit)
+    """
+    prefix = ENTRY_PREFIX.format(kind=kind, pk=pk, variant=variant)
+    try:
+        version, raw = _LOOKUP_SCRIPT(keys=[VERSION_KEY.format(kind=kind, pk=pk), STATS_KEY], args=[prefix, kind])
+    except redis.RedisError as e:
+        logger.warning(f"Кэш ответов недоступен ({kind}:{pk}): {e}")
+        return build(), False
+    if raw is not None:
+        return json.loads(raw), True
+
+    data = build()
+    try:
+        r.set(prefix + str(version), json.dumps(data, cls=DjangoJSONEncoder), ex=ttl or settings.RESPONSE_CACHE_TTL)
+    except redis.RedisError as e:
+        logger.warning(f"Не удалось сохранить ответ в кэш ({kind}:{pk}): {e}")
+    return data, False
+
+
+def cache_headers(hit):
+    return {"X-Cache": "HIT" if hit else "MISS"}
+
+
+def object_versions(*objects):
+    """
+    Текущие версии объектов за один запрос к Redis.
+
+    Args:
+        objects: Пары (kind, pk); pk=ALL - версия всех объектов типа
+    """
+    return _VERSIONS_SCRIPT(keys=[VERSION_KEY.format(kind=kind, pk=pk) for kind, pk in objects])
+
+
+def invalidate(kind, *pks):
+    """
+    Повышает версию объектов после коммита транзакции: иначе параллельный
+    запрос успел бы закэшировать еще не закоммиченное старое состояние под новой версией
+    """
+    pks = [pk for pk in pks if pk is not None]
+    if not pks:
+        return
+
+    keys = [VERSION_KEY.format(kind=kind, pk=pk) for pk in pks + [ALL]]
+
+    def bump():
+        try:
+            _BUMP_SCRIPT(keys=keys)
+        except redis.RedisError as e:
+            logger.error(f"Не удалось сбросить кэш ответов {kind} {pks}: {e}")
+
+    transaction.on_commit(bump)
+
+
+def cache_stats():
+    """
+    Счетчики попаданий по типам: {kind: {"hit": N, "miss": M, "ratio": доля попаданий}}
+    """
+    stats = {}
+    for field, value in r.hgetall(STATS_KEY).items():
+        kind, _, outcome = field.rpartition(":")
+        stats.setdefault(kind, {"hit": 0, "miss": 0})[outcome] = int(value)
+    for counters in stats.values():
+        total = counters["hit"] + counters["miss"]
+        counters["ratio"] = round(counters["hit"] / total, 3) if total else 0.0
+    return stats
+
+
+def reset_stats():
+    r.delete(STATS_KEY)
@@ -0,0 +1,111 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+from demo.models import bid, Order, Dealers, user_company
+
+# Марки, VIN и номера - не слова естественного языка, поэтому без стемминга
+SEARCH_CONFIG = "simple"
+MIN_QUERY_LENGTH = 2
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def prefix_query(text):
+    """
+    tsquery по префиксам слов запроса: "hyun sol" -> hyun:* & sol:*.
+    Возвращает None, если в запросе нет слов
+    """
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    return SearchQuery(" & ".join(f"{word}:*" for word in words), search_type="raw", config=SEARCH_CONFIG)
+
+
+def _similarity(text, *fields):
+    scores = [Coalesce(TrigramWordSimilarity(text, field), Value(0.0)) for field in fields]
+    return Greatest(*scores) if len(scores) > 1 else scores[0]
+
+
+def _rank(query, text, *trigram_fields):
+    """
+    Ранг: вес совпадения в tsvector плюс лучшая триграммная близость (опечатки)
+    """
+    fts_rank = SearchRank(F("search_vector"), query) if query is not None else Value(0.0)
+    return fts_rank + _similarity(text, *trigram_fields)
+
+
+def _fts_match(query):
+    return Q(search_vector=query) if query is not None else Q(pk__in=[])
+
+
+def _user_companies(user):
+    return user_company.objects.filter(user_id=user, company_id__is_approved=True).values("company_id")
+
+
+def search_bids(user, text, limit=SEARCH_LIMIT):
+    """
+    Заявки компаний пользователя по марке/модели (префикс и опечатки) и по ссылке на авто
+    """
+    query = prefix_query(text)
+    qs = bid.objects.filter(
+        _fts_match(query)
+        | Q(brand__trigram_word_similar=text)
+        | Q(model__trigram_word_similar=text)
+        | Q(url__contains=text)
+        | Q(url_users__contains=text)
+    )
+    if not user.is_staff:
+        qs = qs.filter(company__in=_user_companies(user))
+    return list(
+        qs.annotate(rank=_rank(query, text, "brand", "model"))
+        .order_by("-rank", "-id")
+        .values("id", "brand", "model", "year", "status", "url", "rank", company_name=F("company__name"))[:limit]
+    )
+
+
+def search_orders(user, text, limit=SEARCH_LIMIT):
+    """
+    Заказы по VIN, номеру заказа/накладной и имени клиента.
+    У заказов нет привязки к компании: видимость та же, что у all_orders
+    """
+    query = prefix_query(text)
+    qs = Order.objects.filter(
+        _fts_match(query)
+        | Q(VIN__contains=text.upper())
+        | Q(number_order__contains=text)
+        | Q(client__name__trigram_word_similar=text)
+    )
+    return list(
+        qs.annotate(rank=_rank(query, text, "client__name"))
+        .order_by("-rank", "-id")
+        .values(
+            "id", "VIN", "number_order", "number_note", "date", "rank",
+            client_name=F("client__name"), status=F("status__current_status"),
+        )[:limit]
+    )
+
+
+def search_dealers(user, text, limit=SEARCH_LIMIT):
+    """
+    Дилеры по названию компании и контактному лицу; не персоналу - только
+    дилеры из заявок компаний пользователя
+    """
+    query = prefix_query(text)
+    qs = Dealers.objects.filter(_fts_match(query) | Q(company_name__trigram_word_similar=text))
+    if not user.is_staff:
+        qs = qs.filter(id__in=bid.objects.filter(company__in=_user_companies(user)).values("dealer_id"))
+    return list(
+        qs.annotate(rank=_rank(query, text, "company_name"))
+        .order_by("-rank", "-id")
+        .values("id", "company_name", "name", "phone", "rank")[:limit]
+    )
+
+
+SEARCHES = {
+    "bids": search_bids,
+    "orders": search_orders,
+    "dealers": search_dealers,
+}
@@ -1,6 +1,7 @@
 from django.utils import timezone
 from rest_framework import serializers
 from .models import *
+from demo.thumbnails import thumbnail_urls
 from collections import defaultdict
 
 class ClientSerializer(serializers.ModelSerializer):
@@ -9,9 +10,14 @@ class ClientSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 class StatusFileSerializer(serializers.ModelSerializer):
+    thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = StatusFile
-        fields = ['id', 'file', 'doc_type', 'uploaded_at']
+        fields = ['id', 'file', 'doc_type', 'uploaded_at', 'thumbnails']
+
+    def get_thumbnails(self, obj):
+        return thumbnail_urls(obj.file, obj.thumbnails)
 
 class Status_ordersSerializer(serializers.ModelSerializer):
     files = StatusFileSerializer(many=True)
@@ -25,7 +31,7 @@ class OrdersSerializer(serializers.ModelSerializer):
     status = Status_ordersSerializer(read_only=True)
     class Meta:
         model = Order
-        fields = "__all__"
+        exclude = ["search_vector"]
         read_only_fields = ['status']
 
     def create(self, validated_data):
@@ -36,16 +42,28 @@ class OrdersSerializer(serializers.ModelSerializer):
         return order
 
 
+class CarsPhotoSerializer(serializers.ModelSerializer):
+    thumbnails = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CarsPhoto
+        fields = ['id', 'file_url', 'thumbnails']
+
+    def get_thumbnails(self, obj):
+        return thumbnail_urls(obj.file_url, obj.thumbnails)
+
+
 class BidsSerializer(serializers.ModelSerializer):
     # user = serializers.PrimaryKeyRelatedField(
     #     queryset=User.objects.all(), required=False
     # )
     # user_username = serializers.SerializerMethodField()
     company_name = serializers.SerializerMethodField()
+    photos = CarsPhotoSerializer(many=True, read_only=True)
 
     class Meta:
         model = bid
-        fields = "__all__"
+        exclude = ["search_vector"]
         read_only_fields = ['status']
 
     def get_user_username(self, obj):
@@ -132,25 +150,33 @@ class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
         fields = ['bid', 'chat_id', 'message_thread_id', 'message_id', 'user_id', 
-                  'username', 'topic_name', 'text', 'created_at', 'to_bot', 'media']
+                  'username', 'topic_name', 'text', 'created_at', 'to_bot', 'media',
+                  'delivery_status']
+        read_only_fields = ['delivery_status']
         
+def grouped_message_item(m):
+    """
+    Сообщение в формате сгруппированной истории чатов (media должны быть предзагружены)
+    """
+    return {
+        "id": m.id,
+        "bid_id": m.bid_id,
+        "chat_id": m.chat_id,
+        "message_thread_id": m.message_thread_id,
+        "message_id": m.message_id,
+        "user_id": m.user_id,
+        "username": m.username,
+        "text": m.text,
+        "topic_name": m.topic_name,
+        "created_at": m.created_at.isoformat(),
+        "media": [{"file_url": md.file_url, "file_type": md.file_type} for md in m.media.all()]
+    }
+
 class GroupedChatMessageSerializer(serializers.Serializer):
     grouped = serializers.SerializerMethodField()
 
     def get_grouped(self, obj):
         grouped = defaultdict(list)
         for m in obj:
-            media_serialized = ChatMediaSerializer(m.media.all(), many=True).data
-            grouped[m.message_thread_id].append({
-                "bid_id": m.bid_id,
-                "chat_id": m.chat_id,
-                "message_thread_id": m.message_thread_id,
-                "message_id": m.message_id,
-                "user_id": m.user_id,
-                "username": m.username,
-                "text": m.text,
-                "topic_name": m.topic_name,
-                "created_at": m.created_at.isoformat(),
-                "media": media_serialized
-            })
-        return grouped
\ No newline at end of file
+            grouped[m.message_thread_id].append(grouped_message_item(m))
+        return grouped
@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from demo.models import (
+    User, Companies, user_company, bid, Client, Order, Status_orders, StatusFile, ChatMessage, ChatMedia,
+    CarsPhoto, Dealers,
+)
+from demo.response_cache import invalidate
+from demo.thumbnails import SOURCES, needs_thumbnails
+from demo.tasks import generate_thumbnails_task
+
+# Сброс кэша ответов и ETag (demo.response_cache, demo.conditional) при изменениях через ORM.
+# Боты меняют bid напрямую SQL-запросами, поэтому у заявок короткий RESPONSE_CACHE_BID_TTL.
+
+
+def _invalidate_orders_by_status(status_ids):
+    invalidate("order", *Order.objects.filter(status_id__in=status_ids).values_list("id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=bid)
+def bid_changed(sender, instance, **kwargs):
+    invalidate("bid", instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Companies)
+def company_changed(sender, instance, **kwargs):
+    invalidate("company", instance.pk)
+    # company_name входит в ответ по заявке
+    invalidate("bid", *bid.objects.filter(company_id=instance.pk).values_list("id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=user_company)
+def employee_changed(sender, instance, **kwargs):
+    invalidate("company", instance.company_id_id)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login - в ответах его нет
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    invalidate("company", *user_company.objects.filter(user_id=instance).values_list("company_id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=Order)
+def order_changed(sender, instance, **kwargs):
+    invalidate("order", instance.pk)
+
+
+@receiver(post_save, sender=Client)
+def client_changed(sender, instance, **kwargs):
+    invalidate("order", *Order.objects.filter(client=instance).values_list("id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=Status_orders)
+def status_changed(sender, instance, **kwargs):
+    _invalidate_orders_by_status([instance.pk])
+
+
+@receiver(post_save, sender=StatusFile)
+@receiver(pre_delete, sender=StatusFile)
+def status_file_changed(sender, instance, **kwargs):
+    # pre_delete: к post_delete связи со статусами уже удалены
+    _invalidate_orders_by_status(instance.orders.values_list("id", flat=True))
+
+
+@receiver(m2m_changed, sender=Status_orders.files.through)
+def status_files_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        status_ids = [instance.pk]
+    elif pk_set is not None:
+        status_ids = list(pk_set)
+    else:
+        status_ids = list(instance.orders.values_list("id", flat=True))
+    _invalidate_orders_by_status(status_ids)
+
+
+@receiver([post_save, post_delete], sender=ChatMessage)
+def chat_message_changed(sender, instance, **kwargs):
+    invalidate("thread", instance.message_thread_id)
+
+
+@receiver([post_save, post_delete], sender=ChatMedia)
+def chat_media_changed(sender, instance, **kwargs):
+    invalidate("thread", *ChatMessage.objects.filter(pk=instance.message_id).values_list("message_thread_id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=CarsPhoto)
+def photo_changed(sender, instance, **kwargs):
+    # Фото и их превью входят в ответ по заявке
+    if instance.bid_id:
+        invalidate("bid", instance.bid_id)
+
+
+# Превью строятся в celery после коммита; сама задача пишет через update(), сигнал не повторяется
+THUMBNAIL_KINDS = {model: kind for kind, (model, _) in SOURCES.items()}
+
+
+@receiver(post_save, sender=CarsPhoto)
+@receiver(post_save, sender=Dealers)
+@receiver(post_save, sender=StatusFile)
+def thumbnails_source_saved(sender, instance, **kwargs):
+    kind = THUMBNAIL_KINDS[sender]
+    if needs_thumbnails(getattr(instance, SOURCES[kind][1]), instance.thumbnails):
+        transaction.on_commit(lambda: generate_thumbnails_task.delay(kind, instance.pk))
@@ -1,45 +1,42 @@
 import requests
-import random
-import time
-from urllib.parse import urlparse, parse_qs
 from celery import shared_task
+from django.conf import settings
 from django.db import transaction
-from demo.models import bid
+from demo.models import bid, ChatMessage, TGUsers, StatusFile
+from demo import telegram
+from demo.broadcast import broadcast_message, broadcast_documents
+from demo.encar import extract_car_id, fetch_cars
+from demo.redis_client import redis_client
+from demo.bid_import import mark_enriched
+from demo import analytics, thumbnails
+from demo.media_store import collect_garbage
+from demo.response_cache import invalidate
+from demo.serializers import BidsSerializer
+import json
+import os
 import logging
 logger = logging.getLogger(__name__)
 
-def parse_car_data(raw_car):
-    fuels = {
-        "디젤": "Дизель",
-        "가솔린": "Бензин",
-        "가솔린+전기": "Гибрид",
-        "전기": "Электро",
-    }
+# Бот ждет окончания обработки заявки по этому ключу/каналу (crm_integration.wait_for_bid_details)
+BID_ENRICHED_KEY = "bid:enriched:{bid_id}"
+BID_ENRICHED_TTL = 300
 
-    transmissions = {
-        "오토": "Автомат",
-        "수동": "Механика",
-    }
 
-    return {
-        "brand": raw_car.get("manufacturerNm"),
-        "model": raw_car.get("modelNm"),
-        "year": raw_car.get("formYear"),
-        "engine": str(round(raw_car.get("displacement", 0) / 1000, 2)) if raw_car.get("displacement") else None,
-        "fuel_type": fuels.get(raw_car.get("fuelNm"), raw_car.get("fuelNm")),
-        "mileage": raw_car.get("mileage"),
-        "transmission": transmissions.get(raw_car.get("transmission"), raw_car.get("transmission")),
-    }
+def publish_bid_enriched(bid_instance):
+    """
+    Сохраняет итог обработки заявки под ключом и оповещает подписчиков канала с тем же именем
+    """
+    key = BID_ENRICHED_KEY.format(bid_id=bid_instance.id)
+    payload = json.dumps(BidsSerializer(bid_instance).data, ensure_ascii=False)
+    pipe = redis_client.pipeline()
+    pipe.set(key, payload, ex=BID_ENRICHED_TTL)
+    pipe.publish(key, payload)
+    pipe.execute()
+
 
 @shared_task
 def fetch_car_data_task(bid_id, car_urls):
     logger.info(f"🚀 Запустили задачу для bid_id={bid_id}, urls={car_urls}")
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Referer": "https://buy.encar.com/",
-        "Origin": "https://buy.encar.com",
-        "Accept": "application/json, text/plain, */*",
-    }
 
     try:
         bid_instance = bid.objects.get(id=bid_id)
@@ -47,40 +44,198 @@ def fetch_car_data_task(bid_id, car_urls):
         print(f"❌ Заявка с id={bid_id} не найдена")
         return
 
+    try:
+        _enrich_bid(bid_instance, car_urls)
+    finally:
+        # Оповещаем и при ошибке, чтобы бот не ждал до таймаута
+        publish_bid_enriched(bid_instance)
+
+
+def _enrich_bid(bid_instance, car_urls):
+    bid_id = bid_instance.id
+    url_by_carid = {}
     for url in car_urls:
-        logger.info(f"🔗 Работаем с URL: {url}")
+        carid = extract_car_id(url)
+        if not carid:
+            print(f"❌ Не удалось извлечь carId из {url}")
+            continue
+        url_by_carid[carid] = url
+
+    try:
+        cars = fetch_cars(list(url_by_carid))
+    except (requests.RequestException, ValueError) as e:
+        print(f"❌ Ошибка при запросе к encar {list(url_by_carid)}: {e}")
+        return
+
+    # Как и раньше, при нескольких ссылках в заявке остаются данные последней
+    updated = False
+    for carid, url in url_by_carid.items():
+        parsed_car = cars.get(carid)
+        if not parsed_car:
+            print(f"⚠️ Пустой ответ API по carId={carid}")
+            continue
+        logger.info(f"Информация: {parsed_car}")
+        bid_instance.brand = parsed_car.get("brand")
+        bid_instance.model = parsed_car.get("model")
+        bid_instance.year = parsed_car.get("year")
+        bid_instance.engine = parsed_car.get("engine")
+        bid_instance.fuel_type = parsed_car.get("fuel_type")
+        bid_instance.mileage = parsed_car.get("mileage")
+        bid_instance.transmission = parsed_car.get("transmission")
+        bid_instance.url = url
+        updated = True
+
+    if updated:
+        with transaction.atomic():
+            bid_instance.save()
+        print(f"✅ Заявка {bid_id} обновлена")
+
+
+CAR_FIELDS = ["brand", "model", "year", "engine", "fuel_type", "mileage", "transmission"]
+ENCAR_BATCH_SIZE = 50   # carIds в одном запросе к encar
+
+
+@shared_task
+def enrich_bids_task(bid_ids, job_id=None):
+    """
+    Обогащает порцию импортированных заявок данными encar: carIds уходят
+    пачками по ENCAR_BATCH_SIZE, заявки сохраняются одним bulk_update
+    """
+    bids_by_carid = {}
+    bids = list(bid.objects.filter(id__in=bid_ids).only("id", "url_users"))
+    for bid_instance in bids:
+        carid = extract_car_id(bid_instance.url_users or "")
+        if carid:
+            bids_by_carid.setdefault(carid, []).append(bid_instance)
+
+    carids = list(bids_by_carid)
+    updated = []
+    for start in range(0, len(carids), ENCAR_BATCH_SIZE):
+        chunk = carids[start:start + ENCAR_BATCH_SIZE]
         try:
-            parsed = urlparse(url)
-            params = parse_qs(parsed.query)
-            carid_list = params.get("carid")
-            logger.info(f":() Не удалось извлечь: {carid_list}")
-            if not carid_list:
-                print(f"❌ Не удалось извлечь carId из {url}")
+            cars = fetch_cars(chunk)
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Ошибка при запросе к encar {chunk}: {e}")
+            continue
+        for carid in chunk:
+            parsed_car = cars.get(carid)
+            if not parsed_car:
                 continue
-            carid = carid_list[0]
-
-            api_url = f"https://api.encar.com/legacy/usedcar/sale/car?carIds={carid}"
-            resp = requests.get(api_url, headers=headers, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-
-            if isinstance(data, list) and data:
-                parsed_car = parse_car_data(data[0])
-                logger.info(f"Информация: {parsed_car}")
-                with transaction.atomic():
-                    bid_instance.brand = parsed_car.get("brand")
-                    bid_instance.model = parsed_car.get("model")
-                    bid_instance.year = parsed_car.get("year")
-                    bid_instance.engine = parsed_car.get("engine")
-                    bid_instance.fuel_type = parsed_car.get("fuel_type")
-                    bid_instance.mileage = parsed_car.get("mileage")
-                    bid_instance.transmission = parsed_car.get("transmission")
-                    bid_instance.url = url
-                    bid_instance.save()
-                    print(f"✅ Заявка {bid_id} обновлена с carId={carid}")
-            else:
-                print(f"⚠️ Пустой ответ API по carId={carid}")
-        except Exception as e:
-            print(f"❌ Ошибка при обработке {url}: {e}")
-
-        time.sleep(random.uniform(1, 3))
+            for bid_instance in bids_by_carid[carid]:
+                for field in CAR_FIELDS:
+                    setattr(bid_instance, field, parsed_car.get(field))
+                bid_instance.url = bid_instance.url_users
+                updated.append(bid_instance)
+
+    # bulk_update не шлет сигналы: кэш ответов сбрасываем сами
+    bid.objects.bulk_update(updated, CAR_FIELDS + ["url"], batch_size=500)
+    invalidate("bid", *[b.id for b in updated])
+    if job_id:
+        mark_enriched(job_id, len(bids))
+    logger.info(f"Обогащено заявок: {len(updated)} из {len(bids)}")
+
+
+@shared_task(bind=True, max_retries=5)
+def deliver_chat_message(self, message_pk):
+    """
+    Отправляет ответ оператора из CRM в тему Telegram и записывает результат в ChatMessage
+    """
+    message = ChatMessage.objects.filter(pk=message_pk, delivery_status='pending').first()
+    if message is None:
+        return
+
+    payload = {
+        "chat_id": message.chat_id,
+        "message_thread_id": message.message_thread_id,
+        "text": message.text,
+    }
+    try:
+        result = telegram.call("sendMessage", json=payload)
+    except telegram.TelegramError as e:
+        if e.retry_after is not None and self.request.retries < self.max_retries:
+            logger.warning(f"Telegram просит подождать {e.retry_after} с, сообщение {message_pk}")
+            raise self.retry(countdown=e.retry_after)
+        _set_delivery(message, delivery_status='failed', delivery_error=str(e))
+        logger.error(f"Сообщение {message_pk} не доставлено: {e}")
+        return
+    except requests.exceptions.RequestException as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=2 ** self.request.retries)
+        _set_delivery(message, delivery_status='failed', delivery_error=str(e))
+        logger.error(f"Сообщение {message_pk} не доставлено: {e}")
+        return
+
+    _set_delivery(message, delivery_status='sent', delivery_error=None, message_id=result["message_id"])
+
+
+def _set_delivery(message, **fields):
+    ChatMessage.objects.filter(pk=message.pk).update(**fields)
+    # update не шлет сигналы, а число и max(id) сообщений темы не меняются: ETag темы сбрасываем сами
+    invalidate("thread", message.message_thread_id)
+
+
+@shared_task
+def broadcast_status_change(text, status_file_ids=None, caption=None):
+    """
+    Рассылает менеджерам смену статуса заказа и приложенные документы
+    """
+    chat_ids = list(TGUsers.objects.values_list('id', flat=True))
+    results = broadcast_message(chat_ids, text)
+
+    documents = []
+    for sf in StatusFile.objects.filter(pk__in=status_file_ids or []).order_by('pk'):
+        # Файл на общем томе storage; без него документ не уйдет ни одному получателю
+        if not sf.file.storage.exists(sf.file.name):
+            logger.error(f"Рассылка статуса: файл документа {sf.pk} не найден ({sf.file.name})")
+            continue
+        documents.append((sf.file.path, os.path.basename(sf.file.name)))
+    results += broadcast_documents(chat_ids, documents, caption=caption)
+
+    failed = [r for r in results if not r["ok"]]
+    logger.info(f"Рассылка статуса: успешно {len(results) - len(failed)}, ошибок {len(failed)}")
+    for r in failed:
+        logger.error(f"Рассылка статуса: {r['chat_id']}: {r['error']}")
+    return {"ok": len(results) - len(failed), "failed": failed}
+
+
+@shared_task
+def refresh_analytics(full=False):
+    """
+    Пересчет аналитики по расписанию (CELERY_BEAT_SCHEDULE)
+    """
+    return analytics.refresh(full=full)
+
+
+@shared_task
+def generate_thumbnails_task(kind, pk):
+    thumbnails.generate(kind, pk)
+
+
+THUMBNAIL_SWEEP_LOCK = "thumbnails:sweep"
+
+
+@shared_task
+def sweep_thumbnails_task():
+    """
+    Достраивает превью для строк, вставленных в обход ORM (фото из бота),
+    и для загрузок, чья задача потерялась. Один прогон за раз
+    """
+    if not redis_client.set(THUMBNAIL_SWEEP_LOCK, 1, nx=True, ex=600):
+        return
+    try:
+        for kind in thumbnails.SOURCES:
+            # Строки без файла на диске остаются NULL: идем дальше по id, чтобы они не заслоняли новые.
+            # За прогон - не больше SWEEP_BATCH построенных превью каждого вида
+            last = built = 0
+            while built < thumbnails.SWEEP_BATCH and (batch := thumbnails.pending(kind, limit=thumbnails.SWEEP_BATCH, after=last)):
+                for pk in batch:
+                    if thumbnails.generate(kind, pk) is not None:
+                        built += 1
+                last = batch[-1]
+    finally:
+        redis_client.delete(THUMBNAIL_SWEEP_LOCK)
+
+
+@shared_task
+def media_store_gc_task():
+    return collect_garbage(settings.MEDIA_STORE_GC_GRACE_HOURS)
@@ -0,0 +1,38 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+BOT_TOKEN = "7685909490:AAHTEZWoC3YLfkJzXNOuRGcqUsxg7DyUEaI"
+API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
+TELEGRAM_TIMEOUT = (5, 30)  # connect, read
+
+
+class TelegramError(Exception):
+    def __init__(self, description, error_code=None, retry_after=None):
+        super().__init__(description)
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+
+# Одна сессия на процесс: соединения с api.telegram.org переиспользуются
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+
+def call(method, data=None, files=None, json=None):
+    """
+    Вызывает метод Bot API и возвращает result.
+    Ошибку Telegram поднимает как TelegramError (retry_after заполнен при 429)
+    """
+    resp = session.post(f"{API_URL}/{method}", data=data, files=files, json=json, timeout=TELEGRAM_TIMEOUT)
+    try:
+        payload = resp.json()
+    except ValueError:
+        resp.raise_for_status()
+        raise TelegramError(f"Некорректный ответ Telegram: {resp.text[:200]}", resp.status_code)
+    if not payload.get("ok"):
+        raise TelegramError(
+            payload.get("description", "Unknown error"),
+            payload.get("error_code"),
+            (payload.get("parameters") or {}).get("retry_after"),
+        )
+    return payload["result"]
@@ -1,3 +1,257 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from demo import encar
+from demo.notifications import (
+    NOTIFICATIONS_ITEMS_KEY, NOTIFICATIONS_TIMELINE_KEY, NOTIFICATIONS_UNREAD_KEY, add_notification,
+)
+from demo.bid_import import CSV_FORMAT, iter_rows
+from demo.models import User, Client, Status_orders, StatusFile, Order, bid
+from demo.redis_client import redis_client
+from demo.tasks import fetch_car_data_task, BID_ENRICHED_KEY
 
-# Create your tests here.
+# Бюджет запросов к БД: не зависит от числа заказов и файлов статусов (demo.views.orders_with_relations)
+ORDER_LIST_QUERIES = 3     # ETag списка, страница заказов с client и status, файлы статусов
+ORDER_DETAIL_QUERIES = 2   # Заказ с client и status, файлы статуса
+
+
+def _build_without_cache(kind, pk, build, **kwargs):
+    # Кэш ответов в Redis спрятал бы запросы к БД
+    return build(), False
+
+
+class OrderQueryBudgetTests(TestCase):
+    FILES_PER_ORDER = 3
+
+    def setUp(self):
+        self.user = User.objects.create(username="orders-test", email="orders-test@example.invalid")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_orders(self, count):
+        clients = Client.objects.bulk_create(Client(name=f"Клиент {i}", phone=f"+7900{i}") for i in range(count))
+        statuses = Status_orders.objects.bulk_create(Status_orders() for _ in range(count))
+        Order.objects.bulk_create(
+            Order(client=client, status=status_obj, VIN=f"VIN{i}", number_order=f"SM-{i}", number_note=f"BL-{i}")
+            for i, (client, status_obj) in enumerate(zip(clients, statuses))
+        )
+        files = StatusFile.objects.bulk_create(
+            StatusFile(file=f"docs/test/{i}.pdf", doc_type="payment") for i in range(count * self.FILES_PER_ORDER)
+        )
+        through = Status_orders.files.through
+        through.objects.bulk_create(
+            through(status_orders=status_obj, statusfile=files[i * self.FILES_PER_ORDER + j])
+            for i, status_obj in enumerate(statuses)
+            for j in range(self.FILES_PER_ORDER)
+        )
+
+    def assert_list_budget(self, count):
+        self.create_orders(count)
+        with self.assertNumQueries(ORDER_LIST_QUERIES):
+            response = self.client.get(reverse("all_orders"), {"limit": 100})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(len(results), count)
+        self.assertEqual(len(results[0]["status"]["files"]), self.FILES_PER_ORDER)
+
+    def assert_detail_budget(self, count):
+        self.create_orders(count)
+        pk = Order.objects.order_by("-id").values_list("id", flat=True).first()
+        with mock.patch("demo.views.get_or_build", _build_without_cache):
+            with self.assertNumQueries(ORDER_DETAIL_QUERIES):
+                response = self.client.get(reverse("order", args=[pk]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()["status"]["files"]), self.FILES_PER_ORDER)
+            with self.assertNumQueries(ORDER_DETAIL_QUERIES):
+                response = self.client.get(reverse("status", args=[pk]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_order_list_few_orders(self):
+        self.assert_list_budget(2)
+
+    def test_order_list_many_orders(self):
+        self.assert_list_budget(60)
+
+    def test_order_detail_few_orders(self):
+        self.assert_detail_budget(2)
+
+    def test_order_detail_many_orders(self):
+        self.assert_detail_budget(60)
+
+
+class EncarStub(BaseHTTPRequestHandler):
+    """
+    Заглушка api.encar.com: на ?carIds=1,2 отвечает списком машин в том же порядке.
+    Запросы складываются в server.requests как (время, список carIds)
+    """
+
+    def do_GET(self):
+        car_ids = parse_qs(urlparse(self.path).query).get("carIds", [""])[0].split(",")
+        self.server.requests.append((time.monotonic(), car_ids))
+        if self.server.fail:
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps([
+            {"carId": int(car_id), "manufacturerNm": "현대", "modelNm": f"Model {car_id}", "formYear": "2020",
+             "displacement": 1998, "fuelNm": "가솔린", "mileage": 10000, "transmission": "오토"}
+            for car_id in car_ids
+        ]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EncarTests(TestCase):
+    CAR_IDS = ["91000001", "91000002", "91000003", "91000004"]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), EncarStub)
+        cls.server.requests = []
+        cls.server.fail = False
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.host = f"127.0.0.1:{cls.server.server_port}"
+        cls.settings_override = override_settings(
+            ENCAR_API_URL=f"http://{cls.host}/legacy/usedcar/sale/car",
+            ENCAR_MIN_INTERVAL=0.2,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.server.fail = False
+        keys = [encar.CAR_CACHE_KEY.format(car_id=car_id) for car_id in self.CAR_IDS]
+        redis_client.delete(*keys, encar.RATE_LIMIT_KEY.format(host=self.host))
+
+    def test_batches_car_ids_in_one_request(self):
+        cars = encar.fetch_cars(self.CAR_IDS[:3])
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[0][1], self.CAR_IDS[:3])
+        self.assertEqual(cars[self.CAR_IDS[0]]["fuel_type"], "Бензин")
+        self.assertEqual(cars[self.CAR_IDS[2]]["model"], f"Model {self.CAR_IDS[2]}")
+
+    def test_cached_cars_are_not_requested_again(self):
+        encar.fetch_cars(self.CAR_IDS[:2])
+        cars = encar.fetch_cars(self.CAR_IDS[:2])
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(set(cars), set(self.CAR_IDS[:2]))
+
+        # Из смешанного списка запрашиваются только отсутствующие в кэше
+        encar.fetch_cars(self.CAR_IDS[:3])
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[1][1], [self.CAR_IDS[2]])
+
+    def test_requests_are_rate_limited(self):
+        for car_id in self.CAR_IDS[:3]:
+            encar.fetch_cars([car_id])
+        times = [at for at, _ in self.server.requests]
+        self.assertEqual(len(times), 3)
+        for previous, current in zip(times, times[1:]):
+            # Слот резервирует Redis (_reserve_slot): интервал соблюдается и между воркерами
+            self.assertGreaterEqual(current - previous, 0.18)
+
+    def test_wait_for_host_reserves_consecutive_slots(self):
+        started = time.monotonic()
+        for _ in range(3):
+            encar.wait_for_host(self.host, 0.2)
+        self.assertGreaterEqual(time.monotonic() - started, 0.38)
+
+    def test_task_updates_bid(self):
+        car_id = self.CAR_IDS[0]
+        bid_instance = bid.objects.create(url_users=f"https://www.encar.com/dc/dc_cardetailview.do?carid={car_id}")
+        fetch_car_data_task(bid_instance.id, [bid_instance.url_users])
+        bid_instance.refresh_from_db()
+        self.assertEqual(bid_instance.model, f"Model {car_id}")
+        self.assertEqual(bid_instance.transmission, "Автомат")
+        self.assertIsNotNone(redis_client.get(BID_ENRICHED_KEY.format(bid_id=bid_instance.id)))
+
+    def test_task_survives_api_error(self):
+        self.server.fail = True
+        bid_instance = bid.objects.create(
+            url_users=f"https://www.encar.com/dc/dc_cardetailview.do?carid={self.CAR_IDS[1]}", brand="Kia"
+        )
+        fetch_car_data_task(bid_instance.id, [bid_instance.url_users, "https://www.encar.com/no-car-id"])
+        bid_instance.refresh_from_db()
+        self.assertEqual(bid_instance.brand, "Kia")
+        self.assertEqual(len(self.server.requests), 1)
+        # Бот узнает об окончании обработки и при ошибке
+        self.assertIsNotNone(redis_client.get(BID_ENRICHED_KEY.format(bid_id=bid_instance.id)))
+        # Ошибка не закэширована: следующий запрос снова идет к API
+        self.server.fail = False
+        self.assertIn(self.CAR_IDS[1], encar.fetch_cars([self.CAR_IDS[1]]))
+        self.assertEqual(len(self.server.requests), 2)
+
+
+class BidImportTests(SimpleTestCase):
+    URL = "https://fem.encar.com/cars/detail/91000001?carid=91000001"
+
+    def test_headerless_csv_keeps_first_row(self):
+        lines = [f"{self.URL.upper()}\r\n".encode(), f"{self.URL}\r\n".encode()]
+        rows = list(iter_rows(lines, CSV_FORMAT))
+        self.assertEqual(rows[0], (1, {"url_users": self.URL.upper()}))
+        self.assertEqual(rows[1][1], {"url_users": self.URL})
+
+    def test_csv_header_is_case_insensitive(self):
+        lines = [b"URL_users,Brand\r\n", f"{self.URL},Kia\r\n".encode()]
+        self.assertEqual(list(iter_rows(lines, CSV_FORMAT)), [(2, {"url_users": self.URL, "brand": "Kia"})])
+
+    def test_multipart_without_file_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(User(id=1, username="import-test"))
+        upload = SimpleUploadedFile("bids.csv", self.URL.encode(), content_type="text/csv")
+        response = client.post(reverse("import_bids"), {"document": upload}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+
+
+class NotificationsApiTests(TestCase):
+    """
+    Асинхронный клиент Redis привязан к циклу событий: повторные запросы в новом цикле
+    (тестовый клиент, runserver, async_to_sync) не должны получать соединения старого
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="notifications-test", email="notifications-test@example.invalid")
+        self.notif_id = f"test-{self.id()}"
+        add_notification({"id": self.notif_id, "type": "test", "message": "Проверка"})
+
+    def tearDown(self):
+        redis_client.hdel(NOTIFICATIONS_ITEMS_KEY, self.notif_id)
+        redis_client.zrem(NOTIFICATIONS_TIMELINE_KEY, self.notif_id)
+        redis_client.srem(NOTIFICATIONS_UNREAD_KEY, self.notif_id)
+
+    def assert_listed(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.notif_id, [n["id"] for n in response.json()["results"]])
+        self.assertGreaterEqual(response.json()["unread_count"], 1)
+
+    async def test_async_client_twice(self):
+        await self.async_client.aforce_login(self.user)
+        for _ in range(2):
+            self.assert_listed(await self.async_client.get(reverse("company_add"), {"limit": 200}))
+
+    def test_new_event_loop_per_request(self):
+        # Тестовый Client выполняет async-вьюху через async_to_sync: на каждый запрос свой цикл
+        self.client.force_login(self.user)
+        for _ in range(2):
+            self.assert_listed(self.client.get(reverse("company_add"), {"limit": 200}))
@@ -0,0 +1,202 @@
+import io
+import logging
+import posixpath
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+from demo.media_store import is_content_addressed
+from demo.models import CarsPhoto, Dealers, StatusFile, Order
+from demo.response_cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+# Превью хранятся рядом с оригиналом в подпапке .thumbs: бот перечисляет
+# только файлы папки заказа, подпапки ему не мешают. Пишутся через default_storage
+# (тот же MEDIA_ROOT), а не через хранилище поля: в хранилище по содержимому
+# (demo.media_store) превью получили бы чужие имена.
+# Запись в поле thumbnails:
+#   {"source": имя оригинала, "width": .., "height": ..,
+#    "sizes": {"sm": {"webp": имя, "jpg": имя, "width": .., "height": ..}, ...}}
+#   или {"source": .., "error": текст} - файл не изображение.
+# Если файла нет на диске (еще не докачан, том не смонтирован), запись не ставится:
+# строка остается с thumbnails = NULL, и sweep попробует снова
+THUMBS_DIR = ".thumbs"
+THUMBNAIL_SIZES = {"sm": 160, "md": 480, "lg": 1280}   # Длинная сторона, px; по возрастанию
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+SWEEP_BATCH = 200   # Строк каждого вида за один прогон sweep
+
+# Вид -> (модель, файловое поле)
+SOURCES = {
+    "photo": (CarsPhoto, "file_url"),
+    "dealer": (Dealers, "photo"),
+    "status_file": (StatusFile, "file"),
+}
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+class SourceMissing(ThumbnailError):
+    pass
+
+
+def needs_thumbnails(fieldfile, thumbnails):
+    return bool(fieldfile) and (not thumbnails or thumbnails.get("source") != fieldfile.name)
+
+
+def _thumb_name(source_name, size, ext):
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, THUMBS_DIR, f"{stem}_{size}.{ext}")
+
+
+def _flatten(image):
+    # JPEG без прозрачности: прозрачные области - белые
+    if image.mode != "RGBA":
+        return image
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def render(fieldfile):
+    """
+    Строит превью всех размеров и сохраняет их в хранилище поля.
+    Возвращает запись для поля thumbnails
+    """
+    if not fieldfile.storage.exists(fieldfile.name):
+        raise SourceMissing("файл не найден")
+    try:
+        with fieldfile.storage.open(fieldfile.name, "rb") as f:
+            image = Image.open(f)
+            width, height = image.size
+            # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8)
+            image.draft("RGB", (max(THUMBNAIL_SIZES.values()),) * 2)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ThumbnailError(f"не изображение: {e}")
+
+    if (image.width > image.height) != (width > height):
+        width, height = height, width   # поворот по EXIF
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    longest = max(width, height)
+
+    # Большой размер не нужен, если оригинал уже меньше предыдущего
+    sizes = []
+    for size, px in THUMBNAIL_SIZES.items():
+        sizes.append((size, px))
+        if px >= longest:
+            break
+
+    result = {"source": fieldfile.name, "width": width, "height": height, "sizes": {}}
+    # От большего к меньшему: каждое превью уменьшается из предыдущего, а не из оригинала
+    current = image
+    for size, px in reversed(sizes):
+        current = current.copy()
+        current.thumbnail((px, px), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        entry = {"width": current.width, "height": current.height}
+        for ext, (fmt, options) in THUMBNAIL_FORMATS.items():
+            buffer = io.BytesIO()
+            (current if fmt == "WEBP" else _flatten(current)).save(buffer, fmt, **options)
+            name = _thumb_name(fieldfile.name, size, ext)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            entry[ext] = default_storage.save(name, ContentFile(buffer.getvalue()))
+        result["sizes"][size] = entry
+    return result
+
+
+def _delete_stale(old, new):
+    # Превью общего блоба нужны и другим записям - их удаляет сборщик мусора хранилища
+    if is_content_addressed((old or {}).get("source")):
+        return
+    keep = {name for entry in (new or {}).get("sizes", {}).values() for name in entry.values() if isinstance(name, str)}
+    for entry in (old or {}).get("sizes", {}).values():
+        for name in entry.values():
+            if isinstance(name, str) and name not in keep:
+                default_storage.delete(name)
+
+
+def generate(kind, pk, force=False):
+    """
+    Строит превью объекта и записывает их в thumbnails. Ничего не делает,
+    если превью уже построены для текущего файла (кроме force=True).
+    Возвращает запись thumbnails или None, если обработка не понадобилась
+    """
+    model, field = SOURCES[kind]
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None:
+        return None
+    fieldfile = getattr(obj, field)
+    if not fieldfile or not (force or needs_thumbnails(fieldfile, obj.thumbnails)):
+        return None
+
+    try:
+        thumbnails = render(fieldfile)
+    except SourceMissing as e:
+        logger.warning(f"Превью {kind} {pk} ({fieldfile.name}): {e}, повтор при следующем sweep")
+        return None
+    except ThumbnailError as e:
+        logger.warning(f"Превью {kind} {pk} ({fieldfile.name}): {e}")
+        thumbnails = {"source": fieldfile.name, "error": str(e)}
+
+    # update без сигналов; условие по имени файла - на случай замены файла во время обработки
+    updated = model.objects.filter(pk=pk, **{field: fieldfile.name}).update(thumbnails=thumbnails)
+    if updated:
+        _delete_stale(obj.thumbnails, thumbnails)
+        if kind == "photo" and obj.bid_id:
+            invalidate("bid", obj.bid_id)
+        elif kind == "status_file":
+            invalidate("order", *Order.objects.filter(status__files=pk).values_list("id", flat=True))
+    return thumbnails
+
+
+def pending(kind, limit=None, after=0):
+    """
+    id объектов с файлом, для которых превью еще не строились (id больше after)
+    """
+    model, field = SOURCES[kind]
+    qs = (
+        model.objects.filter(thumbnails__isnull=True, id__gt=after)
+        .exclude(**{field: ""})
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    return list(qs[:limit] if limit else qs)
+
+
+def thumbnail_url(fieldfile, thumbnails, size="sm", fmt="webp"):
+    """
+    URL превью нужного размера; если его нет (оригинал меньше) - ближайшего меньшего,
+    если превью нет совсем - URL оригинала
+    """
+    if not fieldfile:
+        return None
+    sizes = {}
+    if thumbnails and thumbnails.get("source") == fieldfile.name:
+        sizes = thumbnails.get("sizes") or {}
+    names = list(THUMBNAIL_SIZES)
+    for candidate in reversed(names[:names.index(size) + 1]):
+        if candidate in sizes:
+            return default_storage.url(sizes[candidate][fmt])
+    return fieldfile.url
+
+
+def thumbnail_urls(fieldfile, thumbnails):
+    """
+    {размер: {"webp": url, "jpg": url, "width": .., "height": ..}} для сериализаторов;
+    пустой словарь, пока превью не готовы или файл не изображение
+    """
+    if not fieldfile or not thumbnails or thumbnails.get("source") != fieldfile.name:
+        return {}
+    return {
+        size: {key: default_storage.url(value) if key in THUMBNAIL_FORMATS else value for key, value in entry.items()}
+        for size, entry in (thumbnails.get("sizes") or {}).items()
+    }
@@ -10,6 +10,8 @@ urlpatterns = [
 
     path('bid/all/', views.all_bid, name="all_bid"),
     path('bid/', views.create_bid, name="create_bid"),
+    path('bid/import/', views.import_bids, name="import_bids"),
+    path('bid/import/<str:job_id>/', views.import_bids_status, name="import_bids_status"),
     path('bid/<int:pk>/', views.bid_one, name="bid"),
     path('bid/<int:pk>/update/', views.update_bid_topics, name="update_bid_topics"),
     
@@ -27,8 +29,13 @@ urlpatterns = [
     path('company/<int:company_id>/employee/<int:user_id>/remove/',  views.remove_employee, name="remove_employee"),
     path('notifications/', views.notifications_api, name="company_add"),
     path("notifications/<str:pk>/toggle_read/", views.toggle_read_api, name="toggle_read_api"),
+    path('events/', views.events_stream, name="events_stream"),
+    path('search/', views.search, name="search"),
+    path('export/<str:kind>/', views.export, name="export"),
+    path('analytics/', views.analytics_report, name="analytics"),
 
     path('message/', views.get_all_message, name="get_all_message"),
+    path('message/sync/', views.sync_messages, name="sync_messages"),
     path('message/<int:pk>', views.get_message, name="get_message"),
     path("message/create/", views.create_message, name="create_message")
 ]
@@ -1,18 +1,36 @@
 from django.shortcuts import get_object_or_404, render
+from django.http import HttpResponseForbidden, StreamingHttpResponse, JsonResponse
+from django.utils import timezone
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, parser_classes, permission_classes
+from adrf.decorators import api_view as async_api_view
+from asgiref.sync import sync_to_async
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from demo.serializers import *
-import requests
+from demo.pagination import paginated_response
+from demo.notifications import list_notifications, toggle_read, unread_count
+from demo.events import event_stream, publish_event
+from demo.response_cache import get_or_build, cache_headers
+from demo.bid_import import create_job, get_job, run_import, iter_rows, detect_format
+from demo.export import (
+    EXPORTS, CONTENT_TYPES, CSV_FORMAT, XLSX_FORMAT, ExportError, build_queryset, stream_csv, stream_xlsx,
+)
+from demo.analytics import snapshot as analytics_snapshot
+from demo.search import SEARCHES, SEARCH_LIMIT, MAX_SEARCH_LIMIT, MIN_QUERY_LENGTH
+from demo.conditional import (
+    conditional, bid_etag, bid_list_etag, order_list_etag, company_etag, thread_etag,
+)
 from demo.models import *
 from django.contrib.auth import authenticate, login, logout
 from demo.tasks import *
+import csv
 import json
-import redis
 
-BOT_TOKEN = "7685909490:AAHTEZWoC3YLfkJzXNOuRGcqUsxg7DyUEaI"
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -83,24 +101,38 @@ def create_order(request):
     else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def orders_with_relations():
+    # Клиент и статус одним JOIN, файлы статусов одним запросом на всю выборку
+    return (
+        Order.objects
+        .select_related('client', 'status')
+        .prefetch_related('status__files')
+    )
+
 @api_view(['GET'])
+@conditional(order_list_etag)
 def all_orders(request):
-    orders = Order.objects.all()
-    serializer = OrdersSerializer(orders, many=True)
-    return Response(serializer.data)
+    return paginated_response(
+        request,
+        orders_with_relations(),
+        lambda page: OrdersSerializer(page, many=True).data,
+    )
 
 @api_view(['GET'])
 def order(request, pk):
-    order = get_object_or_404(Order, pk=pk)
-    serializer = OrdersSerializer(order)
-    return Response(serializer.data)
+    data, hit = get_or_build(
+        "order", pk, lambda: OrdersSerializer(get_object_or_404(orders_with_relations(), pk=pk)).data
+    )
+    return Response(data, headers=cache_headers(hit))
 
 @api_view(['GET'])
 def status_order(request, pk):
-    order = get_object_or_404(Order, pk=pk)
-    status = order.status
-    serializer = Status_ordersSerializer(status)
-    return Response(serializer.data)
+    data, hit = get_or_build(
+        "order", pk,
+        lambda: Status_ordersSerializer(get_object_or_404(orders_with_relations(), pk=pk).status).data,
+        variant="status",
+    )
+    return Response(data, headers=cache_headers(hit))
 
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
@@ -120,8 +152,9 @@ def upload_doc(request, pk):
     if doc_type not in allowed_fields:
         return Response({"error": "Invalid doc_type"}, status=400)
     idx = allowed_fields.index(doc_type)
+    uploaded_types = set(status_obj.files.values_list('doc_type', flat=True))
     for prev_field in allowed_fields[:idx]:
-        if not status_obj.files.filter(doc_type=prev_field).exists():
+        if prev_field not in uploaded_types:
             return Response(
                 {"error": f"Нельзя загружать {doc_type}, пока не загружены файлы для {prev_field}"},
                 status=400
@@ -129,8 +162,8 @@ def upload_doc(request, pk):
     uploaded_files = []
     for f in files:
         file_obj = StatusFile.objects.create(file=f, doc_type=doc_type)
-        status_obj.files.add(file_obj)
         uploaded_files.append(file_obj)
+    status_obj.files.add(*uploaded_files)
 
     update_status_by_workflow(status_obj)
 
@@ -149,8 +182,12 @@ def upload_doc(request, pk):
     if idx + 1 < len(allowed_fields):
         next_label = status_labels.get(allowed_fields[idx + 1], "следующий статус")
     
-    # send_telegram_message(f"🚗 Заказ #{pk} перешел из статуса <b>{label}</b> в статус <b>{next_label}</b>")
-    # send_telegram_documents_group(uploaded_files, caption=f"Файлы по статусу: {label}")
+    uploaded_ids = [f.pk for f in uploaded_files]
+    transaction.on_commit(lambda: broadcast_status_change.delay(
+        f"🚗 Заказ #{pk} перешел из статуса <b>{label}</b> в статус <b>{next_label}</b>",
+        uploaded_ids,
+        caption=f"Файлы по статусу: {label}",
+    ))
 
     serializer = Status_ordersSerializer(status_obj)
     return Response(serializer.data, status=200)
@@ -163,8 +200,9 @@ def update_status_by_workflow(status_obj):
         'port_arrival', 'order_received'
     ]
 
+    uploaded_types = set(status_obj.files.values_list('doc_type', flat=True))
     for field in allowed_fields:
-        if not status_obj.files.filter(doc_type=field).exists():
+        if field not in uploaded_types:
             status_obj.current_status = field
             status_obj.save()
             return
@@ -172,70 +210,93 @@ def update_status_by_workflow(status_obj):
     status_obj.save()
 
 
-def send_telegram_message(text):
-    for user in TGUsers.objects.all():
-        requests.post(
-            f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
-            data={
-                "chat_id": user.chat_id,
-                "text": text,
-                "parse_mode": "HTML"
-            }
-        )
-
-
-def send_telegram_documents_group(file_objs, caption=None):
-    for user in TGUsers.objects.all():
-        media = []
-        files_payload = {}
-
-        for i, sf in enumerate(file_objs):
-            path = sf.file.path
-            media.append({
-                "type": "document",
-                "media": f"attach://file{i}",
-                "caption": caption if i == 0 else ""
-            })
-            files_payload[f"file{i}"] = (sf.file.name, open(path, "rb"), "application/octet-stream")
-
-        data = {
-            "chat_id": user.chat_id,
-            "media": str(media).replace("'", '"')
-        }
-
-        requests.post(
-            f"https://api.telegram.org/bot{BOT_TOKEN}/sendMediaGroup",
-            data=data,
-            files=files_payload
-        )
 import logging
 logger = logging.getLogger(__name__)
 
-@api_view(['POST'])
-def create_bid(request):
+def _create_bid(request):
     serializer = BidsSerializer(data=request.data, context={'request': request})
-    if serializer.is_valid():
-        bid_instance = serializer.save()
-        url = request.data.get("url_users")
-        logger.info(f"ДФДДФФДФД, {bid_instance.id}, {url}")
-        if url:
-            fetch_car_data_task.delay(bid_instance.id, [url])
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-    else:
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    bid_instance = serializer.save()
+    url = request.data.get("url_users")
+    logger.info(f"ДФДДФФДФД, {bid_instance.id}, {url}")
+    if url:
+        transaction.on_commit(lambda: fetch_car_data_task.delay(bid_instance.id, [url]))
+    return serializer.data, None
+
+@async_api_view(['POST'])
+async def create_bid(request):
+    data, errors = await sync_to_async(_create_bid)(request)
+    if errors is not None:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data, status=status.HTTP_201_CREATED)
     
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_bids(request):
+    """
+    Импорт заявок из CSV или NDJSON: файл в теле запроса или в поле file (multipart).
+    Строки читаются потоком, заявки создаются порциями, обогащение идет в Celery.
+    Формат: ?format=csv|ndjson, иначе по расширению файла или Content-Type
+    """
+    if request.content_type.startswith('multipart/'):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "Нет файла в поле file"}, status=400)
+        lines = upload
+        fmt = detect_format(upload.content_type, upload.name, request.query_params.get('format'))
+    else:
+        lines = iter(request.readline, b'')
+        fmt = detect_format(request.content_type, requested=request.query_params.get('format'))
+
+    user_comp = (
+        user_company.objects.filter(user_id=request.user, company_id__is_approved=True)
+        .select_related('company_id')
+        .first()
+    )
+    job_id = create_job(request.user.id)
+    try:
+        job = run_import(
+            job_id,
+            iter_rows(lines, fmt),
+            request.user,
+            user_comp.company_id if user_comp else None,
+            lambda bid_ids, job_id: enrich_bids_task.delay(bid_ids, job_id),
+        )
+    except (UnicodeDecodeError, csv.Error) as e:
+        return Response({**get_job(job_id), "detail": f"Файл не прочитан: {e}"}, status=400)
+    return Response(job, status=status.HTTP_201_CREATED)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def import_bids_status(request, job_id):
+    job = get_job(job_id, user_id=request.user.id)
+    if job is None:
+        return Response({"detail": "Импорт не найден"}, status=404)
+    return Response(job)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional(bid_list_etag)
 def all_bid(request):
-    bids = bid.objects.filter(user=request.user)
-    serializer = BidsSerializer(bids, many=True)
-    return Response(serializer.data)
+    bids = bid.objects.filter(user=request.user).select_related('company').prefetch_related('photos')
+    return paginated_response(
+        request,
+        bids,
+        lambda page: BidsSerializer(page, many=True).data,
+    )
 
 @api_view(['GET'])
+@conditional(bid_etag)
 def bid_one(request, pk):
-    bid_one = get_object_or_404(bid, pk=pk)
-    serializer = BidsSerializer(bid_one)
-    return Response(serializer.data)
+    data, hit = get_or_build(
+        "bid", pk,
+        lambda: BidsSerializer(
+            get_object_or_404(bid.objects.select_related('company').prefetch_related('photos'), pk=pk)
+        ).data,
+        ttl=settings.RESPONSE_CACHE_BID_TTL,
+    )
+    return Response(data, headers=cache_headers(hit))
 
 @api_view(["PATCH"])
 def update_bid_topics(request, pk):
@@ -270,10 +331,21 @@ def all_company(request):
 
 
 @api_view(['GET'])
+@conditional(company_etag)
 def company(request, pk):
-    com_one = get_object_or_404(Companies, pk=pk)
-    serializer = CompanySerializer(com_one, context={'request': request})
-    return Response(serializer.data)
+    def build():
+        data = dict(CompanySerializer(get_object_or_404(Companies, pk=pk), context={'request': request}).data)
+        # Поля текущего пользователя в общий кэш не попадают
+        data.pop('current_user_id')
+        data.pop('current_user_role')
+        return data
+
+    data, hit = get_or_build("company", pk, build)
+    data['current_user_id'] = request.user.id
+    data['current_user_role'] = next(
+        (employee['role'] for employee in data['employees'] if employee['id'] == request.user.id), None
+    )
+    return Response(data, headers=cache_headers(hit))
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -303,63 +375,205 @@ def remove_employee(request, company_id, user_id):
     except user_company.DoesNotExist:
         return Response({"detail": "Сотрудник не найден"}, status=status.HTTP_404_NOT_FOUND)
 
-@api_view(['GET'])
-def notifications_api(request):
-    r = redis.Redis(host="redis", port=6379, db=0, decode_responses=True)
-    raw = r.lrange("notifications_queue", 0, -1)
-    notifications = [json.loads(item) for item in raw]
-    return Response(notifications)
+@async_api_view(['GET'])
+async def notifications_api(request):
+    try:
+        before = request.query_params.get("before")
+        before = float(before) if before else None
+        limit = min(int(request.query_params.get("limit", 50)), 200)
+    except ValueError:
+        return Response({"error": "before and limit must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
 
+    notifications, next_before = await list_notifications(before=before, limit=max(limit, 1))
+    return Response({
+        "results": notifications,
+        "next_before": next_before,
+        "unread_count": await unread_count(),
+    })
 
-@api_view(['POST'])
-def toggle_read_api(request, pk):
-    r = redis.Redis(host="redis", port=6379, db=0, decode_responses=True)
-    raw = r.lrange("notifications_queue", 0, -1)
 
-    for i, item in enumerate(raw):
-        notif = json.loads(item)
-        if notif.get("id") == pk:
-            notif["read"] = not notif.get("read", False)
-            r.lset("notifications_queue", i, json.dumps(notif))
-            return Response({"success": True, "read": notif["read"]})
+@async_api_view(['POST'])
+async def toggle_read_api(request, pk):
+    read = await toggle_read(pk)
+    if read is None:
+        return Response({"success": False, "error": "not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"success": True, "read": read})
+
+async def events_stream(request):
+    """
+    SSE: новые уведомления и сообщения чатов. Требует ASGI-сервер.
+    Браузер сам передает Last-Event-ID при переподключении.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponseForbidden()
+
+    last_event_id = request.headers.get("Last-Event-ID")
+    response = StreamingHttpResponse(event_stream(last_event_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+async def export(request, kind):
+    """
+    Выгрузка bids / orders / messages в CSV (по умолчанию) или XLSX: ?format=xlsx.
+    CSV отдается по мере чтения серверного курсора. Требует ASGI-сервер.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponseForbidden()
+    if kind not in EXPORTS:
+        return JsonResponse({"detail": f"Неизвестная выгрузка: {kind}"}, status=404)
+    fmt = request.GET.get("format", CSV_FORMAT)
+    if fmt not in CONTENT_TYPES:
+        return JsonResponse({"detail": f"Неизвестный формат: {fmt}"}, status=400)
 
-    return Response({"success": False, "error": "not found"}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        queryset = build_queryset(kind, user, request.GET)
+    except ExportError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+
+    if fmt == XLSX_FORMAT:
+        try:
+            content = await stream_xlsx(kind, queryset)
+        except ImportError:
+            return JsonResponse({"detail": "XLSX недоступен: не установлен openpyxl"}, status=400)
+    else:
+        content = stream_csv(kind, queryset)
+
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{kind}-{timezone.now():%Y%m%d-%H%M}.{fmt}"'
+    response["X-Accel-Buffering"] = "no"
+    return response
 
+# Страницы сообщений идут от новых к старым (next ведет к более ранним),
+# внутри страницы сообщения в хронологическом порядке
 @api_view(['GET'])
+@conditional(thread_etag)
 def get_message(request, pk):
-    messages = ChatMessage.objects.filter(message_thread_id=pk).order_by("created_at")
-    serializer = ChatMessageSerializer(messages, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    messages = ChatMessage.objects.filter(message_thread_id=pk).prefetch_related('media')
+    return paginated_response(
+        request,
+        messages,
+        lambda page: ChatMessageSerializer(page[::-1], many=True).data,
+    )
 
 @api_view(['GET'])
 def get_all_message(request):
-    messages = ChatMessage.objects.all().order_by("created_at")
-    serializer = GroupedChatMessageSerializer(messages, many=False)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    """
+    Список чатов: последнее сообщение каждой темы. Страницы идут от недавно
+    активных тем к давним, курсор - id последнего сообщения темы
+    """
+    newer = ChatMessage.objects.filter(message_thread_id=OuterRef('message_thread_id'), id__gt=OuterRef('id'))
+    messages = ChatMessage.objects.filter(~Exists(newer)).prefetch_related('media')
+    return paginated_response(
+        request,
+        messages,
+        lambda page: GroupedChatMessageSerializer(page[::-1], many=False).data,
+    )
+
+MESSAGE_STREAM_CHUNK = 500
+
+
+async def stream_grouped_messages(messages, since):
+    """
+    Отдает {"grouped": {thread_id: [...]}, "cursor": id} кусками по мере чтения из БД.
+    Выборка идет порциями по MESSAGE_STREAM_CHUNK вместе с media, поэтому
+    память не зависит от объема истории. Под ASGI синхронный итератор
+    StreamingHttpResponse собрал бы в память весь ответ - поэтому генератор асинхронный
+    """
+    cursor = since
+    current_thread = None
+    buffer = ['{"grouped": {']
+    async for m in messages.aiterator(chunk_size=MESSAGE_STREAM_CHUNK):
+        if m.message_thread_id != current_thread:
+            if current_thread is not None:
+                buffer.append('], ')
+            current_thread = m.message_thread_id
+            buffer.append(f'"{current_thread}": [')
+        else:
+            buffer.append(', ')
+        buffer.append(json.dumps(grouped_message_item(m), ensure_ascii=False))
+        cursor = max(cursor, m.id)
+        if len(buffer) >= MESSAGE_STREAM_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if current_thread is not None:
+        buffer.append(']')
+    buffer.append(f'}}, "cursor": {cursor}}}')
+    yield ''.join(buffer)
+
+@async_api_view(['GET'])
+async def sync_messages(request):
+    """
+    Сгруппированная по чатам история сообщений с id > since.
+    cursor из ответа передается в следующий запрос как ?since=
+    """
+    try:
+        since = int(request.query_params.get("since", 0))
+    except ValueError:
+        return Response({"error": "since must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    messages = (
+        ChatMessage.objects
+        .filter(id__gt=since)
+        .order_by("message_thread_id", "id")
+        .prefetch_related('media')
+    )
+    return StreamingHttpResponse(
+        stream_grouped_messages(messages, since),
+        content_type="application/json",
+    )
+
+def _create_message(data):
+    serializer = ChatMessageSerializer(data=data)
+    if not serializer.is_valid():
+        return None, None, serializer.errors
+    to_bot = serializer.validated_data.get('to_bot', False)
+    message = serializer.save(delivery_status='pending' if to_bot else None)
+    media_data = data.get('media', [])
+    for m in media_data:
+        ChatMedia.objects.create(
+            message=message,
+            file_url=m['file_url'],
+            file_type=m['type']
+        )
+    if message.to_bot:
+        # Отправка в Telegram идет в Celery, запрос оператора ее не ждет
+        transaction.on_commit(lambda: deliver_chat_message.delay(message.pk))
+    return serializer.data, grouped_message_item(message), None
+
+@async_api_view(['POST'])
+async def create_message(request):
+    data, event, errors = await sync_to_async(_create_message)(request.data)
+    if errors is not None:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+    await publish_event("message", event)
+    return Response(data, status=status.HTTP_201_CREATED)
 
-@api_view(['POST'])
-def create_message(request):
-    serializer = ChatMessageSerializer(data=request.data)
-    if serializer.is_valid():
-        message = serializer.save()
-        media_data = request.data.get('media', [])
-        for m in media_data:
-            ChatMedia.objects.create(
-                message=message,
-                file_url=m['file_url'],
-                file_type=m['type']
-            )
-        if message.to_bot:
-            url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-            payload = {
-                "chat_id": message.chat_id,
-                "message_thread_id": message.message_thread_id,
-                "text": message.text,
-            }
-            try:
-                resp = requests.post(url, json=payload)
-                resp.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                print("Ошибка отправки в Telegram:", e)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
+    """
+    Поиск по заявкам, заказам и дилерам: ?q=&types=bids,orders,dealers&limit=
+    """
+    text = request.query_params.get('q', '').strip()
+    if len(text) < MIN_QUERY_LENGTH:
+        return Response({"detail": f"Запрос должен быть не короче {MIN_QUERY_LENGTH} символов"}, status=400)
+
+    types = [t for t in request.query_params.get('types', ','.join(SEARCHES)).split(',') if t in SEARCHES]
+    try:
+        limit = min(max(int(request.query_params.get('limit', SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+    except ValueError:
+        limit = SEARCH_LIMIT
+    results = {t: SEARCHES[t](request.user, text, limit) for t in types}
+    return Response({"query": text, **results})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def analytics_report(request):
+    """
+    Сводка по заявкам: очередь по компаниям, работа осмотрщиков, тренд по дням.
+    Читает материализованные представления, их пересчитывает задача refresh_analytics
+    """
+    return Response(analytics_snapshot())
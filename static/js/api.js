@@ -0,0 +1,31 @@
+// Условная загрузка JSON из API: ответ хранится в sessionStorage вместе с ETag,
+// повторный запрос идет с If-None-Match, и при 304 Not Modified тело берется из хранилища.
+async function fetchJSON(url, options = {}) {
+    const storageKey = `etag:${url}`;
+    let cached = null;
+    try {
+        cached = JSON.parse(sessionStorage.getItem(storageKey));
+    } catch (e) {
+        cached = null;
+    }
+
+    const headers = new Headers(options.headers || {});
+    if (cached && cached.etag) headers.set('If-None-Match', cached.etag);
+
+    const response = await fetch(url, { ...options, headers });
+    if (response.status === 304 && cached) return cached.body;
+    if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+
+    const body = await response.json();
+    const etag = response.headers.get('ETag');
+    try {
+        if (etag) {
+            sessionStorage.setItem(storageKey, JSON.stringify({ etag, body }));
+        } else {
+            sessionStorage.removeItem(storageKey);
+        }
+    } catch (e) {
+        // Хранилище переполнено: работаем без кэша
+    }
+    return body;
+}